@@ -1,5 +1,9 @@
 import streamlit as st
 
+from components.holds import show_hold_button
+from components.pagination import show_page
+from components.recommendations import show_recommendations
+
 
 def show():
     # Initialise the library session state
@@ -23,30 +27,46 @@ def show():
     if not system.books:
         st.write("📚 No books available in the library yet.")
         return
+    # Filter by genre using the catalog index
+    genre = st.selectbox(
+        "Genre", ["All"] + system.list_genres("Book"), key="book_genre_filter"
+    )
+    # Only the current page is fetched, sorted and filtered by the system
+    books = show_page(system, "Book", "book", None if genre == "All" else genre)
+
     # Display books in rows of 4
-    books = list(system.books.values())
     for row_start in range(0, len(books), 4):
         cols = st.columns(4)
         for i in range(4):
             if row_start + i < len(books):
-                book = books[row_start + i]
                 with cols[i]:
-                    st.image(
-                        "https://img.icons8.com/?size=100&id=32Akt39C5Dah&format=png&color=000000",
-                        width=80,
-                    )
-                    st.markdown(f"### {book.title}")
-                    st.caption(f"Published in {book.year}")
-                    st.write(f"Author: {book.author}")
-                    st.write(f"Genre: {book.genre}")
-                    st.write(f"ISBN: {book.isbn}")
-                    st.write("✅ Available" if book.is_available else "❌ Checked Out")
-                    if book.is_available:
-                        if st.button("Borrow", key=f"borrow_{book.isbn}"):
-                            result = system.checkout_book(book.isbn, member_id)
-                            st.success(result)
-                            st.info(
-                                "💡 Check your Member Portal to see your borrowed items!"
-                            )
-                    else:
-                        st.write("❌ Not Available")
+                    show_book(system, books[row_start + i], member_id)
+
+
+# A fragment reruns on its own, so a Borrow click redraws only its card
+@st.fragment
+def show_book(system, book, member_id):
+    st.image(
+        "https://img.icons8.com/?size=100&id=32Akt39C5Dah&format=png&color=000000",
+        width=80,
+    )
+    st.markdown(f"### {book.title}")
+    st.caption(f"Published in {book.year}")
+    st.write(f"Author: {book.author}")
+    st.write(f"Genre: {book.genre}")
+    st.write(f"ISBN: {book.isbn}")
+    if book.copies > 1:
+        st.write(f"📗 {book.available_copies} of {book.copies} copies available")
+    else:
+        st.write("✅ Available" if book.is_available else "❌ Checked Out")
+    show_recommendations(system, book)
+    if book.is_available:
+        if st.button("Borrow", key=f"borrow_{book.isbn}"):
+            result = system.checkout_book(book.isbn, member_id)
+            if result.ok:
+                st.success(str(result))
+            else:
+                st.error(str(result))
+            st.info("💡 Check your Member Portal to see your borrowed items!")
+    else:
+        show_hold_button(system, book, member_id, book.isbn)
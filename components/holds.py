@@ -0,0 +1,14 @@
+import streamlit as st
+
+
+def show_hold_button(system, item, member_id, key):
+    """Offer to join the waitlist for a checked-out item"""
+    waiting = system.holds.waiting(item.item_key)
+    if waiting:
+        st.caption(f"⏳ {waiting} waiting")
+    if st.button("Join Waitlist", key=f"hold_{key}"):
+        result = system.place_hold(item.item_key, member_id)
+        if result.ok:
+            st.success(str(result))
+        else:
+            st.error(str(result))
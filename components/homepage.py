@@ -39,5 +39,20 @@ def show():
             """
         )
 
+    st.markdown("---")
+
+    # Search the catalog using the full-text index
+    system = st.session_state.library_system
+    query = st.text_input(
+        "🔍 Search by title, author, genre or publisher", key="catalog_search"
+    )
+    if query.strip():
+        results = system.search(query)
+        if not results:
+            st.info("No matching items found.")
+        for item in results:
+            status = "✅ Available" if item.is_available else "❌ Checked Out"
+            st.write(f"**{item.title}** ({item.__class__.__name__}) - {status}")
+
     st.markdown("---")
     st.markdown("Use the **sidebar** to navigate between features.")
@@ -13,6 +13,22 @@ def show():
     st.title("📚 Librarian Portal")
     system = st.session_state.library_system
 
+    # Collection overview from live counters, nothing is scanned on each rerun
+    st.subheader("📊 Collection Overview")
+    col1, col2, col3 = st.columns(3)
+    stats = system.stats_snapshot()
+    col1.metric("Total Items", stats["total"])
+    col2.metric("Available", stats["available"])
+    col3.metric("Checked Out", stats["checked_out"])
+    checked_out = {
+        genre: counts["checked_out"]
+        for genre, counts in stats["by_genre"].items()
+        if counts["checked_out"]
+    }
+    if checked_out:
+        st.caption("Checked out items by genre")
+        st.bar_chart(checked_out)
+
     # Check if members exist
     if not system.members:
         st.warning("No registered members. Please register a member first.")
@@ -38,7 +54,10 @@ def show():
             ):
                 st.caption(item.get_description())
                 if st.button(f"Return '{item.title}'", key=f"return_{item.title}"):
-                    result = selected_member.return_item(item)
-                    st.success(result)
+                    result = system.return_item(item, selected_member_id)
+                    if result.ok:
+                        st.success(str(result))
+                    else:
+                        st.error(str(result))
     else:
         st.info("This member has no borrowed items.")
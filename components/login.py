@@ -23,17 +23,17 @@ def show():
 
         system = st.session_state.library_system
 
+        # Emails identify accounts, so a known email with other names is rejected
+        existing = system.find_person_by_email(role, email)
+        if existing and (
+            existing.fname.casefold() != fname.casefold()
+            or existing.lname.casefold() != lname.casefold()
+        ):
+            st.error("❌ This email is already registered under a different name.")
+            return
+
         if role == "Member":
-            member = next(
-                (
-                    m
-                    for m in system.members.values()
-                    if m.fname == fname
-                    and m.lname == lname
-                    and m.email_address == email
-                ),
-                None,
-            )
+            member = system.find_member_by_identity(fname, lname, email)
             if not member:
                 member = system.register_member(Member(fname, lname, email))
                 st.success("✅ New member registered.")
@@ -45,16 +45,7 @@ def show():
             st.session_state.redirect_target = "Member Portal"
 
         else:  # Librarian
-            librarian = next(
-                (
-                    l
-                    for l in system.librarians.values()
-                    if l.fname == fname
-                    and l.lname == lname
-                    and l.email_address == email
-                ),
-                None,
-            )
+            librarian = system.find_librarian_by_identity(fname, lname, email)
             if not librarian:
                 librarian = system.register_librarian(Librarian(fname, lname, email))
                 st.success("✅ New librarian registered.")
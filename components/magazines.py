@@ -1,5 +1,9 @@
 import streamlit as st
 
+from components.holds import show_hold_button
+from components.pagination import show_page
+from components.recommendations import show_recommendations
+
 
 def show():
     system = st.session_state.library_system
@@ -23,19 +27,40 @@ def show():
         st.info("No magazines available.")
         return
 
+    # Filter by genre using the catalog index
+    genre = st.selectbox(
+        "Genre", ["All"] + system.list_genres("Magazine"), key="magazine_genre_filter"
+    )
+    # Only the current page is fetched, sorted and filtered by the system
+    magazines = show_page(
+        system, "Magazine", "magazine", None if genre == "All" else genre
+    )
+
     cols = st.columns(4)
-    for i, mag in enumerate(system.magazines.values()):
+    for i, mag in enumerate(magazines):
         with cols[i % 4]:
-            st.image(
-                "https://img.icons8.com/?size=100&id=oo7qq9GfvBzP&format=png&color=000000",
-                width=80,
-            )
-            st.markdown(f"### {mag.title}")
-            st.caption(f"Published by {mag.publisher} ({mag.year})")
-            st.write(f"Genre: {mag.genre}")
-            st.write("✅ Available" if mag.is_available else "❌ Checked Out")
-            if mag.is_available:
-                if st.button("Borrow", key=f"borrow_mag_{mag.magazine_id}"):
-                    result = system.checkout_magazine(mag.magazine_id, member_id)
-                    st.success(result)
-                    st.info("💡 Check your Member Portal to see your borrowed items!")
+            show_magazine(system, mag, member_id)
+
+
+# A fragment reruns on its own, so a Borrow click redraws only its card
+@st.fragment
+def show_magazine(system, mag, member_id):
+    st.image(
+        "https://img.icons8.com/?size=100&id=oo7qq9GfvBzP&format=png&color=000000",
+        width=80,
+    )
+    st.markdown(f"### {mag.title}")
+    st.caption(f"Published by {mag.publisher} ({mag.year})")
+    st.write(f"Genre: {mag.genre}")
+    st.write("✅ Available" if mag.is_available else "❌ Checked Out")
+    show_recommendations(system, mag)
+    if mag.is_available:
+        if st.button("Borrow", key=f"borrow_mag_{mag.magazine_id}"):
+            result = system.checkout_magazine(mag.magazine_id, member_id)
+            if result.ok:
+                st.success(str(result))
+            else:
+                st.error(str(result))
+            st.info("💡 Check your Member Portal to see your borrowed items!")
+    else:
+        show_hold_button(system, mag, member_id, f"mag_{mag.magazine_id}")
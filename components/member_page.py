@@ -1,7 +1,12 @@
+from datetime import datetime
+
 import streamlit as st
 
 from library_system import Member
 
+# Seconds between checks for changes made by other sessions
+WATCH_SECONDS = 2
+
 
 def show():
     if "logged_in_user" not in st.session_state:
@@ -17,26 +22,61 @@ def show():
         st.error("❌ Invalid user session. Please log in again.")
         return
 
+    system = st.session_state.library_system
     st.title("📖 My Borrowed Items")
 
-    # Add refresh button
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        if st.button("🔄 Refresh", key="refresh_member_portal"):
-            st.rerun()
+    # The page is redrawn when another session changes this member's loans
+    # or holds, checking the member's version costs one dict lookup
+    st.session_state.member_portal_version = system.events.member_version(
+        member.member_id
+    )
+    watch_changes(system, member.member_id)
 
     if not member.borrowed_items:
         st.info("You have not borrowed any items.")
     else:
         st.write(f"You have borrowed **{len(member.borrowed_items)}** item(s):")
-        for item in member.borrowed_items:
+        for loan in list(member.loans.values()):
+            item = loan.item
             with st.expander(
                 f"📘 {item.title} ({item.__class__.__name__})", expanded=True
             ):
                 st.write(item.get_description())
+                due = datetime.fromtimestamp(loan.due_at).strftime("%d %b %Y")
+                if loan.is_overdue():
+                    st.error(f"⏰ Overdue since {due}")
+                else:
+                    st.caption(f"📅 Due {due}")
                 if st.button(
                     f"Return '{item.title}'", key=f"return_{item.title}_{id(item)}"
                 ):
-                    result = member.return_item(item)
-                    st.success(result)
+                    result = system.return_item(item, member.member_id)
+                    if result.ok:
+                        st.success(str(result))
+                    else:
+                        st.error(str(result))
                     st.rerun()
+
+    holds = system.holds_for(member.member_id)
+    if holds:
+        st.subheader("⏳ My Holds")
+        for hold in holds:
+            item = system.find_item(hold.item_key)
+            if item is None:
+                continue
+            until = datetime.fromtimestamp(hold.expires_at).strftime("%d %b %Y")
+            if hold.status == "ready":
+                st.success(f"📬 {item.title} is ready for you to borrow until {until}")
+            else:
+                st.write(f"{item.title} ({item.__class__.__name__})")
+            if st.button("Cancel Hold", key=f"cancel_hold_{hold.item_key}"):
+                system.cancel_hold(hold.item_key, member.member_id)
+                st.rerun()
+
+
+@st.fragment(run_every=WATCH_SECONDS)
+def watch_changes(system, member_id):
+    if system.events.member_version(member_id) != st.session_state.get(
+        "member_portal_version"
+    ):
+        st.rerun()
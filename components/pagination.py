@@ -0,0 +1,54 @@
+import streamlit as st
+
+PAGE_SIZE = 24
+SORT_OPTIONS = {"Title": "title", "Year": "year", "Availability": "availability"}
+
+
+def show_page(system, kind, key, genre=None):
+    """Show sort and page controls and return the items on the current page"""
+    sort = SORT_OPTIONS[st.selectbox("Sort by", list(SORT_OPTIONS), key=f"{key}_sort")]
+
+    # Start again from the first page whenever the filters change
+    filters = (genre, sort)
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    page = _cached_page(system, kind, key, sort, genre, cursors[-1])
+
+    previous_col, page_col, next_col = st.columns([1, 2, 1])
+    with previous_col:
+        if len(cursors) > 1 and st.button("← Previous", key=f"{key}_previous"):
+            cursors.pop()
+            st.rerun()
+    with page_col:
+        st.caption(f"Page {len(cursors)}")
+    with next_col:
+        if page.next_cursor and st.button("Next →", key=f"{key}_next"):
+            cursors.append(page.next_cursor)
+            st.rerun()
+    return page.items
+
+
+def _cached_page(system, kind, key, sort, genre, cursor):
+    """Reuse the page fetched on an earlier rerun until the catalog changes.
+
+    Items are live objects, so a cached page still shows current
+    availability. Only an availability sort depends on it for the order.
+    """
+    events = system.events
+    version = events.catalog_version
+    if sort == "availability":
+        version = max(version, events.availability_version)
+    request = (sort, genre, cursor)
+    cached = st.session_state.get(f"{key}_page")
+    if cached is not None and cached[0] == request and cached[1] >= version:
+        return cached[2]
+    # Stamped before the fetch, so a change made meanwhile refetches next time
+    stamp = events.version
+    page = system.list_items(
+        kind, sort=sort, genre=genre, cursor=cursor, limit=PAGE_SIZE
+    )
+    st.session_state[f"{key}_page"] = (request, stamp, page)
+    return page
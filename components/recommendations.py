@@ -0,0 +1,8 @@
+import streamlit as st
+
+
+def show_recommendations(system, item, limit=3):
+    """List what the members who borrowed an item also borrowed"""
+    others = system.recommend(item.item_key, limit)
+    if others:
+        st.caption("👥 Also borrowed: " + ", ".join(other.title for other in others))
@@ -1,5 +1,9 @@
 import streamlit as st
 
+from components.holds import show_hold_button
+from components.pagination import show_page
+from components.recommendations import show_recommendations
+
 
 def show():
     system = st.session_state.library_system
@@ -22,21 +26,40 @@ def show():
         st.info("No videos available.")
         return
 
+    # Filter by genre using the catalog index
+    genre = st.selectbox(
+        "Genre", ["All"] + system.list_genres("Video"), key="video_genre_filter"
+    )
+    # Only the current page is fetched, sorted and filtered by the system
+    videos = show_page(system, "Video", "video", None if genre == "All" else genre)
+
     # Create 4 columns for layout consistency
     cols = st.columns(4)
-    for i, video in enumerate(system.videos.values()):
+    for i, video in enumerate(videos):
         with cols[i % 4]:
-            st.image(
-                "https://img.icons8.com/?size=100&id=44827&format=png&color=000000",
-                width=80,
-            )
-            st.markdown(f"### {video.title}")
-            st.caption(f"{video.year} • {video.genre}")
-            st.write(f"💾 Format: {video.video_format}")
-            st.write(f"⏱️ Duration: {video.duration} mins")
-            st.write("✅ Available" if video.is_available else "❌ Checked Out")
-            if video.is_available:
-                if st.button("Borrow", key=f"borrow_video_{video.video_id}"):
-                    result = system.checkout_video(video.video_id, member_id)
-                    st.success(result)
-                    st.info("💡 Check your Member Portal to see your borrowed items!")
+            show_video(system, video, member_id)
+
+
+# A fragment reruns on its own, so a Borrow click redraws only its card
+@st.fragment
+def show_video(system, video, member_id):
+    st.image(
+        "https://img.icons8.com/?size=100&id=44827&format=png&color=000000",
+        width=80,
+    )
+    st.markdown(f"### {video.title}")
+    st.caption(f"{video.year} • {video.genre}")
+    st.write(f"💾 Format: {video.video_format}")
+    st.write(f"⏱️ Duration: {video.duration} mins")
+    st.write("✅ Available" if video.is_available else "❌ Checked Out")
+    show_recommendations(system, video)
+    if video.is_available:
+        if st.button("Borrow", key=f"borrow_video_{video.video_id}"):
+            result = system.checkout_video(video.video_id, member_id)
+            if result.ok:
+                st.success(str(result))
+            else:
+                st.error(str(result))
+            st.info("💡 Check your Member Portal to see your borrowed items!")
+    else:
+        show_hold_button(system, video, member_id, f"video_{video.video_id}")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+HTTP/JSON API for the Library Management System
+Headless server mode for kiosks, mobile apps and batch jobs
+
+Run with: python3 library_api.py --port 8080 [--db library.db]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from library_events import ChangeCache
+from library_system import Book, LibrarySystem, Video
+
+# Error codes answered with 404, every other failed operation is a 409
+NOT_FOUND = {"not_found", "member_not_found", "item_or_member_not_found"}
+# Path parts around the item ID in /items/<id>/recommendations
+RECOMMENDATIONS = ["items", "recommendations"]
+# GET routes whose responses change only with a library change. Member
+# responses also change with the clock, as loans turn overdue
+VERSIONED_ROUTES = {"items", "search"}
+
+
+# Page sizes are kept between 1 and cap, so limit=-1 cannot ask for everything
+def _limit(query, default, cap):
+    return max(1, min(int(query.get("limit", default)), cap))
+
+
+# JSON shapes
+def item_json(item):
+    data = {
+        "id": item.item_key,
+        "kind": item.__class__.__name__,
+        "title": item.title,
+        "year": item.year,
+        "genre": item.genre,
+        "available": item.is_available,
+        "copies": item.copies,
+        "available_copies": item.available_copies,
+    }
+    if isinstance(item, Book):
+        data["author"] = item.author
+    elif isinstance(item, Video):
+        data["video_format"] = item.video_format
+        data["duration"] = item.duration
+    else:
+        data["publisher"] = item.publisher
+    return data
+
+
+def member_json(member):
+    return {
+        "id": member.member_id,
+        "fname": member.fname,
+        "lname": member.lname,
+        "loans": [
+            {
+                "item_id": loan.item.item_key,
+                "title": loan.item.title,
+                "copy": loan.copy,
+                "checked_out_at": loan.checked_out_at,
+                "due_at": loan.due_at,
+                "overdue": loan.is_overdue(),
+            }
+            for loan in list(member.loans.values())
+        ],
+    }
+
+
+# Display messages are formatted only for clients that ask with
+# ?messages=true, machine clients go by ok, status and error
+def result_json(result, message=False):
+    data = {"ok": result.ok, "status": result.status.value, "error": result.error}
+    if message:
+        data["message"] = str(result)
+    return data
+
+
+class ApiError(Exception):
+    def __init__(self, status, error):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+
+class LibraryApi:
+    """Routes (method, path, query, body) to LibrarySystem operations.
+
+    Returns (HTTP status, JSON-serialisable payload). Kept apart from the
+    HTTP handler so batch requests run the same code without a socket.
+    """
+
+    def __init__(self, system):
+        self.system = system
+        # Tags from an earlier server process never match this one's
+        self.epoch = os.urandom(4).hex()
+        # Item JSON is rebuilt only after a change to its item or the catalog
+        self.items_json = ChangeCache(system.events)
+        self.checkouts = {
+            "Book": system.checkout_book,
+            "Video": system.checkout_video,
+            "Magazine": system.checkout_magazine,
+        }
+
+    def handle(self, method, path, query=None, body=None):
+        query = query or {}
+        parts = [part for part in path.split("/") if part]
+        try:
+            if method == "GET" and parts == ["items"]:
+                return 200, self.list_items(query)
+            if method == "GET" and len(parts) == 2 and parts[0] == "items":
+                return 200, self.item_json(self._item(parts[1]))
+            if method == "GET" and len(parts) == 3 and parts[::2] == RECOMMENDATIONS:
+                return 200, self.recommendations(parts[1], query)
+            if method == "GET" and parts == ["search"]:
+                return 200, self.search(query)
+            if method == "GET" and len(parts) == 2 and parts[0] == "members":
+                member = self.system.find_member(parts[1])
+                if member is None:
+                    raise ApiError(404, "member_not_found")
+                return 200, member_json(member)
+            if method == "POST" and parts in (["checkout"], ["return"]):
+                return self.loan(parts[0], body or {}, query)
+            if method == "POST" and parts == ["batch"]:
+                return 200, self.batch(body)
+        except ApiError as error:
+            return error.status, {"error": error.error}
+        except (ValueError, TypeError, KeyError) as error:
+            return 400, {"error": "bad_request", "message": str(error)}
+        return 404, {"error": "no_route"}
+
+    def etag(self, path):
+        """Entity tag for a catalog GET, it changes with every library change.
+
+        None for other routes, their responses are tagged by content.
+        """
+        parts = [part for part in path.split("/") if part]
+        if not parts or parts[0] not in VERSIONED_ROUTES:
+            return None
+        return f'"{self.epoch}-{self.system.events.version}"'
+
+    def item_json(self, item):
+        return self.items_json.get(item.item_key, lambda: item_json(item))
+
+    def _item(self, item_id):
+        item = self.system.find_item(item_id)
+        if item is None:
+            raise ApiError(404, "not_found")
+        return item
+
+    # GET /items?kind=Book&sort=title&genre=...&available=true&cursor=...&limit=24
+    def list_items(self, query):
+        available = query.get("available")
+        page = self.system.list_items(
+            query.get("kind", "Book"),
+            sort=query.get("sort", "title"),
+            genre=query.get("genre"),
+            available=None if available is None else available == "true",
+            cursor=query.get("cursor"),
+            limit=_limit(query, 24, 200),
+            descending=query.get("descending") == "true",
+        )
+        return {
+            "items": [self.item_json(item) for item in page.items],
+            "next_cursor": page.next_cursor,
+        }
+
+    # GET /search?q=...&kind=Book&limit=20
+    def search(self, query):
+        items = self.system.search(
+            query.get("q", ""),
+            limit=_limit(query, 20, 200),
+            kind=query.get("kind"),
+        )
+        return {"items": [self.item_json(item) for item in items]}
+
+    # GET /items/<id>/recommendations?limit=5
+    def recommendations(self, item_id, query):
+        item = self._item(item_id)
+        items = self.system.recommend(item.item_key, limit=_limit(query, 5, 10))
+        return {"items": [self.item_json(other) for other in items]}
+
+    # POST /checkout and /return with {"item_id": ..., "member_id": ...},
+    # ?messages=true adds the display message
+    def loan(self, action, body, query):
+        item = self._item(body["item_id"])
+        member_id = body["member_id"]
+        if action == "checkout":
+            result = self.checkouts[item.__class__.__name__](item.item_key, member_id)
+        else:
+            result = self.system.return_item(item, member_id)
+        status = 200 if result.ok else 404 if result.error in NOT_FOUND else 409
+        return status, result_json(result, query.get("messages") == "true")
+
+    # POST /batch with [{"method": ..., "path": ..., "body": ...}, ...]
+    def batch(self, requests):
+        if not isinstance(requests, list):
+            raise ValueError("Batch body must be a list of requests")
+        responses = []
+        for request in requests:
+            split = urlsplit(request["path"])
+            status, payload = self.handle(
+                request.get("method", "GET"),
+                split.path,
+                _query(split.query),
+                request.get("body"),
+            )
+            responses.append({"status": status, "body": payload})
+        return responses
+
+
+def _query(text):
+    return {name: values[-1] for name, values in parse_qs(text).items()}
+
+
+def _etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open, so clients can pipeline requests
+    protocol_version = "HTTP/1.1"
+    # Small responses are sent at once instead of waiting on Nagle's algorithm
+    disable_nagle_algorithm = True
+    api = None  # LibraryApi, set by make_server
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        split = urlsplit(self.path)
+        body = None
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                self._send(400, {"error": "bad_json"})
+                return
+        etag = None
+        if method == "GET":
+            # Read before the response is built, a change made meanwhile
+            # leaves the client with an older tag that no longer matches
+            etag = self.api.etag(split.path)
+            # Nothing changed since the client's copy, so it is not rebuilt
+            if etag is not None and self.headers.get("If-None-Match") == etag:
+                self._not_modified(etag)
+                return
+        status, payload = self.api.handle(method, split.path, _query(split.query), body)
+        self._send(status, payload, etag, conditional=method == "GET")
+
+    def _not_modified(self, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send(self, status, payload, etag=None, conditional=False):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        if status != 200 or not conditional:
+            etag = None
+        elif etag is None:
+            etag = _etag(body)
+            if self.headers.get("If-None-Match") == etag:
+                self._not_modified(etag)
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging to stderr would dominate the cost of a request
+        pass
+
+
+def make_server(system, host="127.0.0.1", port=8080):
+    """Return a threading HTTP server for system, port 0 picks a free port"""
+    handler = type("LibraryApiHandler", (ApiHandler,), {"api": LibraryApi(system)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(system, host="127.0.0.1", port=0):
+    """Serve system on a background thread, returning the server"""
+    server = make_server(system, host, port)
+    # A short poll interval lets shutdown() return quickly
+    threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    ).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Library HTTP/JSON API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--db",
+        default=os.environ.get("LIBRARY_DB"),
+        help="SQLite database to serve (defaults to LIBRARY_DB)",
+    )
+    args = parser.parse_args()
+
+    storage = None
+    if args.db:
+        from library_ids import FileIdAllocator, set_allocator
+        from library_storage import SQLiteStorage
+
+        set_allocator(FileIdAllocator(args.db + ".ids"))
+        # The database belongs to this process alone, objects loaded from it
+        # are cached and would not see another process's writes
+        storage = SQLiteStorage(args.db)
+    # Each connection is served on its own thread
+    system = LibrarySystem(storage, concurrent=True)
+    system.preload_sample_data()
+    # Co-borrowing history for recommendations is collected from startup
+    system.recommender
+
+    server = make_server(system, args.host, args.port)
+    print(f"📡 Library API listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        system.flush()
+
+
+if __name__ == "__main__":
+    main()
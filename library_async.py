@@ -0,0 +1,128 @@
+"""
+Asyncio facade for the Library Management System
+Async find, checkout, return and register methods for async web handlers
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from zlib import crc32
+
+
+class AsyncLibrarySystem:
+    """Async wrapper around a LibrarySystem.
+
+    Checkouts and returns take an asyncio lock striped by item key, so
+    coroutines borrowing the same item queue up while other items proceed.
+    Reads take no lock. When the system has a storage backend or journal,
+    every call runs on a bounded thread pool so disk I/O never blocks the
+    event loop. Calls on a purely in-memory system run inline. Pass a
+    LibrarySystem(concurrent=True) when workers may touch different items
+    at once.
+    """
+
+    def __init__(self, system, max_workers=4, lock_stripes=64):
+        self.system = system
+        self.executor = None
+        if system.storage is not None or system.journal is not None:
+            self.executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="library-io"
+            )
+        self.locks = [asyncio.Lock() for _ in range(lock_stripes)]
+
+    def lock_for(self, key):
+        # Same stripe for a key as library_locks.LockStripes would pick
+        return self.locks[crc32(str(key).encode()) % len(self.locks)]
+
+    async def _call(self, function, *args):
+        if self.executor is None:
+            return function(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(function, *args)
+        )
+
+    async def _write(self, key, function, *args):
+        async with self.lock_for(key):
+            return await self._call(function, *args)
+
+    async def close(self):
+        """Wait for running calls and stop the worker threads"""
+        if self.executor is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.executor.shutdown
+            )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Reads
+    async def find_item(self, item_id):
+        return await self._call(self.system.find_item, item_id)
+
+    async def find_book_by_isbn(self, isbn):
+        return await self._call(self.system.find_book_by_isbn, isbn)
+
+    async def find_video_by_id(self, video_id):
+        return await self._call(self.system.find_video_by_id, video_id)
+
+    async def find_magazine_by_id(self, magazine_id):
+        return await self._call(self.system.find_magazine_by_id, magazine_id)
+
+    async def find_member(self, member_id):
+        return await self._call(self.system.find_member, member_id)
+
+    async def find_librarian(self, librarian_id):
+        return await self._call(self.system.find_librarian, librarian_id)
+
+    async def find_member_by_identity(self, fname, lname, email_address):
+        return await self._call(
+            self.system.find_member_by_identity, fname, lname, email_address
+        )
+
+    async def find_librarian_by_identity(self, fname, lname, email_address):
+        return await self._call(
+            self.system.find_librarian_by_identity, fname, lname, email_address
+        )
+
+    # Writes, serialized per item
+    async def checkout_book(self, isbn, member_id):
+        return await self._write(isbn, self.system.checkout_book, isbn, member_id)
+
+    async def return_book(self, isbn, member_id):
+        return await self._write(isbn, self.system.return_book, isbn, member_id)
+
+    async def checkout_video(self, video_id, member_id):
+        return await self._write(
+            video_id, self.system.checkout_video, video_id, member_id
+        )
+
+    async def return_video(self, video_id, member_id):
+        return await self._write(
+            video_id, self.system.return_video, video_id, member_id
+        )
+
+    async def checkout_magazine(self, magazine_id, member_id):
+        return await self._write(
+            magazine_id, self.system.checkout_magazine, magazine_id, member_id
+        )
+
+    async def return_magazine(self, magazine_id, member_id):
+        return await self._write(
+            magazine_id, self.system.return_magazine, magazine_id, member_id
+        )
+
+    async def return_item(self, item, member_id):
+        return await self._write(
+            item.item_key, self.system.return_item, item, member_id
+        )
+
+    # Registration checks identities under the system's own catalog lock
+    async def register_member(self, member):
+        return await self._call(self.system.register_member, member)
+
+    async def register_librarian(self, librarian):
+        return await self._call(self.system.register_librarian, librarian)
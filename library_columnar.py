@@ -0,0 +1,104 @@
+"""
+Columnar catalog store for the Library Management System
+Keeps item attributes in NumPy arrays so filters and aggregates are vectorized
+"""
+
+import numpy as np
+
+# Item kinds are stored as small integer codes
+KIND_CODES = {"Book": 0, "Video": 1, "Magazine": 2}
+
+
+class ColumnarCatalog:
+    """Parallel arrays for kind, year, genre code, availability and liveness"""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.years = np.zeros(capacity, dtype=np.int32)
+        self.genres = np.zeros(capacity, dtype=np.int32)
+        self.available = np.zeros(capacity, dtype=bool)
+        self.live = np.zeros(capacity, dtype=bool)  # False once an item is replaced
+        self.row_items = []  # Row number to item
+        self.rows = {}  # Key: item, Value: row number
+        self.genre_codes = {}  # Key: genre, Value: code
+        self.genre_names = []  # Code to genre
+
+    def _grow(self):
+        # Double every column so appends stay amortised O(1)
+        capacity = len(self.kinds) * 2
+        for name in ("kinds", "years", "genres", "available", "live"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+    def _genre_code(self, genre):
+        if genre not in self.genre_codes:
+            self.genre_codes[genre] = len(self.genre_names)
+            self.genre_names.append(genre)
+        return self.genre_codes[genre]
+
+    def add(self, item):
+        if self.size == len(self.kinds):
+            self._grow()
+        row = self.size
+        self.kinds[row] = KIND_CODES[item.__class__.__name__]
+        self.years[row] = item.year
+        self.genres[row] = self._genre_code(item.genre)
+        self.available[row] = item.is_available
+        self.live[row] = True
+        self.row_items.append(item)
+        self.rows[item] = row
+        self.size += 1
+
+    def remove(self, item):
+        row = self.rows.pop(item, None)
+        if row is not None:
+            self.live[row] = False
+            self.row_items[row] = None
+
+    def set_available(self, item, is_available):
+        row = self.rows.get(item)
+        if row is not None:
+            self.available[row] = is_available
+
+    def mask(self, kind=None, genre=None, year_from=None, year_to=None, available=None):
+        """Boolean array selecting live rows that match every filter"""
+        mask = self.live[: self.size].copy()
+        if kind is not None:
+            mask &= self.kinds[: self.size] == KIND_CODES[kind]
+        if genre is not None:
+            if genre not in self.genre_codes:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self.genres[: self.size] == self.genre_codes[genre]
+        if year_from is not None:
+            mask &= self.years[: self.size] >= year_from
+        if year_to is not None:
+            mask &= self.years[: self.size] <= year_to
+        if available is not None:
+            mask &= self.available[: self.size] == available
+        return mask
+
+    def count(self, **filters):
+        return int(np.count_nonzero(self.mask(**filters)))
+
+    def select(self, **filters):
+        """Return the items matching the filters, in catalog order"""
+        return [self.row_items[row] for row in np.flatnonzero(self.mask(**filters))]
+
+    def count_by_genre(self, **filters):
+        """Return {genre: count} for matching items"""
+        codes = self.genres[: self.size][self.mask(**filters)]
+        counts = np.bincount(codes, minlength=len(self.genre_names))
+        return {
+            self.genre_names[code]: int(total)
+            for code, total in enumerate(counts)
+            if total
+        }
+
+    def count_by_kind(self, **filters):
+        """Return {kind: count} for matching items"""
+        codes = self.kinds[: self.size][self.mask(**filters)]
+        counts = np.bincount(codes, minlength=len(KIND_CODES))
+        return {kind: int(counts[code]) for kind, code in KIND_CODES.items()}
@@ -0,0 +1,148 @@
+"""
+Due-date index for the Library Management System
+Loans by due date so overdue and due-soon queries only visit matches
+"""
+
+import heapq
+import threading
+from bisect import bisect_right
+from operator import attrgetter
+
+_due_at = attrgetter("due_at")
+
+
+class DueIndex:
+    """Active loans by due date, in two parts split at a moving boundary.
+
+    Loans due later than the boundary wait in a min-heap. Loans due at or
+    before it sit in a list sorted by due date, with the dates alongside
+    for bisect. A query first moves loans that have fallen due off the heap
+    onto the end of the list, then slices the list from its start date, so
+    a window starting now skips every overdue loan.
+
+    is_live(loan) tells whether a loan is still active. Returned loans are
+    dropped lazily: from the heap when they reach its top, and from both
+    parts once they make up half of the index.
+    """
+
+    def __init__(self, is_live):
+        self.heap = []
+        self.past = []  # Loans due at or before boundary, earliest first
+        self.past_due = []  # Their due dates, for bisect
+        self.boundary = float("-inf")
+        self.is_live = is_live
+        self.stale = 0
+        # Heap comparisons call Loan.__lt__, so parallel checkouts need a lock
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.heap) + len(self.past) - self.stale
+
+    def add_many(self, loans):
+        with self.lock:
+            boundary = self.boundary
+            append = self.heap.append
+            for loan in loans:
+                if loan.due_at > boundary:
+                    append(loan)
+                else:
+                    self._add_past(loan)
+            heapq.heapify(self.heap)
+
+    def add(self, loan):
+        with self.lock:
+            if loan.due_at > self.boundary:
+                heapq.heappush(self.heap, loan)
+            else:
+                self._add_past(loan)
+
+    def _add_past(self, loan):
+        position = bisect_right(self.past_due, loan.due_at)
+        self.past_due.insert(position, loan.due_at)
+        self.past.insert(position, loan)
+
+    def remove(self, loan):
+        with self.lock:
+            self.stale += 1
+            heap = self.heap
+            while heap and not self.is_live(heap[0]):
+                heapq.heappop(heap)
+                self.stale -= 1
+            if self.stale > (len(heap) + len(self.past)) // 2:
+                is_live = self.is_live
+                self.heap = [entry for entry in heap if is_live(entry)]
+                heapq.heapify(self.heap)
+                self.past = [entry for entry in self.past if is_live(entry)]
+                self.past_due = [entry.due_at for entry in self.past]
+                self.stale = 0
+
+    def _advance(self, when):
+        # Loans come off the heap in due order and all fall after the old
+        # boundary, so appending keeps the list sorted
+        if when <= self.boundary:
+            return
+        heap = self.heap
+        while heap and heap[0].due_at <= when:
+            loan = heapq.heappop(heap)
+            if self.is_live(loan):
+                self.past.append(loan)
+                self.past_due.append(loan.due_at)
+            else:
+                self.stale -= 1
+        self.boundary = when
+
+    def _slice(self, start, end):
+        # Live loans in the list due after start and at or before end
+        low = 0 if start is None else bisect_right(self.past_due, start)
+        high = bisect_right(self.past_due, end, low)
+        is_live = self.is_live
+        return [loan for loan in self.past[low:high] if is_live(loan)]
+
+    def due_by(self, when):
+        """Return active loans due at or before when, earliest first"""
+        with self.lock:
+            self._advance(when)
+            return self._slice(None, when)
+
+    def overdue(self, now):
+        """Active loans whose due date has passed"""
+        return [loan for loan in self.due_by(now) if loan.due_at < now]
+
+    def due_between(self, start, end):
+        """Active loans due after start and at or before end, earliest first.
+
+        Costs O(log n) plus the loans returned, overdue loans are not visited.
+        """
+        with self.lock:
+            self._advance(start)
+            results = self._slice(start, end)
+            if end > self.boundary:
+                later = []
+                self._collect(end, later)
+                # A key sort avoids calling Loan.__lt__ for every comparison
+                later.sort(key=_due_at)
+                results.extend(later)
+        return results
+
+    def _collect(self, when, results):
+        # Walks the heap from the root and stops at any node due later, so
+        # only matching loans and their direct children are visited
+        heap = self.heap
+        size = len(heap)
+        is_live = self.is_live
+        append = results.append
+        stack = [0] if heap else []
+        pop = stack.pop
+        push = stack.extend
+        while stack:
+            position = pop()
+            loan = heap[position]
+            if loan.due_at > when:
+                continue
+            if is_live(loan):
+                append(loan)
+            child = 2 * position + 1
+            if child + 1 < size:
+                push((child, child + 1))
+            elif child < size:
+                push((child,))
@@ -0,0 +1,118 @@
+"""
+Change notifications for the Library Management System
+Publishes catalog and loan changes under a monotonically increasing version
+"""
+
+import threading
+
+# Changes that can move items between listing and search pages
+CATALOG_KINDS = {"item_added", "items_added", "copies"}
+
+
+class Change:
+    __slots__ = ("version", "kind", "item_key", "member_id")
+
+    # kind is "item_added", "items_added", "copies", "availability",
+    # "loan_opened", "loan_closed" or "hold_ready". item_key is None for
+    # "items_added", which stands for a bulk load, and member_id is None
+    # for changes that concern no member
+    def __init__(self, version, kind, item_key=None, member_id=None):
+        self.version = version
+        self.kind = kind
+        self.item_key = item_key
+        self.member_id = member_id
+
+    def __repr__(self):
+        return f"Change({self.version}, {self.kind!r}, {self.item_key!r})"
+
+
+class ChangeBus:
+    """Versioned change events with per-item and per-member version stamps.
+
+    Every change bumps the version. A cache that remembers the version it
+    was built at can ask whether anything it depends on changed since,
+    without subscribing: catalog_version moves only when items are added
+    or gain copies, availability_version when an item goes on or off the
+    shelf, and item_version / member_version track single entries.
+    Subscribers are called after each change, outside the bus lock.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.catalog_version = 0
+        self.availability_version = 0
+        self.items = {}  # Key: item key, Value: version of its last change
+        self.members = {}  # Key: member ID, Value: version of its last change
+        # Replaced rather than mutated, so publish can iterate without the lock
+        self.subscribers = ()
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call callback(change) after every change, returning an unsubscribe"""
+        with self.lock:
+            self.subscribers = self.subscribers + (callback,)
+
+        def unsubscribe():
+            with self.lock:
+                self.subscribers = tuple(
+                    subscriber
+                    for subscriber in self.subscribers
+                    if subscriber is not callback
+                )
+
+        return unsubscribe
+
+    def publish(self, kind, item_key=None, member_id=None):
+        with self.lock:
+            self.version += 1
+            version = self.version
+            if item_key is not None:
+                self.items[item_key] = version
+            if member_id is not None:
+                self.members[member_id] = version
+            if kind in CATALOG_KINDS:
+                self.catalog_version = version
+            elif kind == "availability":
+                self.availability_version = version
+            subscribers = self.subscribers
+        if subscribers:
+            change = Change(version, kind, item_key, member_id)
+            for callback in subscribers:
+                callback(change)
+        return version
+
+    def item_version(self, item_key):
+        return self.items.get(item_key, 0)
+
+    def member_version(self, member_id):
+        return self.members.get(member_id, 0)
+
+    def changed_since(self, version, item_keys=()):
+        """Whether the catalog or any of item_keys changed after version"""
+        if self.catalog_version > version:
+            return True
+        items = self.items
+        return any(items.get(key, 0) > version for key in item_keys)
+
+
+class ChangeCache:
+    """Values cached by item key, rebuilt only after their item changed.
+
+    Each value is stamped with the bus version read before it was built, so
+    a change racing with the build still invalidates it. Catalog changes
+    invalidate every value.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.values = {}  # Key: item key, Value: (version, value)
+
+    def get(self, item_key, build):
+        """The cached value for item_key, calling build() when it is stale"""
+        entry = self.values.get(item_key)
+        if entry is not None and not self.events.changed_since(entry[0], (item_key,)):
+            return entry[1]
+        version = self.events.version
+        value = build()
+        self.values[item_key] = (version, value)
+        return value
@@ -0,0 +1,178 @@
+"""
+Hold queues for the Library Management System
+Per-item waitlists served by priority tier, then first come first served
+"""
+
+import heapq
+import itertools
+import threading
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# Lower tiers are served first
+TIERS = {"priority": 0, "standard": 1}
+# Days a hold waits in the queue before it lapses
+HOLD_DAYS = 90
+# Days a member has to collect an item once their hold is ready
+PICKUP_DAYS = 3
+
+
+class Hold:
+    __slots__ = (
+        "item_key",
+        "member",
+        "tier",
+        "sequence",
+        "placed_at",
+        "expires_at",
+        "status",
+    )
+
+    # status is "waiting", "ready", "fulfilled", "cancelled" or "expired"
+    def __init__(self, item_key, member, tier, sequence, placed_at, expires_at):
+        self.item_key = item_key
+        self.member = member
+        self.tier = tier
+        self.sequence = sequence
+        self.placed_at = placed_at
+        self.expires_at = expires_at
+        self.status = "waiting"
+
+    @property
+    def active(self):
+        return self.status in ("waiting", "ready")
+
+    # Queues are ordered by tier, then by when the hold was placed
+    def __lt__(self, other):
+        return (self.tier, self.sequence) < (other.tier, other.sequence)
+
+
+class HoldQueues:
+    """Waiting holds in one heap per item, plus one expiry heap for all of them.
+
+    Cancelled and expired holds are dropped lazily: they stay in their item's
+    heap until they reach the top or the heap is rebuilt, which happens once
+    they make up half of it. Expiry entries whose hold has moved on are
+    skipped the same way, so a sweep only visits holds that are due.
+    """
+
+    def __init__(self):
+        self.queues = {}  # Key: item key, Value: heap of Holds
+        self.stale = {}  # Key: item key, Value: inactive Holds left in its heap
+        self.ready = {}  # Key: item key, Value: {member ID: Hold waiting for pickup}
+        self.by_member = {}  # Key: member ID, Value: {item key: active Hold}
+        self.expiry = []  # Heap of (expires_at, sequence, Hold)
+        self.sequence = itertools.count()
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return sum(len(holds) for holds in self.by_member.values())
+
+    def place(self, item_key, member, now, tier="standard"):
+        """Queue a hold, returning it, or the member's existing one for the item"""
+        if tier not in TIERS:
+            raise ValueError(f"Unknown hold tier '{tier}'")
+        with self.lock:
+            holds = self.by_member.setdefault(member.member_id, {})
+            if item_key in holds:
+                return holds[item_key]
+            hold = Hold(
+                item_key,
+                member,
+                TIERS[tier],
+                next(self.sequence),
+                now,
+                now + HOLD_DAYS * SECONDS_PER_DAY,
+            )
+            holds[item_key] = hold
+            heapq.heappush(self.queues.setdefault(item_key, []), hold)
+            heapq.heappush(self.expiry, (hold.expires_at, hold.sequence, hold))
+            return hold
+
+    def waiting(self, item_key):
+        """Number of holds queued for an item, not counting ready ones"""
+        with self.lock:
+            return len(self.queues.get(item_key, ())) - self.stale.get(item_key, 0)
+
+    def ready_holds(self, item_key):
+        return self.ready.get(item_key, {})
+
+    def holds_for(self, member_id):
+        with self.lock:
+            return list(self.by_member.get(member_id, {}).values())
+
+    def promote(self, item_key, now):
+        """Make the next waiting hold for an item ready for pickup, in O(log n)"""
+        with self.lock:
+            queue = self.queues.get(item_key)
+            while queue:
+                hold = heapq.heappop(queue)
+                if hold.status == "waiting":
+                    break
+                self.stale[item_key] -= 1
+            else:
+                return None
+            if not queue:
+                self._drop_queue(item_key)
+            hold.status = "ready"
+            hold.expires_at = now + PICKUP_DAYS * SECONDS_PER_DAY
+            self.ready.setdefault(item_key, {})[hold.member.member_id] = hold
+            heapq.heappush(self.expiry, (hold.expires_at, hold.sequence, hold))
+            return hold
+
+    def fulfil(self, hold):
+        with self.lock:
+            self._close(hold, "fulfilled")
+
+    def cancel(self, hold):
+        with self.lock:
+            if hold.active:
+                self._close(hold, "cancelled")
+
+    def expire(self, now):
+        """Close every hold whose expiry has passed, returning them.
+
+        Pops the expiry heap only while its top is due, so the sweep costs
+        O(k log n) for k expired holds.
+        """
+        expired = []
+        with self.lock:
+            expiry = self.expiry
+            while expiry and expiry[0][0] <= now:
+                expires_at, _, hold = heapq.heappop(expiry)
+                # A hold that became ready since has a later entry of its own
+                if hold.active and hold.expires_at == expires_at:
+                    self._close(hold, "expired")
+                    expired.append(hold)
+        return expired
+
+    def _close(self, hold, status):
+        was_waiting = hold.status == "waiting"
+        hold.status = status
+        holds = self.by_member.get(hold.member.member_id, {})
+        if holds.get(hold.item_key) is hold:
+            del holds[hold.item_key]
+            if not holds:
+                del self.by_member[hold.member.member_id]
+        ready = self.ready.get(hold.item_key, {})
+        if ready.get(hold.member.member_id) is hold:
+            del ready[hold.member.member_id]
+            if not ready:
+                del self.ready[hold.item_key]
+        if was_waiting:
+            self._mark_stale(hold.item_key)
+
+    def _mark_stale(self, item_key):
+        queue = self.queues[item_key]
+        stale = self.stale[item_key] = self.stale.get(item_key, 0) + 1
+        if stale > len(queue) // 2:
+            queue = [hold for hold in queue if hold.status == "waiting"]
+            if not queue:
+                self._drop_queue(item_key)
+                return
+            heapq.heapify(queue)
+            self.queues[item_key] = queue
+            self.stale[item_key] = 0
+
+    def _drop_queue(self, item_key):
+        del self.queues[item_key]
+        self.stale.pop(item_key, None)
@@ -0,0 +1,139 @@
+"""
+ID allocation for the Library Management System
+Hands out item and person numbers in blocks (hi/lo) so allocation inside a
+block needs no lock, and several processes can share one counter file
+"""
+
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Sequences used by the library classes
+SEQUENCES = ("video", "magazine", "member", "librarian")
+
+
+class IdAllocator:
+    """Process-local allocator, each sequence counts up from 1"""
+
+    def __init__(self, block_size=1000):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}  # Key: sequence, Value: (first number, iterator)
+        self._floors = {}  # Key: sequence, Value: lowest number still allowed
+        self._next = {}  # Key: sequence, Value: first number of the next block
+
+    def next_id(self, sequence):
+        """Return the next unused number in sequence"""
+        while True:
+            block = self._blocks.get(sequence)
+            if block is not None:
+                # next() on a range iterator is atomic, so no lock is needed here
+                try:
+                    return next(block[1])
+                except StopIteration:
+                    pass
+            with self._lock:
+                # Another thread may already have replaced the used-up block
+                if self._blocks.get(sequence) is block:
+                    first = self._reserve(sequence, self._floors.get(sequence, 1))
+                    numbers = iter(range(first, first + self.block_size))
+                    self._blocks[sequence] = (first, numbers)
+
+    def ensure_above(self, sequence, number):
+        """Never hand out number or anything below it again, e.g. after loading data"""
+        with self._lock:
+            if number >= self._floors.get(sequence, 1):
+                self._floors[sequence] = number + 1
+            block = self._blocks.get(sequence)
+            if block is not None and block[0] <= number:
+                del self._blocks[sequence]
+
+    def _reserve(self, sequence, minimum):
+        first = max(self._next.get(sequence, 1), minimum)
+        self._next[sequence] = first + self.block_size
+        return first
+
+
+class FileIdAllocator(IdAllocator):
+    """Reserves blocks from a counter file shared by every process on the host.
+
+    The file holds the next unreserved number per sequence and is replaced
+    atomically under an exclusive lock on path + ".lock", so a crash never
+    leaves it half written. Numbers in blocks that are not used up are
+    skipped, IDs stay unique but can have gaps.
+    """
+
+    def __init__(self, path, block_size=1000):
+        super().__init__(block_size)
+        self.path = path
+
+    def _reserve(self, sequence, minimum):
+        with open(self.path + ".lock", "a+b") as lock_file:
+            _lock_file(lock_file)
+            try:
+                counters = self._read()
+                first = max(counters.get(sequence, 1), minimum)
+                counters[sequence] = first + self.block_size
+                self._write(counters)
+            finally:
+                _unlock_file(lock_file)
+        return first
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, counters):
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(counters, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, self.path)
+
+
+def _lock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Allocator used by Video, Magazine, Member and Librarian
+_allocator = IdAllocator()
+
+
+def get_allocator():
+    return _allocator
+
+
+def set_allocator(allocator):
+    """Replace the allocator, e.g. with a FileIdAllocator in each server worker"""
+    global _allocator
+    _allocator = allocator
+
+
+def next_id(sequence):
+    return _allocator.next_id(sequence)
+
+
+def ensure_above(sequence, number):
+    _allocator.ensure_above(sequence, number)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Bulk catalog import for the Library Management System
+Streams CSV or JSONL files into LibrarySystem in validated batches
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from library_system import Book, LibrarySystem, Magazine, Video
+
+# Only the first rejections are kept in detail so memory stays bounded
+MAX_REJECTED_DETAILS = 1000
+
+# Columns every row needs, by item type
+REQUIRED_FIELDS = {
+    "book": ("title", "year", "genre", "author", "isbn"),
+    "video": ("title", "year", "genre", "video_format", "duration"),
+    "magazine": ("title", "year", "genre", "publisher"),
+}
+
+
+class ImportReport:
+    """Counts and timings for one import run"""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.rows_rejected = 0
+        self.rejected = []  # (row number, reason) for the first rejected rows
+        self.elapsed = 0.0
+
+    def reject(self, row_number, reason):
+        self.rows_rejected += 1
+        if len(self.rejected) < MAX_REJECTED_DETAILS:
+            self.rejected.append((row_number, reason))
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"📥 Imported {self.rows_imported:,} of {self.rows_read:,} rows "
+            f"in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s), "
+            f"{self.rows_rejected:,} rejected"
+        )
+
+
+def read_rows(path, file_format=None):
+    """Yield one dict per row without loading the whole file"""
+    file_format = file_format or os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, newline="", encoding="utf-8") as handle:
+        if file_format == "csv":
+            yield from csv.DictReader(handle)
+        elif file_format in ("jsonl", "ndjson"):
+            for line in handle:
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError as error:
+                        yield {"_error": f"invalid JSON: {error.msg}"}
+                        continue
+                    if not isinstance(row, dict):
+                        row = {"_error": "row is not a JSON object"}
+                    yield row
+        else:
+            raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def build_item(row):
+    """Validate a row and build its item, raising ValueError with the reason"""
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    item_type = str(row.get("type", "")).strip().lower()
+    if item_type not in REQUIRED_FIELDS:
+        raise ValueError(f"unknown type '{row.get('type')}'")
+
+    values = {}
+    for field in REQUIRED_FIELDS[item_type]:
+        value = row.get(field)
+        if value is None or str(value).strip() == "":
+            raise ValueError(f"missing {field}")
+        values[field] = value.strip() if isinstance(value, str) else value
+
+    for field in ("year", "duration"):
+        if field in values:
+            try:
+                values[field] = int(values[field])
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be a whole number")
+
+    if item_type == "book":
+        return Book(
+            values["title"],
+            values["year"],
+            values["genre"],
+            values["author"],
+            str(values["isbn"]),
+        )
+    if item_type == "video":
+        return Video(
+            values["title"],
+            values["year"],
+            values["genre"],
+            values["video_format"],
+            values["duration"],
+        )
+    return Magazine(
+        values["title"], values["year"], values["genre"], values["publisher"]
+    )
+
+
+def import_catalog(system, path, batch_size=5000, file_format=None):
+    """Stream a CSV or JSONL catalog file into system and return an ImportReport"""
+    report = ImportReport()
+    start = time.perf_counter()
+    batch = []
+    for row_number, row in enumerate(read_rows(path, file_format), start=1):
+        report.rows_read += 1
+        try:
+            batch.append(build_item(row))
+        except ValueError as error:
+            report.reject(row_number, str(error))
+            continue
+        if len(batch) >= batch_size:
+            report.rows_imported += system.bulk_add_items(batch)
+            batch = []
+    if batch:
+        report.rows_imported += system.bulk_add_items(batch)
+    system.flush()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a catalog file")
+    parser.add_argument("path", help="CSV or JSONL file to import")
+    parser.add_argument("--db", help="SQLite database to import into")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    storage = None
+    if args.db:
+        from library_storage import SQLiteStorage
+
+        storage = SQLiteStorage(args.db)
+    system = LibrarySystem(storage)
+    report = import_catalog(system, args.path, batch_size=args.batch_size)
+    print(report.summary())
+    for row_number, reason in report.rejected[:20]:
+        print(f"  ❌ row {row_number}: {reason}")
+    if storage is not None:
+        storage.close()
+    return report.rows_rejected == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
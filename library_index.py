@@ -0,0 +1,139 @@
+"""
+Secondary indexes for the Library Management System
+Answers genre, author, publisher, format and year queries without scanning
+"""
+
+from bisect import bisect_left, bisect_right
+
+# Attributes indexed by exact (case-insensitive) value
+HASH_FIELDS = ("genre", "author", "publisher", "video_format")
+
+
+def _normalise(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+class CatalogIndex:
+    """Hash indexes per attribute plus a sorted year index and an availability set"""
+
+    def __init__(self):
+        # Dicts are used as insertion-ordered sets so results keep catalog order
+        self.by_kind = {}  # Key: class name, Value: {item: None}
+        self.by_field = {field: {} for field in HASH_FIELDS}
+        self.years = []  # Sorted years, parallel to year_items
+        self.year_items = []
+        self.available = {}  # Items that can currently be borrowed
+
+    def add_many(self, items):
+        """Index many items, sorting the year index once at the end"""
+        for item in items:
+            self.add(item, keep_sorted=False)
+        # A stable sort keeps items of the same year in catalog order
+        order = sorted(range(len(self.years)), key=self.years.__getitem__)
+        self.years = [self.years[i] for i in order]
+        self.year_items = [self.year_items[i] for i in order]
+
+    def add(self, item, keep_sorted=True):
+        self.by_kind.setdefault(item.__class__.__name__, {})[item] = None
+        for field in HASH_FIELDS:
+            value = getattr(item, field, None)
+            if value is not None:
+                self.by_field[field].setdefault(_normalise(value), {})[item] = None
+
+        if keep_sorted:
+            # Insert after equal years so items of the same year stay in order
+            position = bisect_right(self.years, item.year)
+            self.years.insert(position, item.year)
+            self.year_items.insert(position, item)
+        else:
+            self.years.append(item.year)
+            self.year_items.append(item)
+
+        if item.is_available:
+            self.available[item] = None
+
+    def remove(self, item):
+        self.by_kind.get(item.__class__.__name__, {}).pop(item, None)
+        for field in HASH_FIELDS:
+            value = getattr(item, field, None)
+            if value is not None:
+                bucket = self.by_field[field].get(_normalise(value), {})
+                bucket.pop(item, None)
+                if not bucket:
+                    self.by_field[field].pop(_normalise(value), None)
+
+        start = bisect_left(self.years, item.year)
+        end = bisect_right(self.years, item.year)
+        for position in range(start, end):
+            if self.year_items[position] is item:
+                del self.years[position]
+                del self.year_items[position]
+                break
+
+        self.available.pop(item, None)
+
+    def set_available(self, item, is_available):
+        if is_available:
+            self.available[item] = None
+        else:
+            self.available.pop(item, None)
+
+    def values(self, field, kind=None):
+        """Return the distinct values of an indexed field, sorted"""
+        values = set()
+        for bucket in self.by_field[field].values():
+            for item in bucket:
+                if kind is None or item.__class__.__name__ == kind:
+                    values.add(getattr(item, field))
+                    break
+        return sorted(values)
+
+    def query(
+        self,
+        kind=None,
+        genre=None,
+        author=None,
+        publisher=None,
+        video_format=None,
+        year=None,
+        year_from=None,
+        year_to=None,
+        available=None,
+    ):
+        """Return items matching every given filter"""
+        candidates = []
+        if kind is not None:
+            candidates.append(self.by_kind.get(kind, {}))
+        for field, value in (
+            ("genre", genre),
+            ("author", author),
+            ("publisher", publisher),
+            ("video_format", video_format),
+        ):
+            if value is not None:
+                candidates.append(self.by_field[field].get(_normalise(value), {}))
+
+        if year is not None:
+            year_from = year_to = year
+        if year_from is not None or year_to is not None:
+            start = 0 if year_from is None else bisect_left(self.years, year_from)
+            end = (
+                len(self.years)
+                if year_to is None
+                else bisect_right(self.years, year_to)
+            )
+            candidates.append(dict.fromkeys(self.year_items[start:end]))
+
+        if available is True:
+            candidates.append(self.available)
+
+        if not candidates:
+            candidates.append(dict.fromkeys(self.year_items))
+
+        # Walk the smallest candidate set and probe the others
+        candidates.sort(key=len)
+        smallest, others = candidates[0], candidates[1:]
+        results = [item for item in smallest if all(item in other for other in others)]
+        if available is False:
+            results = [item for item in results if item not in self.available]
+        return results
@@ -0,0 +1,410 @@
+"""
+Operation journal for the Library Management System
+Append-only binary log of state changes with snapshots and replay recovery
+"""
+
+import glob
+import json
+import os
+import struct
+import threading
+import zlib
+
+from library_ids import ensure_above
+from library_system import (
+    Book,
+    Librarian,
+    Loan,
+    Magazine,
+    Member,
+    Video,
+    _intern,
+)
+from library_storage import _restore
+
+# Every record is framed as <payload length><CRC32 of payload><payload>
+HEADER = struct.Struct("<II")
+# Payload fields are joined with the ASCII unit separator. Checkout and
+# return records stay plain text so the hot path never calls json.dumps
+SEPARATOR = "\x1f"
+
+# Snapshots store items in chunks so loading decodes a few large records
+SNAPSHOT_CHUNK = 10_000
+
+SEGMENT_PATTERN = "segment-*.log"
+SNAPSHOT_PATTERN = "snapshot-*.snap"
+
+
+# Record conversion
+def item_record(item):
+    record = {
+        "kind": item.__class__.__name__,
+        "key": item.item_key,
+        "title": item.title,
+        "year": item.year,
+        "genre": item.genre,
+        "available": item.is_available,
+    }
+    if item._free is not None:
+        record["copies"] = item.copies
+        record["free"] = item._free
+    if isinstance(item, Book):
+        record["author"] = item.author
+    elif isinstance(item, Video):
+        record["video_format"] = item.video_format
+        record["duration"] = item.duration
+    else:
+        record["publisher"] = item.publisher
+    return record
+
+
+def build_item(record):
+    # Attributes are set directly, this runs once per item on every restart
+    kind = record["kind"]
+    if kind == "Book":
+        item = Book.__new__(Book)
+        item.author = record["author"]
+        item.isbn = record["key"]
+    elif kind == "Video":
+        item = Video.__new__(Video)
+        item.video_format = _intern(record["video_format"])
+        item.duration = record["duration"]
+        item.video_id = record["key"]
+    else:
+        item = Magazine.__new__(Magazine)
+        item.publisher = _intern(record["publisher"])
+        item.magazine_id = record["key"]
+    item.title = record["title"]
+    item.year = record["year"]
+    item.genre = _intern(record["genre"])
+    item._is_available = record["available"]
+    item.copies = record.get("copies", 1)
+    item._free = record.get("free")
+    item.observer = None
+    return item
+
+
+def person_record(person):
+    return {
+        "role": person.get_role(),
+        "id": person.member_id if isinstance(person, Member) else person.librarian_id,
+        "fname": person.fname,
+        "lname": person.lname,
+        "email_address": person.email_address,
+    }
+
+
+def build_person(record):
+    common = {
+        "fname": record["fname"],
+        "lname": record["lname"],
+        "email_address": record["email_address"],
+    }
+    if record["role"] == "Librarian":
+        return _restore(
+            Librarian, librarian_id=record["id"], registered_items=[], **common
+        )
+    return _restore(Member, member_id=record["id"], loans={}, **common)
+
+
+def _checkout_args(loan):
+    return (
+        loan.item.item_key,
+        loan.member.member_id,
+        repr(loan.checked_out_at),
+        repr(loan.due_at),
+        str(loan.copy),
+    )
+
+
+# Framed file access
+def _frame(*fields):
+    payload = SEPARATOR.join(fields).encode()
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _json(record):
+    return json.dumps(record, separators=(",", ":"))
+
+
+def read_records(path):
+    """Yield the fields of each record, stopping at the first torn or corrupt frame"""
+    for _, fields in _read_frames(path):
+        yield fields
+
+
+def _read_frames(path):
+    # Yields (offset just past the frame, fields) for each intact frame
+    with open(path, "rb") as handle:
+        while True:
+            header = handle.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            length, checksum = HEADER.unpack(header)
+            payload = handle.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            yield handle.tell(), payload.decode().split(SEPARATOR)
+
+
+def _sequence_of(path):
+    return int(os.path.basename(path).split("-")[1].split(".")[0])
+
+
+class Journal:
+    """Append-only journal of LibrarySystem operations.
+
+    Records are fsynced every fsync_every appends. A snapshot written by
+    compact() makes older segments redundant, so recovery loads the latest
+    snapshot and replays only the journal tail after it.
+    """
+
+    def __init__(self, directory, fsync_every=64, segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.sequence = 0  # Sequence number of the last record written
+        self.records_since_snapshot = 0
+        self._file = None
+        self._unsynced = 0
+        self._stop = threading.Event()
+        self._compactor = None
+
+    # Recovery
+    def recover(self, system):
+        """Load the latest snapshot into system and replay the journal tail"""
+        covered = self._load_snapshot(system)
+        self.sequence = covered
+        for path in sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN))):
+            end = 0
+            for end, (sequence, op, *args) in _read_frames(path):
+                sequence = int(sequence)
+                if sequence <= covered:
+                    continue
+                self._apply(system, op, args)
+                self.sequence = sequence
+                self.records_since_snapshot += 1
+            # Cut off a torn tail. When the torn record was a segment's
+            # first, the new segment takes that segment's name and appends
+            if end < os.path.getsize(path):
+                with open(path, "r+b") as handle:
+                    handle.truncate(end)
+        _restore_counters(system)
+        self._open_segment()
+
+    def _load_snapshot(self, system):
+        snapshots = sorted(glob.glob(os.path.join(self.directory, SNAPSHOT_PATTERN)))
+        for path in reversed(snapshots):
+            records = list(read_records(path))
+            # Only snapshots that were written to the end marker are used
+            if not records or records[-1] != ["end", str(len(records) - 2)]:
+                continue
+            for record in records[1:-1]:
+                self._apply(system, record[0], record[1:])
+            return int(records[0][1])
+        return 0
+
+    def _apply(self, system, op, args):
+        # Replay is idempotent, so records already in a snapshot are harmless
+        if op == "item":
+            item = build_item(json.loads(args[0]))
+            system._catalog_for(item)[item.item_key] = item
+        elif op == "items":
+            items = [build_item(record) for record in json.loads(args[0])]
+            for item in items:
+                system._catalog_for(item)[item.item_key] = item
+        elif op == "person":
+            person = build_person(json.loads(args[0]))
+            if isinstance(person, Member):
+                system.members[person.member_id] = person
+            else:
+                system.librarians[person.librarian_id] = person
+        elif op == "copies":
+            # Records carry the new total so replaying one twice is harmless
+            item = system.find_item(args[0])
+            if item is not None and item.copies < int(args[1]):
+                item.add_copies(int(args[1]) - item.copies)
+        elif op in ("checkout", "loan"):
+            # A journaled checkout is authoritative, even over a snapshot
+            # that caught the item mid-change
+            item = system.find_item(args[0])
+            member = system.members.get(args[1])
+            if item is None or member is None or member.has_borrowed(item):
+                return
+            # Records written before loans had due dates or copies carry
+            # neither
+            times = [float(value) for value in args[2:4]]
+            copy = int(args[4]) if len(args) > 4 else 1
+            loan = Loan(item, member, *times, copy=copy)
+            holder = system.loans.get(loan.key)
+            if holder is not None:
+                holder.member.loans.pop(item.item_key, None)
+            item._take_copy(copy)
+            member.loans[item.item_key] = loan
+            system.loans[loan.key] = loan
+        elif op == "batch":
+            for entry in json.loads(args[0]):
+                self._apply(system, entry[0], entry[1:])
+        elif op == "return":
+            item = system.find_item(args[0])
+            member = system.members.get(args[1])
+            if item is None or member is None:
+                return
+            if member.has_borrowed(item):
+                loan = member.loans.pop(item.item_key)
+                system.loans.pop(loan.key, None)
+                item._put_back(loan.copy)
+            elif item._free is None and item.item_key not in system.loans:
+                item.is_available = True
+
+    # Appending
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"segment-{self.sequence + 1:012d}.log")
+        self._file = open(path, "ab")
+
+    def append(self, op, *args):
+        with self.lock:
+            self.sequence += 1
+            self._file.write(_frame(str(self.sequence), op, *args))
+            self._unsynced += 1
+            self.records_since_snapshot += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+            if self._file.tell() >= self.segment_bytes:
+                self._rotate()
+
+    def record_item(self, item):
+        self.append("item", _json(item_record(item)))
+
+    def record_items(self, items):
+        self.append("items", _json([item_record(item) for item in items]))
+
+    def record_person(self, person):
+        self.append("person", _json(person_record(person)))
+
+    def record_checkout(self, loan):
+        self.append("checkout", *_checkout_args(loan))
+
+    def record_copies(self, item):
+        self.append("copies", item.item_key, str(item.copies))
+
+    def record_return(self, item, member):
+        self.append("return", item.item_key, member.member_id)
+
+    def record_batch(self, checkouts, returns):
+        # One record, so a batch torn by a crash is dropped as a whole
+        entries = [["checkout", *_checkout_args(loan)] for loan in checkouts]
+        entries += [
+            ["return", loan.item.item_key, loan.member.member_id] for loan in returns
+        ]
+        self.append("batch", _json(entries))
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+        self._open_segment()
+
+    def flush(self):
+        """Force buffered records to disk"""
+        with self.lock:
+            self._sync()
+
+    # Snapshots and compaction
+    def compact(self, system):
+        """Write a snapshot of system and delete the segments and snapshots it replaces"""
+        with self.lock:
+            self._rotate()
+            covered = self.sequence
+        old_segments = [
+            path
+            for path in glob.glob(os.path.join(self.directory, SEGMENT_PATTERN))
+            if _sequence_of(path) <= covered
+        ]
+        old_snapshots = glob.glob(os.path.join(self.directory, SNAPSHOT_PATTERN))
+
+        # Records appended while the snapshot is written are replayed on top of it
+        path = os.path.join(self.directory, f"snapshot-{covered:012d}.snap")
+        self._write_snapshot(system, covered, path)
+        for old in old_segments + old_snapshots:
+            if old != path:
+                os.remove(old)
+        self.records_since_snapshot = self.sequence - covered
+        return path
+
+    def _write_snapshot(self, system, covered, path):
+        count = 0
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(_frame("sequence", str(covered)))
+            for catalog in (system.books, system.videos, system.magazines):
+                items = list(catalog.values())
+                for start in range(0, len(items), SNAPSHOT_CHUNK):
+                    chunk = items[start : start + SNAPSHOT_CHUNK]
+                    handle.write(
+                        _frame("items", _json([item_record(item) for item in chunk]))
+                    )
+                    count += 1
+            for people in (system.members, system.librarians):
+                for person in list(people.values()):
+                    handle.write(_frame("person", _json(person_record(person))))
+                    count += 1
+            for loan in list(system.loans.values()):
+                handle.write(
+                    _frame(
+                        "loan",
+                        loan.item.item_key,
+                        loan.member.member_id,
+                        repr(loan.checked_out_at),
+                        repr(loan.due_at),
+                        str(loan.copy),
+                    )
+                )
+                count += 1
+            handle.write(_frame("end", str(count)))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+
+    def start_background_compaction(self, system, interval=60.0, min_records=100_000):
+        """Compact on a daemon thread once min_records have been appended"""
+
+        def run():
+            while not self._stop.wait(interval):
+                if self.records_since_snapshot >= min_records:
+                    self.compact(system)
+
+        self._compactor = threading.Thread(target=run, daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self.lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+
+def _restore_counters(system):
+    # Continue numbering after the highest recovered ID
+    for sequence, numbers in (
+        ("video", (video.video_number for video in system.videos.values())),
+        ("magazine", (item.magazine_number for item in system.magazines.values())),
+        ("member", (member.member_number for member in system.members.values())),
+        (
+            "librarian",
+            (person.librarian_number for person in system.librarians.values()),
+        ),
+    ):
+        highest = max(numbers, default=None)
+        if highest is not None:
+            ensure_above(sequence, highest)
@@ -0,0 +1,36 @@
+"""
+Lock striping for the Library Management System
+Spreads item locks over a fixed pool so unrelated checkouts do not contend
+"""
+
+import threading
+from contextlib import contextmanager
+from zlib import crc32
+
+
+class LockStripes:
+    """Fixed pool of locks, each item key always maps to the same stripe"""
+
+    def __init__(self, stripes=64):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe(self, key):
+        # crc32 is stable across processes, unlike hash() on strings
+        return crc32(str(key).encode()) % len(self.locks)
+
+    def lock_for(self, key):
+        return self.locks[self.stripe(key)]
+
+    @contextmanager
+    def hold(self, keys):
+        """Hold the stripes for several keys, always acquired in stripe order"""
+        stripes = sorted({self.stripe(key) for key in keys})
+        acquired = []
+        try:
+            for stripe in stripes:
+                self.locks[stripe].acquire()
+                acquired.append(stripe)
+            yield
+        finally:
+            for stripe in reversed(acquired):
+                self.locks[stripe].release()
@@ -0,0 +1,190 @@
+"""
+Sorted, paginated listings for the Library Management System
+Keeps each item kind in sorted order so a page costs O(page size + log n)
+"""
+
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right
+
+
+# Sort keys end with the item key, so every item has a unique position
+def _title_key(item):
+    return (item.title.casefold(), item.item_key)
+
+
+def _year_key(item):
+    return (item.year, item.title.casefold(), item.item_key)
+
+
+def _availability_key(item):
+    # Available items first
+    return (not item.is_available, item.title.casefold(), item.item_key)
+
+
+def _availability_year_key(item):
+    return (not item.is_available, item.year, item.title.casefold(), item.item_key)
+
+
+SORT_KEYS = {"title": _title_key, "year": _year_key, "availability": _availability_key}
+# Every sorted list kept, the availability ones also serve filtered pages
+LIST_KEYS = dict(SORT_KEYS, availability_year=_availability_year_key)
+# Sort to the list ordered by availability first, then by that sort
+FILTERED_LISTS = {
+    "title": "availability",
+    "year": "availability_year",
+    "availability": "availability",
+}
+
+
+def page_sorts(sort, available):
+    """The list a page is read from and the sort its cursors are tagged with"""
+    if available is None:
+        return sort, sort
+    return FILTERED_LISTS[sort], sort + (":available" if available else ":checked_out")
+
+
+def encode_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort, key]).encode()).decode()
+
+
+def decode_cursor(cursor, sort):
+    try:
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort '{cursor_sort}', not '{sort}'")
+    return tuple(key)
+
+
+class Page:
+    """One page of a listing and the cursor for the next one (None on the last)"""
+
+    __slots__ = ("items", "next_cursor")
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+class SortedListing:
+    """Sorted lists per (kind, genre, sort), genre None holding the whole kind.
+
+    Lists ordered by availability first also answer pages filtered by
+    availability, the matching items being one contiguous run of them.
+    """
+
+    def __init__(self):
+        self.lists = {}  # Key: (kind, genre, sort), Value: (sort keys, items)
+        # Checkouts of different items move them in the same lists
+        self.lock = threading.RLock()
+
+    def _list_keys(self, item):
+        kind = item.__class__.__name__
+        genre = item.genre.casefold() if isinstance(item.genre, str) else item.genre
+        for sort in LIST_KEYS:
+            yield (kind, None, sort)
+            yield (kind, genre, sort)
+
+    def add_many(self, items):
+        """Add many items, sorting each list once at the end"""
+        with self.lock:
+            for item in items:
+                for list_key in self._list_keys(item):
+                    keys, members = self.lists.setdefault(list_key, ([], []))
+                    keys.append(LIST_KEYS[list_key[2]](item))
+                    members.append(item)
+            for list_key, (keys, members) in self.lists.items():
+                order = sorted(range(len(keys)), key=keys.__getitem__)
+                self.lists[list_key] = (
+                    [keys[i] for i in order],
+                    [members[i] for i in order],
+                )
+
+    def add(self, item):
+        with self.lock:
+            for list_key in self._list_keys(item):
+                self._insert(list_key, LIST_KEYS[list_key[2]](item), item)
+
+    def remove(self, item):
+        with self.lock:
+            for list_key in self._list_keys(item):
+                self._delete(list_key, LIST_KEYS[list_key[2]](item), item)
+
+    def set_available(self, item, is_available):
+        # Only the lists ordered by availability depend on it, move it there
+        with self.lock:
+            for list_key in self._list_keys(item):
+                sort = list_key[2]
+                if sort in ("availability", "availability_year"):
+                    new_key = LIST_KEYS[sort](item)
+                    old_key = (is_available,) + new_key[1:]
+                    if self._delete(list_key, old_key, item):
+                        self._insert(list_key, new_key, item)
+
+    def _insert(self, list_key, key, item):
+        keys, members = self.lists.setdefault(list_key, ([], []))
+        position = bisect_right(keys, key)
+        keys.insert(position, key)
+        members.insert(position, item)
+
+    def _delete(self, list_key, key, item):
+        keys, members = self.lists.get(list_key, ([], []))
+        position = bisect_left(keys, key)
+        while position < len(keys) and keys[position] == key:
+            if members[position] is item:
+                del keys[position]
+                del members[position]
+                return True
+            position += 1
+        return False
+
+    def page(
+        self,
+        kind,
+        sort="title",
+        genre=None,
+        available=None,
+        cursor=None,
+        limit=24,
+        descending=False,
+    ):
+        """Return the Page of items after cursor, in sort order.
+
+        available=True or False keeps only items that are or are not on the
+        shelf. Cursors from filtered pages only continue filtered pages.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort '{sort}'")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        if isinstance(genre, str):
+            genre = genre.casefold()
+        list_sort, cursor_sort = page_sorts(sort, available)
+        with self.lock:
+            keys, members = self.lists.get((kind, genre, list_sort), ([], []))
+            low, high = 0, len(keys)
+            if available is not None:
+                # Keys start with "not available", so the matches are one run
+                low = bisect_left(keys, (not available,))
+                if available:
+                    high = bisect_left(keys, (True,), low)
+            if cursor is not None:
+                key = decode_cursor(cursor, cursor_sort)
+                if descending:
+                    high = max(low, min(high, bisect_left(keys, key)))
+                else:
+                    low = min(high, max(low, bisect_right(keys, key)))
+            if descending:
+                positions = range(high - 1, max(low, high - limit) - 1, -1)
+                more = high - limit > low
+            else:
+                positions = range(low, min(high, low + limit))
+                more = low + limit < high
+            items = [members[position] for position in positions]
+            next_cursor = None
+            if more:
+                next_cursor = encode_cursor(cursor_sort, keys[positions[-1]])
+        return Page(items, next_cursor)
@@ -0,0 +1,188 @@
+"""
+Co-borrowing recommendations for the Library Management System
+"Members who borrowed this also borrowed" from a sparse member x item matrix
+"""
+
+import threading
+
+import numpy as np
+
+# Suggestions kept per item, recommend() serves up to this many
+TOP_K = 10
+# Co-borrow pairs expanded per scoring batch, bounds its memory
+BATCH_PAIRS = 1 << 22
+
+
+def _gather(indptr, indices, rows):
+    """Concatenate CSR rows, returning each entry's position in rows and value"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    # Offset of every entry within its own row, added to that row's start
+    offsets = np.arange(int(lengths.sum())) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return owners, indices[np.repeat(starts, lengths) + offsets]
+
+
+def _insert(codes, new):
+    """Merge sorted unique codes into a sorted array, returning it and the
+    codes that were not in it yet"""
+    positions = np.searchsorted(codes, new)
+    found = positions < len(codes)
+    found[found] = codes[positions[found]] == new[found]
+    fresh = new[~found]
+    return np.insert(codes, positions[~found], fresh), fresh
+
+
+def _indptr(keys, size):
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr
+
+
+class CoBorrowing:
+    """Binary member x item borrow matrix in CSR form plus its item x member
+    transpose, with item-item cosine top-k lists cached per item.
+
+    Borrows are appended in O(1) and merged in one vectorized pass on the
+    next refresh. A new borrow only raises the co-occurrence counts of items
+    its member has borrowed, so only those items are rescored, in batches.
+    It also raises the borrowed item's count, which can only lower its score
+    in other items' lists, so a list is rescored on its own when it is served
+    after the count of an item in it changed.
+    """
+
+    def __init__(self, top_k=TOP_K, batch_pairs=BATCH_PAIRS):
+        self.top_k = top_k
+        self.batch_pairs = batch_pairs
+        self.members = {}  # Key: member ID, Value: row
+        self.items = {}  # Key: item key, Value: column
+        self.item_keys = []  # Column to item key
+        # Borrows as sorted packed (row << 32 | col) and (col << 32 | row)
+        # codes, so new ones are merged in without sorting the rest again
+        self.codes = np.zeros(0, dtype=np.int64)
+        self.item_codes = np.zeros(0, dtype=np.int64)
+        # CSR: the items of member row r are cols[indptr[r]:indptr[r + 1]]
+        self.cols = np.zeros(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        # CSC: the borrowers of item column c, laid out the same way
+        self.borrowers = np.zeros(0, dtype=np.int64)
+        self.item_indptr = np.zeros(1, dtype=np.int64)
+        # Borrows not merged yet
+        self.pending_rows = []
+        self.pending_cols = []
+        self.top = {}  # Key: column, Value: (columns, scores, generation)
+        # Refresh generation at which each column's borrower count last grew
+        self.generation = 0
+        self.grown = np.zeros(0, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        self.refresh()
+        return len(self.codes)
+
+    def add(self, member_id, item_key):
+        """Record that a member borrowed an item, repeat borrows count once"""
+        with self.lock:
+            self._append(member_id, item_key)
+
+    def add_many(self, borrows):
+        """Record (member ID, item key) pairs"""
+        with self.lock:
+            for member_id, item_key in borrows:
+                self._append(member_id, item_key)
+
+    def _append(self, member_id, item_key):
+        row = self.members.setdefault(member_id, len(self.members))
+        col = self.items.get(item_key)
+        if col is None:
+            col = self.items[item_key] = len(self.item_keys)
+            self.item_keys.append(item_key)
+        self.pending_rows.append(row)
+        self.pending_cols.append(col)
+
+    def changed(self, change):
+        """ChangeBus subscriber, every opened loan is a borrow"""
+        if change.kind == "loan_opened":
+            self.add(change.member_id, change.item_key)
+
+    def refresh(self):
+        """Merge pending borrows and rescore the items they affect"""
+        with self.lock:
+            if not self.pending_cols:
+                return
+            rows = np.array(self.pending_rows, dtype=np.int64)
+            cols = np.array(self.pending_cols, dtype=np.int64)
+            self.pending_rows = []
+            self.pending_cols = []
+            self.codes, fresh = _insert(self.codes, np.unique((rows << 32) | cols))
+            if not len(fresh):
+                # Only repeat borrows, nothing to rescore
+                return
+            rows = fresh >> 32
+            cols = fresh & 0xFFFFFFFF
+            self.item_codes, _ = _insert(self.item_codes, np.sort((cols << 32) | rows))
+            self.cols = self.codes & 0xFFFFFFFF
+            self.indptr = _indptr(self.codes >> 32, len(self.members))
+            self.borrowers = self.item_codes & 0xFFFFFFFF
+            self.item_indptr = _indptr(self.item_codes >> 32, len(self.item_keys))
+            self.generation += 1
+            grown = np.zeros(len(self.item_keys), dtype=np.int64)
+            grown[: len(self.grown)] = self.grown
+            grown[cols] = self.generation
+            self.grown = grown
+            _, touched = _gather(self.indptr, self.cols, np.unique(rows))
+            self._score(np.unique(touched))
+
+    def _score(self, columns):
+        size = len(self.item_keys)
+        norms = np.sqrt(np.diff(self.item_indptr).astype(np.float64))
+        # Co-borrow pairs each item expands to: its borrowers' history lengths
+        lengths = np.diff(self.indptr)
+        work = np.bincount(
+            self.item_codes >> 32, lengths[self.borrowers], minlength=size
+        )[columns]
+        batches = (np.cumsum(work) - work) // self.batch_pairs
+        bounds = np.flatnonzero(np.diff(batches)) + 1
+        for chunk in np.split(columns, bounds):
+            self._score_batch(chunk, norms)
+
+    def _score_batch(self, chunk, norms):
+        size = len(self.item_keys)
+        # Borrowers of each item in the chunk, then everything they borrowed
+        owners, members = _gather(self.item_indptr, self.borrowers, chunk)
+        via, others = _gather(self.indptr, self.cols, members)
+        # Counting packed (position, other item) pairs gives the sparse
+        # co-occurrence rows of the whole chunk at once
+        pairs, together = np.unique(owners[via] * size + others, return_counts=True)
+        owner = pairs // size
+        other = pairs % size
+        mine = other != chunk[owner]
+        owner, other, together = owner[mine], other[mine], together[mine]
+        # Cosine similarity of the binary borrower columns
+        scores = together / (norms[chunk[owner]] * norms[other])
+        order = np.lexsort((-scores, owner))
+        owner, other, scores = owner[order], other[order], scores[order]
+        starts = np.searchsorted(owner, np.arange(len(chunk) + 1))
+        generation = self.generation
+        for position, col in enumerate(chunk):
+            start = starts[position]
+            end = min(starts[position + 1], start + self.top_k)
+            self.top[int(col)] = (other[start:end], scores[start:end], generation)
+
+    def recommend(self, item_key, limit=TOP_K):
+        """Return up to limit (item key, cosine score) pairs, best first"""
+        self.refresh()
+        with self.lock:
+            col = self.items.get(item_key)
+            if col is None or col not in self.top:
+                return []
+            picked, values, generation = self.top[col]
+            if len(picked) and self.grown[picked].max() > generation:
+                self._score(np.array([col]))
+                picked, values, _ = self.top[col]
+            return [
+                (self.item_keys[other], float(score))
+                for other, score in zip(picked[:limit], values[:limit])
+            ]
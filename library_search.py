@@ -0,0 +1,138 @@
+"""
+Full-text search for the Library Management System
+Inverted index over titles, authors, genres and publishers ranked with BM25
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+# Item attributes that are searchable
+SEARCH_FIELDS = ("title", "author", "genre", "publisher")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Standard BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """Split text into case-folded tokens with accents removed ("Ibrahimović" -> "ibrahimovic")"""
+    if text.isascii():
+        return TOKEN_PATTERN.findall(text.lower())
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return TOKEN_PATTERN.findall(stripped.casefold())
+
+
+class SearchIndex:
+    """Incrementally updated inverted index with BM25 ranking and prefix queries"""
+
+    def __init__(self):
+        self.postings = {}  # Key: token, Value: {doc_id: term frequency}
+        self.vocabulary = []  # Sorted tokens for prefix lookups
+        self.doc_lengths = {}  # Key: doc_id, Value: number of tokens
+        self.doc_terms = {}  # Key: doc_id, Value: {token: frequency}, used for removal
+        self.items = {}  # Key: doc_id, Value: item
+        self.doc_ids = {}  # Key: item, Value: doc_id
+        self.total_length = 0
+        self.next_doc_id = 0
+
+    def add_many(self, items):
+        """Index many items, sorting the vocabulary once at the end"""
+        for item in items:
+            self.add(item, keep_sorted=False)
+        self.vocabulary = sorted(self.postings)
+
+    def add(self, item, keep_sorted=True):
+        tokens = []
+        for field in SEARCH_FIELDS:
+            value = getattr(item, field, None)
+            if value:
+                tokens.extend(tokenize(str(value)))
+
+        doc_id = self.next_doc_id
+        self.next_doc_id += 1
+        self.items[doc_id] = item
+        self.doc_ids[item] = doc_id
+
+        terms = {}
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+        for token, frequency in terms.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                if keep_sorted:
+                    insort(self.vocabulary, token)
+            self.postings[token][doc_id] = frequency
+
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, item):
+        doc_id = self.doc_ids.pop(item, None)
+        if doc_id is None:
+            return
+        for token in self.doc_terms.pop(doc_id):
+            postings = self.postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        del self.items[doc_id]
+
+    def expand_prefix(self, prefix):
+        """Return every indexed token starting with prefix"""
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\U0010ffff")
+        return self.vocabulary[start:end]
+
+    def search(self, query, limit=20, prefix=True, kind=None):
+        """Return (item, score) pairs best match first.
+
+        With prefix=True the last query term also matches longer tokens,
+        so "ibra" finds "Ibrahimović".
+        """
+        terms = tokenize(query)
+        if not terms or not self.items:
+            return []
+
+        doc_count = len(self.items)
+        average_length = self.total_length / doc_count
+        scores = {}
+        for position, term in enumerate(terms):
+            if prefix and position == len(terms) - 1:
+                expansions = self.expand_prefix(term)
+            else:
+                expansions = [term] if term in self.postings else []
+
+            # A document scores once per query term, using its best expansion
+            term_scores = {}
+            for token in expansions:
+                postings = self.postings[token]
+                idf = math.log(
+                    1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for doc_id, frequency in postings.items():
+                    length_norm = 1 - B + B * self.doc_lengths[doc_id] / average_length
+                    score = idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+                    if score > term_scores.get(doc_id, 0):
+                        term_scores[doc_id] = score
+            for doc_id, score in term_scores.items():
+                scores[doc_id] = scores.get(doc_id, 0) + score
+
+        if kind is not None:
+            scores = {
+                doc_id: score
+                for doc_id, score in scores.items()
+                if self.items[doc_id].__class__.__name__ == kind
+            }
+        ranked = heapq.nlargest(
+            limit, scores.items(), key=lambda pair: (pair[1], -pair[0])
+        )
+        return [(self.items[doc_id], score) for doc_id, score in ranked]
@@ -0,0 +1,559 @@
+"""
+Sharded mode for the Library Management System
+Hash-partitions items and members over worker processes behind a router
+with the LibrarySystem interface
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from zlib import crc32
+
+from library_holds import Hold
+from library_journal import build_item, build_person, item_record, person_record
+from library_pages import LIST_KEYS, Page, encode_cursor, page_sorts
+from library_system import (
+    BatchItemResult,
+    BatchResult,
+    LibrarySystem,
+    Loan,
+    Member,
+    Result,
+)
+
+
+def shard_of(key, shards):
+    # crc32 is stable across processes, unlike hash() on strings
+    return crc32(str(key).encode()) % shards
+
+
+# Items and people cross the process boundary as journal records, so the
+# worker's LibrarySystem (held in item.observer) is never pickled
+def _result_reply(result):
+    item = None if result.item is None else item_record(result.item)
+    return (result.action, result.error, item, result.kind)
+
+
+def _result(reply):
+    action, error, item, kind = reply
+    return Result(action, error, None if item is None else build_item(item), kind)
+
+
+def _hold_reply(hold):
+    return (
+        hold.item_key,
+        person_record(hold.member),
+        hold.tier,
+        hold.sequence,
+        hold.placed_at,
+        hold.expires_at,
+        hold.status,
+    )
+
+
+def _hold(reply):
+    item_key, member, tier, sequence, placed_at, expires_at, status = reply
+    hold = Hold(item_key, build_person(member), tier, sequence, placed_at, expires_at)
+    hold.status = status
+    return hold
+
+
+# Worker side, each operation runs against the shard's own LibrarySystem
+def _op_add_item(system, record):
+    item = build_item(record)
+    add = {
+        "Book": system.add_book,
+        "Video": system.add_video,
+        "Magazine": system.add_magazine,
+    }[record["kind"]]
+    return _result_reply(add(item))
+
+
+def _op_add_items(system, records):
+    return system.bulk_add_items([build_item(record) for record in records])
+
+
+def _op_find_item(system, item_id):
+    item = system.find_item(item_id)
+    return None if item is None else item_record(item)
+
+
+def _op_register(system, record):
+    person = build_person(record)
+    if isinstance(person, Member):
+        system.register_member(person)
+    else:
+        system.register_librarian(person)
+
+
+def _op_find_person(system, role, person_id):
+    people = system.members if role == "Member" else system.librarians
+    person = people.get(person_id)
+    return None if person is None else person_record(person)
+
+
+def _op_member_loans(system, member_id):
+    member = system.members.get(member_id)
+    if member is None:
+        return []
+    return [
+        (item_record(loan.item), loan.copy, loan.checked_out_at, loan.due_at)
+        for loan in list(member.loans.values())
+    ]
+
+
+def _replica(system, member):
+    # Members borrowing from a shard other than their home one get a local
+    # replica there to hold the loans and holds of that shard's items
+    replica = system.members.get(member["id"])
+    if replica is None:
+        replica = build_person(member)
+        system.members[replica.member_id] = replica
+    return replica
+
+
+def _op_loan(system, action, item_id, member):
+    item = system.find_item(item_id)
+    if item is None:
+        return (action, "not_found", None, "Item")
+    if member is None:
+        return _result_reply(Result(action, "member_not_found", item))
+    replica = _replica(system, member)
+    if action == "checkout":
+        return _result_reply(system._borrow(item, replica))
+    return _result_reply(system._give_back(item, replica))
+
+
+def _op_loans(system, operations):
+    return [_op_loan(system, *operation) for operation in operations]
+
+
+def _op_batch(system, member, operations):
+    batch = system.process_batch(_replica(system, member).member_id, operations)
+    return batch.success, [
+        (
+            result.item_id,
+            result.action,
+            result.success,
+            result.error,
+            None if result.item is None else item_record(result.item),
+        )
+        for result in batch.results
+    ]
+
+
+def _op_count(system):
+    return sum(
+        len(catalog) for catalog in (system.books, system.videos, system.magazines)
+    )
+
+
+def _op_search(system, query, limit, kind):
+    return [
+        (score, item_record(item))
+        for item, score in system.search_index.search(query, limit=limit, kind=kind)
+    ]
+
+
+def _op_list_items(system, *args):
+    page = system.list_items(*args)
+    return [item_record(item) for item in page.items], page.next_cursor is not None
+
+
+def _op_place_hold(system, item_id, member, tier):
+    member_id = None if member is None else _replica(system, member).member_id
+    return _result_reply(system.place_hold(item_id, member_id, tier))
+
+
+def _op_cancel_hold(system, item_id, member_id):
+    return system.cancel_hold(item_id, member_id)
+
+
+def _op_holds_for(system, member_id):
+    return [_hold_reply(hold) for hold in system.holds_for(member_id)]
+
+
+def _op_expire_holds(system, now):
+    return [_hold_reply(hold) for hold in system.expire_holds(now)]
+
+
+OPERATIONS = {
+    "add_item": _op_add_item,
+    "add_items": _op_add_items,
+    "find_item": _op_find_item,
+    "register": _op_register,
+    "find_person": _op_find_person,
+    "member_loans": _op_member_loans,
+    "loan": _op_loan,
+    "loans": _op_loans,
+    "batch": _op_batch,
+    "count": _op_count,
+    "search": _op_search,
+    "list_items": _op_list_items,
+    "place_hold": _op_place_hold,
+    "cancel_hold": _op_cancel_hold,
+    "holds_for": _op_holds_for,
+    "expire_holds": _op_expire_holds,
+}
+
+
+def _serve_shard(conn):
+    system = LibrarySystem()
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        name, args = request
+        try:
+            conn.send((True, OPERATIONS[name](system, *args)))
+        except Exception as error:
+            conn.send((False, error))
+    conn.close()
+
+
+class _Shard:
+    """Pipe to one worker process, one request in flight at a time"""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve_shard, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()
+
+    def send(self, name, *args):
+        self.conn.send((name, args))
+
+    def receive(self):
+        ok, value = self.conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def call(self, name, *args):
+        with self.lock:
+            self.send(name, *args)
+            return self.receive()
+
+
+class ShardedLibrarySystem:
+    """LibrarySystem interface over items and members hash-partitioned
+    across worker processes.
+
+    An item lives on the shard its key hashes to, which alone decides its
+    availability, so a checkout is one round trip to that shard even when
+    the member's home shard is another one: the router sends the member's
+    record along and the item's shard keeps the loan. A member's loans are
+    gathered from every shard when the member is looked up.
+
+    Holds live with their item on its shard too. Searches, listings and a
+    member's holds ask every shard and merge the replies. Search scores use
+    each shard's own term statistics, so the merged ranking is close to a
+    single index's rather than identical. Listing cursors carry the last
+    sort key, which every shard can continue from.
+
+    process_batch is all or nothing within one shard only, so a batch whose
+    items live on different shards is refused with "cross_shard" errors.
+
+    Objects returned by the router are detached copies, change the library
+    through its methods. IDs are allocated in the router process, so new
+    objects are created here as usual and then shipped to their shard.
+    Shards keep their data in memory.
+    """
+
+    def __init__(self, shards=None, start_method=None):
+        context = multiprocessing.get_context(start_method)
+        self.shards = [_Shard(context) for _ in range(shards or os.cpu_count())]
+        # Member records are immutable, so they are cached for checkouts
+        self._members = {}
+        # Registrations are rare, emails are checked for uniqueness here
+        self._identities = {}  # Key: (role, email), Value: person ID
+        self._register_lock = threading.Lock()
+
+    def close(self):
+        for shard in self.shards:
+            with shard.lock:
+                shard.conn.send(None)
+        for shard in self.shards:
+            shard.process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def shard_for(self, key):
+        return self.shards[shard_of(key, len(self.shards))]
+
+    def _fan_out(self, name, args_by_shard):
+        """Send one request to each listed shard, then collect the replies,
+        so the shards work in parallel"""
+        # Locks are taken in shard order so concurrent fan-outs cannot deadlock
+        indexes = sorted(args_by_shard)
+        shards = [self.shards[index] for index in indexes]
+        for shard in shards:
+            shard.lock.acquire()
+        try:
+            for index, shard in zip(indexes, shards):
+                shard.send(name, *args_by_shard[index])
+            return {index: shard.receive() for index, shard in zip(indexes, shards)}
+        finally:
+            for shard in shards:
+                shard.lock.release()
+
+    # Catalog
+    def _add(self, item):
+        return _result(
+            self.shard_for(item.item_key).call("add_item", item_record(item))
+        )
+
+    def add_book(self, book):
+        return self._add(book)
+
+    def add_video(self, video):
+        return self._add(video)
+
+    def add_magazine(self, magazine):
+        return self._add(magazine)
+
+    def bulk_add_items(self, items):
+        groups = {}
+        for item in items:
+            index = shard_of(item.item_key, len(self.shards))
+            groups.setdefault(index, []).append(item_record(item))
+        added = self._fan_out(
+            "add_items", {index: (records,) for index, records in groups.items()}
+        )
+        return sum(added.values())
+
+    def find_item(self, item_id):
+        record = self.shard_for(item_id).call("find_item", item_id)
+        return None if record is None else build_item(record)
+
+    def find_book_by_isbn(self, isbn):
+        return self.find_item(isbn)
+
+    def find_video_by_id(self, video_id):
+        return self.find_item(video_id)
+
+    def find_magazine_by_id(self, magazine_id):
+        return self.find_item(magazine_id)
+
+    def _all_shards(self, name, *args):
+        return self._fan_out(name, {i: args for i in range(len(self.shards))})
+
+    def count_items(self):
+        return sum(self._all_shards("count").values())
+
+    def search(self, query, limit=20, kind=None):
+        """Each shard's best matches, merged by score"""
+        replies = self._all_shards("search", query, limit, kind)
+        scored = [entry for entries in replies.values() for entry in entries]
+        scored.sort(key=lambda entry: -entry[0])
+        return [build_item(record) for _, record in scored[:limit]]
+
+    def list_items(
+        self,
+        kind,
+        sort="title",
+        genre=None,
+        available=None,
+        cursor=None,
+        limit=24,
+        descending=False,
+    ):
+        """One Page merged from every shard's page after the same cursor"""
+        replies = self._all_shards(
+            "list_items", kind, sort, genre, available, cursor, limit, descending
+        )
+        list_sort, cursor_sort = page_sorts(sort, available)
+        key = LIST_KEYS[list_sort]
+        items = [
+            build_item(record) for records, _ in replies.values() for record in records
+        ]
+        items.sort(key=key, reverse=descending)
+        more = len(items) > limit or any(more for _, more in replies.values())
+        items = items[:limit]
+        next_cursor = encode_cursor(cursor_sort, key(items[-1])) if more else None
+        return Page(items, next_cursor)
+
+    # People
+    def _register(self, person, person_id):
+        with self._register_lock:
+            email = (person.get_role(), person.email_address.strip().casefold())
+            if email in self._identities:
+                raise ValueError(
+                    f"❌ A {person.get_role().lower()} with email "
+                    f"{person.email_address} is already registered."
+                )
+            self.shard_for(person_id).call("register", person_record(person))
+            self._identities[email] = person_id
+        return person
+
+    def register_member(self, member):
+        return self._register(member, member.member_id)
+
+    def register_librarian(self, librarian):
+        return self._register(librarian, librarian.librarian_id)
+
+    def _member_record(self, member_id):
+        record = self._members.get(member_id)
+        if record is None:
+            record = self.shard_for(member_id).call("find_person", "Member", member_id)
+            if record is not None:
+                self._members[member_id] = record
+        return record
+
+    def find_member(self, member_id):
+        """Return a detached Member with the loans held on every shard"""
+        record = self._member_record(member_id)
+        if record is None:
+            return None
+        member = build_person(record)
+        replies = self._fan_out(
+            "member_loans", {i: (member_id,) for i in range(len(self.shards))}
+        )
+        for loans in replies.values():
+            for item, copy, checked_out_at, due_at in loans:
+                item = build_item(item)
+                member.loans[item.item_key] = Loan(
+                    item, member, checked_out_at, due_at, copy
+                )
+        return member
+
+    def find_librarian(self, librarian_id):
+        record = self.shard_for(librarian_id).call(
+            "find_person", "Librarian", librarian_id
+        )
+        return None if record is None else build_person(record)
+
+    def _find_by_identity(self, role, fname, lname, email_address):
+        person_id = self._identities.get((role, email_address.strip().casefold()))
+        if person_id is None:
+            return None
+        if role == "Member":
+            person = self.find_member(person_id)
+        else:
+            person = self.find_librarian(person_id)
+        if (
+            person is not None
+            and person.fname.strip().casefold() == fname.strip().casefold()
+            and person.lname.strip().casefold() == lname.strip().casefold()
+        ):
+            return person
+        return None
+
+    def find_member_by_identity(self, fname, lname, email_address):
+        return self._find_by_identity("Member", fname, lname, email_address)
+
+    def find_librarian_by_identity(self, fname, lname, email_address):
+        return self._find_by_identity("Librarian", fname, lname, email_address)
+
+    # Loans, always decided by the item's shard
+    def _loan(self, action, item_id, member_id):
+        member = self._member_record(member_id)
+        reply = self.shard_for(item_id).call("loan", action, item_id, member)
+        return _result(reply)
+
+    def checkout_book(self, isbn, member_id):
+        return self._loan("checkout", isbn, member_id)
+
+    def return_book(self, isbn, member_id):
+        return self._loan("return", isbn, member_id)
+
+    def checkout_video(self, video_id, member_id):
+        return self._loan("checkout", video_id, member_id)
+
+    def return_video(self, video_id, member_id):
+        return self._loan("return", video_id, member_id)
+
+    def checkout_magazine(self, magazine_id, member_id):
+        return self._loan("checkout", magazine_id, member_id)
+
+    def return_magazine(self, magazine_id, member_id):
+        return self._loan("return", magazine_id, member_id)
+
+    def return_item(self, item, member_id):
+        return self._loan("return", item.item_key, member_id)
+
+    def apply_loans(self, operations):
+        """Run many (action, item_id, member_id) checkouts and returns.
+
+        action is "checkout" or "return". Operations are grouped by the
+        item's shard and every shard works through its group in parallel,
+        in the given order. Returns Results in the order of operations.
+        """
+        groups = {}
+        for position, (action, item_id, member_id) in enumerate(operations):
+            index = shard_of(item_id, len(self.shards))
+            entry = (action, item_id, self._member_record(member_id))
+            positions, entries = groups.setdefault(index, ([], []))
+            positions.append(position)
+            entries.append(entry)
+        replies = self._fan_out(
+            "loans", {index: (entries,) for index, (_, entries) in groups.items()}
+        )
+        results = [None] * len(operations)
+        for index, (positions, _) in groups.items():
+            for position, reply in zip(positions, replies[index]):
+                results[position] = _result(reply)
+        return results
+
+    def process_batch(self, member_id, operations):
+        """Apply (item_id, action) pairs for one member, all or nothing.
+
+        Only batches whose items share a shard are applied, the shard
+        decides them as LibrarySystem.process_batch does.
+        """
+        member = self._member_record(member_id)
+        indexes = {shard_of(item_id, len(self.shards)) for item_id, _ in operations}
+        error = None
+        if member is None:
+            error = "member_not_found"
+        elif len(indexes) > 1:
+            error = "cross_shard"
+        if error is not None or not operations:
+            return BatchResult(
+                error is None,
+                [
+                    BatchItemResult(item_id, action, False, error)
+                    for item_id, action in operations
+                ],
+            )
+        success, replies = self.shards[indexes.pop()].call("batch", member, operations)
+        return BatchResult(
+            success,
+            [
+                BatchItemResult(
+                    item_id,
+                    action,
+                    ok,
+                    error,
+                    None if item is None else build_item(item),
+                )
+                for item_id, action, ok, error, item in replies
+            ],
+        )
+
+    # Holds, kept with the item on its shard
+    def place_hold(self, item_id, member_id, tier="standard"):
+        member = self._member_record(member_id)
+        reply = self.shard_for(item_id).call("place_hold", item_id, member, tier)
+        return _result(reply)
+
+    def cancel_hold(self, item_id, member_id):
+        return self.shard_for(item_id).call("cancel_hold", item_id, member_id)
+
+    def holds_for(self, member_id):
+        """A member's active holds on every shard, ready ones first"""
+        replies = self._all_shards("holds_for", member_id)
+        holds = [_hold(reply) for entries in replies.values() for reply in entries]
+        return sorted(holds, key=lambda hold: (hold.status != "ready", hold.placed_at))
+
+    def expire_holds(self, now=None):
+        """Expire holds on every shard against the router's clock"""
+        now = time.time() if now is None else now
+        replies = self._all_shards("expire_holds", now)
+        return [_hold(reply) for entries in replies.values() for reply in entries]
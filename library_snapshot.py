@@ -0,0 +1,359 @@
+"""
+Memory-mapped snapshots for the Library Management System
+Fixed-layout binary catalog files that are opened in constant time and
+materialise items and people only when they are looked up
+"""
+
+import mmap
+import os
+import struct
+import threading
+from collections.abc import MutableMapping
+
+from library_ids import SEQUENCES, ensure_above
+from library_system import Book, Librarian, Loan, Magazine, Member, Video, _intern
+from library_storage import _free_copies, _parse_free_copies, _restore
+
+MAGIC = b"LIBSNAP3"
+
+# Sections in file order, each a run of fixed-size records sorted by key
+SECTIONS = ("Book", "Video", "Magazine", "Member", "Librarian", "Loan")
+KIND_CODES = {"Book": 0, "Video": 1, "Magazine": 2}
+KINDS = ("Book", "Video", "Magazine")
+
+# Header: magic, (offset, count) per section, then the highest number used
+# in each ID sequence
+HEADER = struct.Struct("<8s" + "QQ" * len(SECTIONS) + "Q" * len(SEQUENCES))
+
+# Strings are (offset, length) references into the UTF-8 string heap.
+# Item: key, title, genre, author/format/publisher, free copies, year,
+# duration, available, copies. Free copies is a comma separated free list,
+# empty for single copies
+ITEM = struct.Struct("<10Iii?xH")
+# Person: key, fname, lname, email, first loan row, loan count
+PERSON = struct.Struct("<10I")
+# Loan: item key, member ID, kind code, copy, checkout time, due time,
+# grouped by member
+LOAN = struct.Struct("<4IBxHdd")
+KEY_REF = struct.Struct("<II")
+
+
+class _StringHeap:
+    """Collects strings for the writer, storing each distinct value once"""
+
+    def __init__(self, base):
+        self.base = base
+        self.chunks = []
+        self.size = 0
+        self.refs = {}
+
+    def ref(self, text):
+        if text not in self.refs:
+            data = str(text).encode()
+            self.refs[text] = (self.base + self.size, len(data))
+            self.chunks.append(data)
+            self.size += len(data)
+        return self.refs[text]
+
+
+def _person_id(person):
+    return person.member_id if isinstance(person, Member) else person.librarian_id
+
+
+def write_snapshot(system, path):
+    """Write every item, person and loan in system to a snapshot file at path"""
+    sections = {
+        "Book": sorted(system.books.values(), key=lambda item: item.item_key),
+        "Video": sorted(system.videos.values(), key=lambda item: item.item_key),
+        "Magazine": sorted(system.magazines.values(), key=lambda item: item.item_key),
+        "Member": sorted(system.members.values(), key=_person_id),
+        "Librarian": sorted(system.librarians.values(), key=_person_id),
+    }
+    sections["Loan"] = [
+        loan for member in sections["Member"] for loan in member.loans.values()
+    ]
+
+    # Records come straight after the header, the string heap after them
+    offsets = {}
+    position = HEADER.size
+    for name in SECTIONS:
+        offsets[name] = position
+        layout = ITEM if name in KIND_CODES else LOAN if name == "Loan" else PERSON
+        position += layout.size * len(sections[name])
+    heap = _StringHeap(position)
+
+    records = []
+    for kind in KINDS:
+        for item in sections[kind]:
+            if kind == "Book":
+                extra, duration = item.author, 0
+            elif kind == "Video":
+                extra, duration = item.video_format, item.duration
+            else:
+                extra, duration = item.publisher, 0
+            records.append(
+                ITEM.pack(
+                    *heap.ref(item.item_key),
+                    *heap.ref(item.title),
+                    *heap.ref(item.genre),
+                    *heap.ref(extra),
+                    *heap.ref(_free_copies(item) or ""),
+                    item.year,
+                    duration,
+                    item.is_available,
+                    item.copies,
+                )
+            )
+    loan_row = 0
+    for role in ("Member", "Librarian"):
+        for person in sections[role]:
+            count = len(person.loans) if role == "Member" else 0
+            records.append(
+                PERSON.pack(
+                    *heap.ref(_person_id(person)),
+                    *heap.ref(person.fname),
+                    *heap.ref(person.lname),
+                    *heap.ref(person.email_address),
+                    loan_row,
+                    count,
+                )
+            )
+            loan_row += count
+    for loan in sections["Loan"]:
+        records.append(
+            LOAN.pack(
+                *heap.ref(loan.item.item_key),
+                *heap.ref(loan.member.member_id),
+                KIND_CODES[loan.item.__class__.__name__],
+                loan.copy,
+                loan.checked_out_at,
+                loan.due_at,
+            )
+        )
+
+    header = HEADER.pack(
+        MAGIC,
+        *[value for name in SECTIONS for value in (offsets[name], len(sections[name]))],
+        max((video.video_number for video in sections["Video"]), default=0),
+        max((item.magazine_number for item in sections["Magazine"]), default=0),
+        max((member.member_number for member in sections["Member"]), default=0),
+        max((person.librarian_number for person in sections["Librarian"]), default=0),
+    )
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(header)
+        handle.write(b"".join(records))
+        handle.write(b"".join(heap.chunks))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+class MappedSnapshot:
+    """Read-only storage backend over a memory-mapped snapshot file.
+
+    Opening reads only the header. Items and people are decoded from the
+    shared pages the first time they are looked up, changes made afterwards
+    stay in memory, so pair it with a Journal to keep them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        with open(path, "rb") as handle:
+            self.mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER.unpack_from(self.mm, 0)
+        if fields[0] != MAGIC:
+            raise ValueError(f"{path} is not a library snapshot")
+        self.sections = {
+            name: (fields[1 + 2 * index], fields[2 + 2 * index])
+            for index, name in enumerate(SECTIONS)
+        }
+        for sequence, highest in zip(SEQUENCES, fields[-len(SEQUENCES) :]):
+            ensure_above(sequence, highest)
+        self._maps = {}
+
+    # Mappings used by LibrarySystem in place of plain dicts
+    def items(self, kind):
+        if kind not in self._maps:
+            self._maps[kind] = MappedMapping(self, kind, ITEM, self._build_item)
+        return self._maps[kind]
+
+    def people(self, role):
+        if role not in self._maps:
+            self._maps[role] = MappedMapping(self, role, PERSON, self._build_person)
+        return self._maps[role]
+
+    # Changes stay in the in-memory overlay, the file is never written
+    def record_checkout(self, loan):
+        pass
+
+    def record_return(self, loan):
+        pass
+
+    def record_batch(self, checkouts, returns):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.mm.close()
+
+    # Decoding
+    def _string(self, offset, length):
+        return self.mm[offset : offset + length].decode()
+
+    def _build_item(self, kind, row):
+        fields = ITEM.unpack_from(self.mm, self.sections[kind][0] + row * ITEM.size)
+        key, title, genre, extra, free = (
+            self._string(fields[i], fields[i + 1]) for i in range(0, 10, 2)
+        )
+        common = {
+            "title": title,
+            "year": fields[10],
+            "genre": _intern(genre),
+            "is_available": fields[12],
+            "copies": fields[13],
+            "_free": _parse_free_copies(free) if fields[13] > 1 else None,
+        }
+        if kind == "Book":
+            return _restore(Book, author=extra, isbn=key, **common)
+        if kind == "Video":
+            return _restore(
+                Video,
+                video_format=_intern(extra),
+                duration=fields[11],
+                video_id=key,
+                **common,
+            )
+        return _restore(Magazine, publisher=_intern(extra), magazine_id=key, **common)
+
+    def _build_person(self, role, row):
+        fields = PERSON.unpack_from(self.mm, self.sections[role][0] + row * PERSON.size)
+        key, fname, lname, email_address = (
+            self._string(fields[i], fields[i + 1]) for i in range(0, 8, 2)
+        )
+        common = {"fname": fname, "lname": lname, "email_address": email_address}
+        if role == "Librarian":
+            return _restore(Librarian, librarian_id=key, registered_items=[], **common)
+        member = _restore(Member, member_id=key, loans={}, **common)
+        first, count = fields[8], fields[9]
+        base = self.sections["Loan"][0]
+        for loan_row in range(first, first + count):
+            offset, length, _, _, code, copy, checked_out_at, due_at = LOAN.unpack_from(
+                self.mm, base + loan_row * LOAN.size
+            )
+            item = self.items(KINDS[code]).get(self._string(offset, length))
+            if item is not None:
+                member.loans[item.item_key] = Loan(
+                    item, member, checked_out_at, due_at, copy
+                )
+        return member
+
+    def load_loans(self):
+        """Return (member_id, item_key) for every loan in the snapshot"""
+        base, count = self.sections["Loan"]
+        loans = []
+        for row in range(count):
+            fields = LOAN.unpack_from(self.mm, base + row * LOAN.size)
+            loans.append((self._string(*fields[2:4]), self._string(*fields[0:2])))
+        return loans
+
+
+class MappedMapping(MutableMapping):
+    """Dict-like view of one snapshot section with an in-memory overlay"""
+
+    def __init__(self, snapshot, kind, layout, build):
+        self.snapshot = snapshot
+        self.kind = kind
+        self.layout = layout
+        self.build = build
+        self.base, self.count = snapshot.sections[kind]
+        self._cache = {}  # Materialised and newly written objects
+        self._added = set()  # Keys written that are not in the file
+        self._deleted = set()  # File keys that have been deleted
+
+    def _key_at(self, row):
+        offset, length = KEY_REF.unpack_from(
+            self.snapshot.mm, self.base + row * self.layout.size
+        )
+        return self.snapshot._string(offset, length)
+
+    def _find(self, key):
+        """Binary search the sorted records for key, returning its row or None"""
+        if not isinstance(key, str):
+            return None
+        target = key.encode()
+        mm = self.snapshot.mm
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset, length = KEY_REF.unpack_from(
+                mm, self.base + middle * self.layout.size
+            )
+            probe = mm[offset : offset + length]
+            if probe < target:
+                low = middle + 1
+            elif probe > target:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        with self.snapshot.lock:
+            if key in self._cache:
+                return self._cache[key]
+            row = self._find(key)
+            if row is None:
+                raise KeyError(key)
+            obj = self._cache[key] = self.build(self.kind, row)
+        return obj
+
+    def __contains__(self, key):
+        if key in self._cache:
+            return True
+        return key not in self._deleted and self._find(key) is not None
+
+    def __setitem__(self, key, value):
+        if key not in self._cache and key not in self._deleted:
+            if self._find(key) is None:
+                self._added.add(key)
+        self._deleted.discard(key)
+        self._cache[key] = value
+
+    def __delitem__(self, key):
+        self[key]
+        del self._cache[key]
+        if key in self._added:
+            self._added.discard(key)
+        else:
+            self._deleted.add(key)
+
+    def __iter__(self):
+        for row in range(self.count):
+            key = self._key_at(row)
+            if key not in self._deleted:
+                yield key
+        yield from list(self._added)
+
+    def __len__(self):
+        return self.count - len(self._deleted) + len(self._added)
+
+    def get_many(self, keys):
+        """Return {key: item} for the keys that are in the overlay or file"""
+        found = {}
+        for key in keys:
+            item = self.get(key)
+            if item is not None:
+                found[key] = item
+        return found
+
+    def store_many(self, items):
+        for item in items:
+            self[item.item_key] = item
@@ -0,0 +1,541 @@
+"""
+SQLite storage backend for the Library Management System
+Keeps items, people and loans on disk so state survives a restart
+"""
+
+import sqlite3
+import threading
+from collections.abc import ItemsView, MutableMapping, ValuesView
+
+from library_ids import ensure_above
+from library_system import (
+    Book,
+    Librarian,
+    LibraryItem,
+    Loan,
+    Magazine,
+    Member,
+    Video,
+    _intern,
+)
+
+# Statements are kept as constants so sqlite3 reuses its prepared statement cache
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS items (
+    item_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    year INTEGER,
+    genre TEXT,
+    author TEXT,
+    video_format TEXT,
+    duration INTEGER,
+    publisher TEXT,
+    is_available INTEGER NOT NULL DEFAULT 1,
+    copies INTEGER NOT NULL DEFAULT 1,
+    free_copies TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_kind ON items (kind);
+CREATE TABLE IF NOT EXISTS people (
+    person_id TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    fname TEXT NOT NULL,
+    lname TEXT NOT NULL,
+    email_address TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_people_role ON people (role);
+CREATE TABLE IF NOT EXISTS loans (
+    item_key TEXT NOT NULL,
+    copy INTEGER NOT NULL DEFAULT 1,
+    kind TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    checked_out_at REAL,
+    due_at REAL,
+    PRIMARY KEY (item_key, copy)
+);
+CREATE INDEX IF NOT EXISTS idx_loans_member ON loans (member_id);
+"""
+
+# Loans used to be keyed by item alone, SQLite cannot change a primary key
+# in place so the table is copied
+MIGRATE_LOANS = """
+ALTER TABLE loans RENAME TO loans_before_copies;
+DROP INDEX IF EXISTS idx_loans_member;
+"""
+COPY_LOANS = (
+    "INSERT INTO loans (item_key, kind, member_id, checked_out_at, due_at) "
+    "SELECT item_key, kind, member_id, checked_out_at, due_at "
+    "FROM loans_before_copies ORDER BY rowid"
+)
+
+UPSERT_ITEM = (
+    "INSERT OR REPLACE INTO items (item_key, kind, title, year, genre, author, "
+    "video_format, duration, publisher, is_available, copies, free_copies) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_ITEM = "SELECT * FROM items WHERE kind = ? AND item_key = ?"
+SELECT_ITEMS = "SELECT * FROM items WHERE kind = ? ORDER BY rowid"
+# Keys per query when loading many items, well under SQLite's variable limit
+KEYS_PER_QUERY = 500
+SELECT_ITEM_KEYS = "SELECT item_key FROM items WHERE kind = ? ORDER BY rowid"
+COUNT_ITEMS = "SELECT COUNT(*) FROM items WHERE kind = ?"
+DELETE_ITEM = "DELETE FROM items WHERE kind = ? AND item_key = ?"
+UPDATE_AVAILABILITY = (
+    "UPDATE items SET is_available = ?, free_copies = ? WHERE item_key = ?"
+)
+
+UPSERT_PERSON = (
+    "INSERT OR REPLACE INTO people (person_id, role, fname, lname, email_address) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+SELECT_PERSON = "SELECT * FROM people WHERE role = ? AND person_id = ?"
+SELECT_PEOPLE = "SELECT * FROM people WHERE role = ? ORDER BY rowid"
+SELECT_PERSON_IDS = "SELECT person_id FROM people WHERE role = ? ORDER BY rowid"
+COUNT_PEOPLE = "SELECT COUNT(*) FROM people WHERE role = ?"
+DELETE_PERSON = "DELETE FROM people WHERE role = ? AND person_id = ?"
+
+INSERT_LOAN = (
+    "INSERT OR REPLACE INTO loans "
+    "(item_key, copy, kind, member_id, checked_out_at, due_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+DELETE_LOAN = "DELETE FROM loans WHERE item_key = ? AND copy = ?"
+SELECT_MEMBER_LOANS = (
+    "SELECT kind, item_key, copy, checked_out_at, due_at FROM loans "
+    "WHERE member_id = ? ORDER BY rowid"
+)
+SELECT_LOANS = "SELECT member_id, item_key FROM loans ORDER BY rowid"
+
+
+def item_key(item):
+    """Return the key an item is stored under"""
+    return item.item_key
+
+
+def person_key(person):
+    """Return the key a person is stored under"""
+    if isinstance(person, Member):
+        return person.member_id
+    return person.librarian_id
+
+
+def _free_copies(item):
+    """Free list of a multi-copy title as text, None for single copies"""
+    return _free_text(item._free)
+
+
+def _free_text(free):
+    if free is None:
+        return None
+    return ",".join(map(str, free))
+
+
+def _parse_free_copies(text):
+    if text is None:
+        return None
+    return [int(copy) for copy in text.split(",") if copy]
+
+
+def _item_row(item):
+    """Flatten an item into the column order used by UPSERT_ITEM"""
+    return (
+        item_key(item),
+        item.__class__.__name__,
+        item.title,
+        item.year,
+        item.genre,
+        getattr(item, "author", None),
+        getattr(item, "video_format", None),
+        getattr(item, "duration", None),
+        getattr(item, "publisher", None),
+        int(item.is_available),
+        item.copies,
+        _free_copies(item),
+    )
+
+
+# Statements for a loan about to open or close, worked out from the item as
+# it is before the change. A batch touches each item once, so all of its
+# statements can be worked out up front
+def _checkout_writes(loan):
+    item = loan.item
+    free = None if item._free is None else [c for c in item._free if c != loan.copy]
+    return (
+        (UPDATE_AVAILABILITY, (int(bool(free)), _free_text(free), item_key(item))),
+        (
+            INSERT_LOAN,
+            (
+                item_key(item),
+                loan.copy,
+                item.__class__.__name__,
+                loan.member.member_id,
+                loan.checked_out_at,
+                loan.due_at,
+            ),
+        ),
+    )
+
+
+def _return_writes(loan):
+    item = loan.item
+    free = None if item._free is None else item._free + [loan.copy]
+    return (
+        (UPDATE_AVAILABILITY, (1, _free_text(free), item_key(item))),
+        (DELETE_LOAN, (item_key(item), loan.copy)),
+    )
+
+
+def _restore(cls, **attributes):
+    """Rebuild an object from stored attributes without allocating a new ID"""
+    obj = cls.__new__(cls)
+    if issubclass(cls, LibraryItem):
+        obj.observer = None
+        obj.copies = 1
+        obj._free = None
+    for name, value in attributes.items():
+        setattr(obj, name, value)
+    return obj
+
+
+class SQLiteStorage:
+    """Stores the library in a SQLite database in WAL mode.
+
+    Every write is its own short transaction, so nothing acknowledged is
+    lost when the process stops, and a write waits up to timeout seconds
+    for a lock held elsewhere before it fails. Loan writes happen before
+    the loan changes in memory, so a failed write changes nothing. Loaded
+    objects are cached, so a database belongs to one process at a time.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(CREATE_TABLES)
+        self._migrate()
+        self.lock = threading.RLock()
+        self._item_maps = {}
+        self._person_maps = {}
+        self._restore_counters()
+
+    def _migrate(self):
+        # Databases written before loans had due dates gain the new columns
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(loans)")}
+        for column in ("checked_out_at", "due_at"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE loans ADD COLUMN {column} REAL")
+        if "copy" not in columns:
+            self.conn.executescript(MIGRATE_LOANS)
+            self.conn.executescript(CREATE_TABLES)
+            self.conn.execute(COPY_LOANS)
+            self.conn.execute("DROP TABLE loans_before_copies")
+            self.conn.commit()
+        # ... and items written before titles had copies
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(items)")}
+        if "copies" not in columns:
+            self.conn.execute(
+                "ALTER TABLE items ADD COLUMN copies INTEGER NOT NULL DEFAULT 1"
+            )
+            self.conn.execute("ALTER TABLE items ADD COLUMN free_copies TEXT")
+            self.conn.commit()
+
+    # Mappings used by LibrarySystem in place of plain dicts
+    def items(self, kind):
+        if kind not in self._item_maps:
+            self._item_maps[kind] = StoredItems(self, kind)
+        return self._item_maps[kind]
+
+    def people(self, role):
+        if role not in self._person_maps:
+            self._person_maps[role] = StoredPeople(self, role)
+        return self._person_maps[role]
+
+    # Write operations
+    def save_item(self, item):
+        self._write((UPSERT_ITEM, _item_row(item)))
+
+    def delete_item(self, kind, key):
+        self._write((DELETE_ITEM, (kind, key)))
+
+    def save_person(self, person):
+        self._write(
+            (
+                UPSERT_PERSON,
+                (
+                    person_key(person),
+                    person.get_role(),
+                    person.fname,
+                    person.lname,
+                    person.email_address,
+                ),
+            )
+        )
+
+    def delete_person(self, role, key):
+        self._write((DELETE_PERSON, (role, key)))
+
+    def record_checkout(self, loan):
+        """Write a loan that is about to open, with its item's availability
+        once loan.copy is off the shelf"""
+        self._write(*_checkout_writes(loan))
+
+    def record_return(self, loan):
+        """Write a loan that is about to close, with its item's availability
+        once loan.copy is back on the shelf"""
+        self._write(*_return_writes(loan))
+
+    def record_batch(self, checkouts, returns):
+        """Write the loans a batch opens and closes in one transaction, so a
+        failed write leaves none of them on disk"""
+        writes = []
+        for loan in checkouts:
+            writes.extend(_checkout_writes(loan))
+        for loan in returns:
+            writes.extend(_return_writes(loan))
+        self._write(*writes)
+
+    def save_items(self, items):
+        """Insert many items with one prepared statement in one transaction"""
+        with self.lock, self.conn:
+            self.conn.executemany(UPSERT_ITEM, [_item_row(item) for item in items])
+
+    def _write(self, *writes):
+        # (statement, params) pairs committed together, or not at all
+        with self.lock, self.conn:
+            for statement, params in writes:
+                self.conn.execute(statement, params)
+
+    def flush(self):
+        """Commit anything left open, writes already commit as they go"""
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    # Read operations
+    def load_item(self, kind, key):
+        with self.lock:
+            row = self.conn.execute(SELECT_ITEM, (kind, key)).fetchone()
+        return self._build_item(row) if row else None
+
+    def load_items(self, kind, keys):
+        """Return the stored items of a kind among keys, in one query"""
+        statement = (
+            "SELECT * FROM items WHERE kind = ? AND item_key IN "
+            f"({', '.join('?' * len(keys))})"
+        )
+        with self.lock:
+            rows = self.conn.execute(statement, (kind, *keys)).fetchall()
+        return [self._build_item(row) for row in rows]
+
+    def load_person(self, role, key):
+        with self.lock:
+            row = self.conn.execute(SELECT_PERSON, (role, key)).fetchone()
+        return self._build_person(row) if row else None
+
+    def _build_item(self, row):
+        common = {
+            "title": row["title"],
+            "year": row["year"],
+            "genre": _intern(row["genre"]),
+            "is_available": bool(row["is_available"]),
+            "copies": row["copies"],
+            "_free": _parse_free_copies(row["free_copies"]),
+        }
+        if row["kind"] == "Book":
+            return _restore(Book, author=row["author"], isbn=row["item_key"], **common)
+        if row["kind"] == "Video":
+            return _restore(
+                Video,
+                video_format=_intern(row["video_format"]),
+                duration=row["duration"],
+                video_id=row["item_key"],
+                **common,
+            )
+        return _restore(
+            Magazine,
+            publisher=_intern(row["publisher"]),
+            magazine_id=row["item_key"],
+            **common,
+        )
+
+    def _build_person(self, row):
+        common = {
+            "fname": row["fname"],
+            "lname": row["lname"],
+            "email_address": row["email_address"],
+        }
+        if row["role"] == "Librarian":
+            return _restore(
+                Librarian,
+                librarian_id=row["person_id"],
+                registered_items=[],
+                **common,
+            )
+        member = _restore(Member, member_id=row["person_id"], loans={}, **common)
+        with self.lock:
+            loans = self.conn.execute(
+                SELECT_MEMBER_LOANS, (row["person_id"],)
+            ).fetchall()
+        for loan in loans:
+            item = self.items(loan["kind"]).get(loan["item_key"])
+            if item is not None:
+                member.loans[item.item_key] = Loan(
+                    item, member, loan["checked_out_at"], loan["due_at"], loan["copy"]
+                )
+        return member
+
+    def load_loans(self):
+        """Return (member_id, item_key) for every active loan"""
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(SELECT_LOANS)]
+
+    def _restore_counters(self):
+        # Continue numbering after the highest stored ID so new objects never collide
+        for table, column, prefix, sequence in (
+            ("items", "item_key", "VID", "video"),
+            ("items", "item_key", "MAG", "magazine"),
+            ("people", "person_id", "MBR", "member"),
+            ("people", "person_id", "LBR", "librarian"),
+        ):
+            row = self.conn.execute(
+                f"SELECT MAX(CAST(SUBSTR({column}, 4) AS INTEGER)) FROM {table} "
+                f"WHERE {column} LIKE ?",
+                (prefix + "%",),
+            ).fetchone()
+            if row[0] is not None:
+                ensure_above(sequence, row[0])
+
+
+class _StoredValues(ValuesView):
+    def __iter__(self):
+        return self._mapping._iter_values()
+
+
+class _StoredItems(ItemsView):
+    def __iter__(self):
+        for value in self._mapping._iter_values():
+            yield self._mapping._key(value), value
+
+
+class _StoredMapping(MutableMapping):
+    """Dict-like view of one table that loads rows lazily and caches objects"""
+
+    def __init__(self, storage, kind):
+        self.storage = storage
+        self.kind = kind
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        obj = self._load(key)
+        if obj is None:
+            raise KeyError(key)
+        self._cache[key] = obj
+        return obj
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, key, value):
+        self._cache[key] = value
+        self._save(value)
+
+    def __delitem__(self, key):
+        self[key]
+        self._cache.pop(key, None)
+        self._delete(key)
+
+    def __iter__(self):
+        with self.storage.lock:
+            rows = self.storage.conn.execute(self.select_keys, (self.kind,)).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self):
+        with self.storage.lock:
+            return self.storage.conn.execute(self.count, (self.kind,)).fetchone()[0]
+
+    def values(self):
+        return _StoredValues(self)
+
+    def items(self):
+        return _StoredItems(self)
+
+    def _iter_values(self):
+        # One query for the whole table, reusing objects that are already cached
+        with self.storage.lock:
+            rows = self.storage.conn.execute(self.select_all, (self.kind,)).fetchall()
+        for row in rows:
+            key = row[0]
+            if key not in self._cache:
+                self._cache[key] = self._build(row)
+            yield self._cache[key]
+
+
+class StoredItems(_StoredMapping):
+    select_keys = SELECT_ITEM_KEYS
+    select_all = SELECT_ITEMS
+    count = COUNT_ITEMS
+
+    def _load(self, key):
+        return self.storage.load_item(self.kind, key)
+
+    def _build(self, row):
+        return self.storage._build_item(row)
+
+    def _save(self, item):
+        self.storage.save_item(item)
+
+    def _delete(self, key):
+        self.storage.delete_item(self.kind, key)
+
+    def get_many(self, keys):
+        """Return {key: item} for the keys that are stored, loading the ones
+        not cached yet with one query per KEYS_PER_QUERY keys"""
+        cache = self._cache
+        found = {key: cache[key] for key in keys if key in cache}
+        missing = list({key for key in keys if key not in found})
+        for start in range(0, len(missing), KEYS_PER_QUERY):
+            chunk = missing[start : start + KEYS_PER_QUERY]
+            for item in self.storage.load_items(self.kind, chunk):
+                found[item.item_key] = cache[item.item_key] = item
+        return found
+
+    def store_many(self, items):
+        """Persist many items without caching them, replaced keys are evicted"""
+        for item in items:
+            self._cache.pop(item.item_key, None)
+        self.storage.save_items(items)
+
+    def _key(self, item):
+        return item_key(item)
+
+
+class StoredPeople(_StoredMapping):
+    select_keys = SELECT_PERSON_IDS
+    select_all = SELECT_PEOPLE
+    count = COUNT_PEOPLE
+
+    def _load(self, key):
+        return self.storage.load_person(self.kind, key)
+
+    def _build(self, row):
+        return self.storage._build_person(row)
+
+    def _save(self, person):
+        self.storage.save_person(person)
+
+    def _delete(self, key):
+        self.storage.delete_person(self.kind, key)
+
+    def _key(self, person):
+        return person_key(person)
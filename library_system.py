@@ -1,18 +1,206 @@
+import sqlite3
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from enum import Enum
+
+from library_due import DueIndex
+from library_events import ChangeBus
+from library_holds import HoldQueues
+from library_ids import next_id
+from library_index import CatalogIndex
+from library_locks import LockStripes
+from library_pages import SortedListing
+from library_search import SearchIndex
+from library_stats import build_stats, verify_stats
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+# Share one string object for repeated low-cardinality values like genres
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Status(Enum):
+    SUCCESS = "success"
+    FAILURE = "failure"
+
+
+# Display messages by result error code, None for success
+_MESSAGES = {
+    (
+        "checkout",
+        None,
+    ): "{lead}✅ You have successfully checked out\n{title}\n{id_line}",
+    ("return", None): "{lead}✅ You have successfully returned\n{title}\n{id_line}",
+    ("add", None): "{icon} {kind} '{title}' added successfully.",
+    ("hold", None): "⏳ You are on the waitlist for\n{title}\n{id_line}",
+    ("copies", None): "{icon} {kind} '{title}' now has {copies} copies.",
+    "already_checked_out": "❌ {title} has already been checked out",
+    "not_checked_out": "❌ {title} was not checked out",
+    "return_through_loan": "❌ {title} has several copies, return it through its borrower",
+    "unavailable": "❌ {title} is not available for borrowing",
+    "not_borrowed": "❌ {title} is not in your borrowed list",
+    "reserved": "❌ {title} is on hold for another member",
+    "available": "❌ {title} is available, borrow it instead of placing a hold",
+    "already_borrowed": "❌ You have already borrowed {title}",
+    "not_found": "❌ {kind} not found.",
+    "member_not_found": "❌ Member not found.",
+    "item_or_member_not_found": "❌ {kind} or member not found.",
+}
+_ICONS = {"Book": "📚", "Video": "🎞️", "Magazine": "📰"}
+
+
+# Outcome of one add, checkout or return. The display message is only
+# built when the result is turned into a string
+class Result:
+    __slots__ = ("action", "error", "item", "kind")
+
+    def __init__(self, action, error=None, item=None, kind=None):
+        self.action = action  # "add", "copies", "checkout", "return" or "hold"
+        self.error = error  # e.g. "not_found", "unavailable", None on success
+        self.item = item
+        self.kind = kind or (item.__class__.__name__ if item is not None else None)
+
+    @property
+    def status(self):
+        return Status.FAILURE if self.error else Status.SUCCESS
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        template = _MESSAGES[self.error or (self.action, None)]
+        item = self.item
+        if item is None:
+            return template.format(kind=self.kind)
+        return template.format(
+            lead=item.message_lead,
+            title=item.title,
+            id_line=item.id_line,
+            icon=_ICONS[self.kind],
+            kind=self.kind,
+            copies=item.copies,
+        )
+
+    # Lets callers keep checking for "✅" / "❌" in the message
+    def __contains__(self, text):
+        return text in str(self)
+
+    def __repr__(self):
+        return f"Result({self.action!r}, error={self.error!r}, kind={self.kind!r})"
 
 
 # Abstract class for Library items
 class LibraryItem(ABC):
+    # Slots instead of a per-instance __dict__ keep large catalogs compact
+    __slots__ = (
+        "title",
+        "year",
+        "genre",
+        "_is_available",
+        "observer",
+        "copies",
+        "_free",
+    )
+
+    # Text before the ✅ in checkout and return messages
+    message_lead = ""
+    # Days an item can be borrowed for
+    loan_days = 14
+
     # Initialise class
     def __init__(self, title, year, genre):
         self.title = title
         self.year = year
-        self.genre = genre
+        self.genre = _intern(genre)
+        # The LibrarySystem holding this item, told about availability changes
+        self.observer = None
+        # Copies of the title. Multi-copy titles keep a free list of the copy
+        # numbers on the shelf, single copies only need is_available
+        self.copies = 1
+        self._free = None
         self.is_available = True
 
+    @property
+    def is_available(self):
+        return self._is_available
+
+    @is_available.setter
+    def is_available(self, value):
+        changed = value != getattr(self, "_is_available", None)
+        self._is_available = value
+        # Indexes count on hearing about real changes only
+        if changed and self.observer is not None:
+            self.observer.availability_changed(self, value)
+
+    # True while at least one copy is on the shelf
+    @property
+    def available_copies(self):
+        if self._free is None:
+            return 1 if self._is_available else 0
+        return len(self._free)
+
+    def add_copies(self, count=1):
+        """Add count copies of this title, returning the new total"""
+        if self._free is None:
+            self._free = [1] if self._is_available else []
+        first = self.copies + 1
+        self.copies += count
+        self._free.extend(range(first, self.copies + 1))
+        self.is_available = True
+        return self.copies
+
+    def _take_copy(self, copy=None):
+        """Take a copy off the shelf, the given one or any free one in O(1).
+
+        Returns its number, or None when it is not on the shelf.
+        """
+        free = self._free
+        if free is None:
+            if not self._is_available or copy not in (None, 1):
+                return None
+            self.is_available = False
+            return 1
+        if copy is None:
+            if not free:
+                return None
+            copy = free.pop()
+        elif free and free[-1] == copy:
+            # The copy _next_copy() named
+            free.pop()
+        elif copy in free:
+            # Only journal replay asks for any other copy
+            free.remove(copy)
+        else:
+            return None
+        if not free:
+            self.is_available = False
+        return copy
+
+    def _next_copy(self):
+        """The copy _take_copy() would take, or None when none is free"""
+        free = self._free
+        if free is None:
+            return 1 if self._is_available else None
+        return free[-1] if free else None
+
+    def _put_back(self, copy=1):
+        free = self._free
+        if free is None:
+            self.is_available = True
+            return
+        free.append(copy)
+        if len(free) == 1:
+            self.is_available = True
+
     # Methods for child class to inherit
     @abstractmethod
-    def checkout_item(self) -> str:
+    def checkout_item(self) -> Result:
         """Mark item as checked out"""
         pass
 
@@ -22,26 +210,51 @@ class LibraryItem(ABC):
         pass
 
     @abstractmethod
-    def return_item(self) -> str:
+    def return_item(self) -> Result:
         """Mark item as returned"""
         pass
 
+    # Check out and return are the same for every item type
+    def _checkout(self):
+        if self._take_copy() is None:
+            return Result("checkout", "already_checked_out", self)
+        return Result("checkout", item=self)
+
+    # Only a loan knows which copy of a multi-copy title is out, so those
+    # are returned through the member holding them
+    def _return(self):
+        if self.available_copies == self.copies:
+            return Result("return", "not_checked_out", self)
+        if self._free is not None:
+            return Result("return", "return_through_loan", self)
+        self._put_back()
+        return Result("return", item=self)
+
 
 # Book class inherited from library class
 class Book(LibraryItem):
+    __slots__ = ("author", "isbn")
+
+    message_lead = " "
+    loan_days = 21
+
     def __init__(self, title, year, genre, author, isbn):
         super().__init__(title, year, genre)
         self.author = author
         self.isbn = isbn
 
+    # Key the item is catalogued and loaned under
+    @property
+    def item_key(self):
+        return self.isbn
+
+    @property
+    def id_line(self):
+        return f"ISBN: {self.isbn}"
+
     # Check out book logic
     def checkout_item(self):
-        # Check if book is available
-        if not self.is_available:
-            return f"❌ {self.title} has already been checked out"
-        # If book is available to check out
-        self.is_available = False
-        return f" ✅ You have successfully checked out\n{self.title}\nISBN: {self.isbn}"
+        return self._checkout()
 
     # Get description of book logic
     def get_description(self):
@@ -51,34 +264,42 @@ class Book(LibraryItem):
 
     # Return book logic
     def return_item(self):
-        if self.is_available:
-            return f"❌ {self.title} was not checked out"
-        self.is_available = True
-        return f" ✅ You have successfully returned\n{self.title}\nISBN: {self.isbn}"
+        return self._return()
 
 
 # Video class inherited from library item
 class Video(LibraryItem):
-    # Counter for video ID
-    video_counter = 1
+    __slots__ = ("video_format", "duration", "video_number")
+
+    loan_days = 7
 
     def __init__(self, title, year, genre, video_format, duration):
         super().__init__(title, year, genre)
-        self.video_format = video_format
+        self.video_format = _intern(video_format)
         self.duration = duration
-        self.video_id = f"VID{Video.video_counter:04d}"
-        Video.video_counter += 1
+        # Numbers come from library_ids so server workers never share one
+        self.video_number = next_id("video")
+
+    # IDs are stored as integers and formatted on access
+    @property
+    def video_id(self):
+        return f"VID{self.video_number:04d}"
+
+    @video_id.setter
+    def video_id(self, value):
+        self.video_number = int(value[3:])
+
+    @property
+    def item_key(self):
+        return self.video_id
+
+    @property
+    def id_line(self):
+        return f"ID: {self.video_id}"
 
     # Check out video logic
     def checkout_item(self):
-        # Check if book is available
-        if not self.is_available:
-            return f"❌ {self.title} has already been checked out"
-        # If book is available to check out
-        self.is_available = False
-        return (
-            f"✅ You have successfully checked out\n{self.title}\nID: {self.video_id}"
-        )
+        return self._checkout()
 
     # Get description of video logic
     def get_description(self):
@@ -91,30 +312,39 @@ class Video(LibraryItem):
 
     # Return video logic
     def return_item(self):
-        if self.is_available:
-            return f"❌ {self.title} was not checked out"
-        self.is_available = True
-        return f"✅ You have successfully returned\n{self.title}\nID: {self.video_id}"
+        return self._return()
 
 
 # Magazine inherited from library item
 class Magazine(LibraryItem):
-    magazine_counter = 1
+    __slots__ = ("publisher", "magazine_number")
+
+    loan_days = 7
 
     def __init__(self, title, year, genre, publisher):
         super().__init__(title, year, genre)
-        self.publisher = publisher
-        self.magazine_id = f"MAG{Magazine.magazine_counter:04d}"
-        Magazine.magazine_counter += 1
+        self.publisher = _intern(publisher)
+        self.magazine_number = next_id("magazine")
+
+    @property
+    def magazine_id(self):
+        return f"MAG{self.magazine_number:04d}"
+
+    @magazine_id.setter
+    def magazine_id(self, value):
+        self.magazine_number = int(value[3:])
+
+    @property
+    def item_key(self):
+        return self.magazine_id
+
+    @property
+    def id_line(self):
+        return f"ID: {self.magazine_id}"
 
     # Check out Magazine logic
     def checkout_item(self):
-        # Check if magazine is available
-        if not self.is_available:
-            return f"❌ {self.title} has already been checked out"
-        # If magazine is available to check out
-        self.is_available = False
-        return f"✅ You have successfully checked out\n{self.title}\nID: {self.magazine_id}"
+        return self._checkout()
 
     # Get description of Magazine logic
     def get_description(self):
@@ -127,16 +357,42 @@ class Magazine(LibraryItem):
 
     # Return Magazine logic
     def return_item(self):
-        if self.is_available:
-            return f"❌ {self.title} was not checked out"
-        self.is_available = True
-        return (
-            f"✅ You have successfully returned\n{self.title}\nID: {self.magazine_id}"
-        )
+        return self._return()
+
+
+# Loan record linking a borrowed item to the member holding it
+class Loan:
+    __slots__ = ("item", "member", "checked_out_at", "due_at", "copy")
+
+    # Times are Unix timestamps, the due date follows from the item's loan_days
+    def __init__(self, item, member, checked_out_at=None, due_at=None, copy=1):
+        self.item = item
+        self.member = member
+        self.copy = copy
+        self.checked_out_at = time.time() if checked_out_at is None else checked_out_at
+        if due_at is None:
+            due_at = self.checked_out_at + item.loan_days * SECONDS_PER_DAY
+        self.due_at = due_at
+
+    # Key in the loan registry, the item key for a title's first copy
+    @property
+    def key(self):
+        if self.copy == 1:
+            return self.item.item_key
+        return f"{self.item.item_key}#{self.copy}"
+
+    def is_overdue(self, now=None):
+        return (time.time() if now is None else now) > self.due_at
+
+    # Loans are ordered by due date in the overdue heap
+    def __lt__(self, other):
+        return self.due_at < other.due_at
 
 
 # Person ABC class
 class Person(ABC):
+    __slots__ = ("fname", "lname", "email_address")
+
     def __init__(self, fname, lname, email_address):
         self.fname = fname
         self.lname = lname
@@ -150,29 +406,56 @@ class Person(ABC):
 
 # Member class inherited from Person
 class Member(Person):
-    # Class variable for incrementing IDs
-    id_counter = 1
+    __slots__ = ("member_number", "loans")
 
     def __init__(self, fname, lname, email_address):
         super().__init__(fname, lname, email_address)
-        self.member_id = f"MBR{Member.id_counter:04d}"
-        Member.id_counter += 1
-        self.borrowed_items = []
+        self.member_number = next_id("member")
+        self.loans = {}  # Key: item key, Value: Loan, in borrowing order
+
+    @property
+    def member_id(self):
+        return f"MBR{self.member_number:04d}"
+
+    @member_id.setter
+    def member_id(self, value):
+        self.member_number = int(value[3:])
 
     def get_role(self):
         return "Member"
 
-    def borrow(self, item: LibraryItem):
-        if not item.is_available:
-            return f"❌ {item.title} is not available for borrowing"
-        self.borrowed_items.append(item)
-        return item.checkout_item()
+    @property
+    def borrowed_items(self):
+        return [loan.item for loan in self.loans.values()]
 
-    def return_item(self, item: LibraryItem):
-        if item not in self.borrowed_items:
-            return f"❌ {item.title} is not in your borrowed list"
-        self.borrowed_items.remove(item)
-        return item.return_item()
+    def has_borrowed(self, item: LibraryItem):
+        loan = self.loans.get(item.item_key)
+        return loan is not None and loan.item is item
+
+    # One copy of a title per member, the copy comes off the item's free list.
+    # record(loan) is called before anything changes, so if it raises the
+    # member and the item are left as they were
+    def borrow(self, item: LibraryItem, record=None):
+        if not item.is_available:
+            return Result("checkout", "unavailable", item)
+        if self.has_borrowed(item):
+            return Result("checkout", "already_borrowed", item)
+        loan = Loan(item, self, copy=item._next_copy())
+        if record is not None:
+            record(loan)
+        item._take_copy(loan.copy)
+        self.loans[item.item_key] = loan
+        return Result("checkout", item=item)
+
+    def return_item(self, item: LibraryItem, record=None):
+        if not self.has_borrowed(item):
+            return Result("return", "not_borrowed", item)
+        loan = self.loans[item.item_key]
+        if record is not None:
+            record(loan)
+        del self.loans[item.item_key]
+        item._put_back(loan.copy)
+        return Result("return", item=item)
 
     def list_borrowed_items(self):
         if not self.borrowed_items:
@@ -186,12 +469,21 @@ class Member(Person):
 
 
 class Librarian(Person):
+    __slots__ = ("librarian_number", "registered_items")
+
     def __init__(self, fname, lname, email_address):
         super().__init__(fname, lname, email_address)
-        self.librarian_id = f"LBR{Member.id_counter:04d}"
-        Member.id_counter += 1
+        self.librarian_number = next_id("librarian")
         self.registered_items = []
 
+    @property
+    def librarian_id(self):
+        return f"LBR{self.librarian_number:04d}"
+
+    @librarian_id.setter
+    def librarian_id(self, value):
+        self.librarian_number = int(value[3:])
+
     def get_role(self):
         return "Librarian"
 
@@ -206,18 +498,563 @@ class Librarian(Person):
         )
 
 
+# Outcome of one entry in a batch of checkouts/returns
+class BatchItemResult:
+    __slots__ = ("item_id", "action", "success", "error", "item")
+
+    def __init__(self, item_id, action, success, error=None, item=None):
+        self.item_id = item_id
+        self.action = action
+        self.success = success
+        self.error = error  # e.g. "not_found", "unavailable", "aborted"
+        self.item = item
+
+
+# Outcome of a whole batch, applied all-or-nothing
+class BatchResult:
+    __slots__ = ("success", "results")
+
+    def __init__(self, success, results):
+        self.success = success
+        self.results = results
+
+    def failures(self):
+        return [result for result in self.results if not result.success]
+
+
+# Another copy of a catalogued book, rather than a new book under its ISBN
+def _same_book(existing, book):
+    same_title = (existing.title, existing.author) == (book.title, book.author)
+    return same_title and existing is not book
+
+
 class LibrarySystem:
-    def __init__(self):
-        self.books = {}  # Key: ISBN, Value: Book object
-        self.videos = {}  # Key: Video ID, Value: Video object
-        self.magazines = {}  # Key: Magazine ID, Value: Magazine object
-        self.members = {}  # Key: Member ID, Value: Member object
-        self.librarians = {}  # Key: Librarian ID, Value: Librarian object
+    def __init__(self, storage=None, concurrent=False, lock_stripes=64, journal=None):
+        # Optional storage backend (e.g. SQLiteStorage), plain dicts when None
+        self.storage = storage
+        # With concurrent=True checkouts and returns lock the item's stripe, so
+        # sessions sharing this system cannot both borrow the same item
+        self._item_locks = LockStripes(lock_stripes) if concurrent else None
+        # Guards catalog additions and the lazy index builds
+        self._catalog_lock = threading.RLock()
+        if storage is None:
+            self.books = {}  # Key: ISBN, Value: Book object
+            self.videos = {}  # Key: Video ID, Value: Video object
+            self.magazines = {}  # Key: Magazine ID, Value: Magazine object
+            self.members = {}  # Key: Member ID, Value: Member object
+            self.librarians = {}  # Key: Librarian ID, Value: Librarian object
+        else:
+            # Storage mappings load rows lazily and write through on assignment
+            self.books = storage.items("Book")
+            self.videos = storage.items("Video")
+            self.magazines = storage.items("Magazine")
+            self.members = storage.people("Member")
+            self.librarians = storage.people("Librarian")
+        # Secondary, full-text, columnar and sorted listing indexes, built on
+        # first use so startup stays lazy
+        self._index = None
+        self._search_index = None
+        self._columns = None
+        self._listing = None
+        # Live counters, built on first use and then updated on every change
+        self._stats = None
+        # Active loans by due date, built on first use
+        self._due = None
+        # Waitlists for checked-out items. on_hold_ready, when set, is called
+        # with each Hold that becomes ready so the member can be told
+        self.holds = HoldQueues()
+        self.on_hold_ready = None
+        # Change notifications, so caches and pages can skip unchanged work
+        self.events = ChangeBus()
+        # Co-borrowing recommendations, built on first use
+        self._recommender = None
+        # Identity index for logins, Key: (role, case-folded email), Value: person
+        self._identities = None
+        # Active loans, Key: Loan.key, Value: Loan. Rebuilt from storage on first use
+        self._loans = {} if storage is None else None
+        # Optional operation journal (library_journal.Journal). Recovery runs
+        # before it is attached so replayed operations are not journaled again
+        self.journal = None
+        if journal is not None:
+            journal.recover(self)
+        self.journal = journal
+
+    # Shared add/checkout/return logic that keeps storage and indexes in sync
+    def _indexes(self):
+        return [
+            index
+            for index in (
+                self._index,
+                self._search_index,
+                self._columns,
+                self._listing,
+                self._stats,
+            )
+            if index is not None
+        ]
+
+    def _add_item(self, catalog, key, item):
+        with self._catalog_lock:
+            indexes = self._indexes()
+            previous = catalog.get(key) if indexes else None
+            catalog[key] = item
+            if self.journal is not None:
+                self.journal.record_item(item)
+            if indexes:
+                item.observer = self
+            for index in indexes:
+                if previous is not None:
+                    index.remove(previous)
+                index.add(item)
+        self.events.publish("item_added", key)
+
+    def _locked(self, *keys):
+        """Hold the item locks for keys in concurrent mode, a no-op otherwise"""
+        if self._item_locks is None:
+            return nullcontext()
+        return self._item_locks.hold(keys)
+
+    def availability_changed(self, item, is_available):
+        """Called by items whenever is_available changes"""
+        for index in (self._index, self._columns, self._listing, self._stats):
+            if index is not None:
+                index.set_available(item, is_available)
+
+    def _borrow(self, item, member):
+        # The availability check and the checkout happen under one lock
+        with self._locked(item.item_key):
+            if self._reserved_for_other(item, member):
+                return Result("checkout", "reserved", item)
+            result = member.borrow(item, self._record_checkout)
+            if result.ok:
+                self._loan_opened(item, member.loans[item.item_key])
+        return result
+
+    def _give_back(self, item, member):
+        with self._locked(item.item_key):
+            loan = member.loans.get(item.item_key)
+            result = member.return_item(item, self._record_return)
+            if result.ok:
+                self._loan_closed(loan)
+                self._promote_holds(item)
+        return result
+
+    # Storage is written before a loan changes in memory, so a failed write
+    # (a lock held elsewhere past the timeout) leaves both sides unchanged
+    @property
+    def _record_checkout(self):
+        return None if self.storage is None else self.storage.record_checkout
+
+    @property
+    def _record_return(self):
+        return None if self.storage is None else self.storage.record_return
+
+    def _loan_opened(self, item, loan, recorded=False):
+        self.loans[loan.key] = loan
+        hold = self.holds.ready_holds(item.item_key).get(loan.member.member_id)
+        if hold is not None:
+            self.holds.fulfil(hold)
+        if self._stats is not None:
+            self._stats.loan_opened(loan.member.member_id)
+        if self._due is not None:
+            self._due.add(loan)
+        if self.journal is not None and not recorded:
+            self.journal.record_checkout(loan)
+        self.events.publish("loan_opened", item.item_key, loan.member.member_id)
+        # Taking the last copy off the shelf makes the item unavailable
+        if item.available_copies == 0:
+            self.events.publish("availability", item.item_key)
+
+    def _loan_closed(self, loan, recorded=False):
+        registered = self.loans.pop(loan.key, None) is not None
+        if registered and self._stats is not None:
+            self._stats.loan_closed(loan.member.member_id)
+        if registered and self._due is not None:
+            self._due.remove(loan)
+        if self.journal is not None and not recorded:
+            self.journal.record_return(loan.item, loan.member)
+        item = loan.item
+        self.events.publish("loan_closed", item.item_key, loan.member.member_id)
+        # The copy is back on the shelf, so one free copy means it just returned
+        if item.available_copies == 1:
+            self.events.publish("availability", item.item_key)
+
+    def return_item(self, item, member_id):
+        """Return any borrowed item on behalf of a member"""
+        member = self.members.get(member_id)
+        if not member:
+            return Result("return", "member_not_found", item)
+        return self._give_back(item, member)
+
+    # Bulk Operations
+    def _catalog_for(self, item):
+        if isinstance(item, Book):
+            return self.books
+        if isinstance(item, Video):
+            return self.videos
+        return self.magazines
+
+    def bulk_add_items(self, items):
+        """Add many items at once without building per-item messages.
+
+        Built indexes are dropped and rebuilt once on their next use. Books
+        are merged like add_book(): another copy of a title, in the batch
+        or already catalogued, adds to its copies. Returns the number of
+        items added, merged copies included.
+        """
+        isbns = [item.isbn for item in items if isinstance(item, Book)]
+        # Stored catalogs find the catalogued ones with one query per chunk
+        if self.storage is None:
+            catalogued = {
+                isbn: self.books[isbn] for isbn in isbns if isbn in self.books
+            }
+        else:
+            catalogued = self.books.get_many(isbns)
+        groups = {}
+        books = {}  # Key: ISBN, Value: book taken from this batch
+        more_copies = {}  # Key: ISBN, Value: copies for a catalogued book
+        for item in items:
+            if isinstance(item, Book):
+                first = books.get(item.isbn)
+                if first is None:
+                    existing = catalogued.get(item.isbn)
+                    if existing is not None and _same_book(existing, item):
+                        more_copies[item.isbn] = (
+                            more_copies.get(item.isbn, 0) + item.copies
+                        )
+                        continue
+                elif _same_book(first, item):
+                    first.add_copies(item.copies)
+                    continue
+                books[item.isbn] = item
+            groups.setdefault(id(self._catalog_for(item)), []).append(item)
+        with self._catalog_lock:
+            for catalog in (self.books, self.videos, self.magazines):
+                group = groups.get(id(catalog))
+                if not group:
+                    continue
+                if self.storage is None:
+                    catalog.update((item.item_key, item) for item in group)
+                else:
+                    catalog.store_many(group)
+                if self.journal is not None:
+                    self.journal.record_items(group)
+            self._index = None
+            self._search_index = None
+            self._columns = None
+            self._listing = None
+            self._stats = None
+        self.events.publish("items_added")
+        for isbn, count in more_copies.items():
+            self.add_copies(isbn, count)
+        return len(items)
+
+    # Batch Transactions
+    def find_item(self, item_id):
+        """Find a book, video or magazine by ISBN or ID"""
+        if item_id.startswith("VID"):
+            return self.videos.get(item_id)
+        if item_id.startswith("MAG"):
+            return self.magazines.get(item_id)
+        return self.books.get(item_id)
+
+    def _validate_batch_entry(self, item, action, member, seen):
+        if action not in ("checkout", "return"):
+            return "invalid_action"
+        if item is None:
+            return "not_found"
+        if item.item_key in seen:
+            return "duplicate"
+        if action == "checkout" and not item.is_available:
+            return "unavailable"
+        if action == "checkout" and member.has_borrowed(item):
+            return "already_borrowed"
+        if action == "checkout" and self._reserved_for_other(item, member):
+            return "reserved"
+        if action == "return" and not member.has_borrowed(item):
+            return "not_borrowed"
+        return None
+
+    def process_batch(self, member_id, operations):
+        """Apply (item_id, action) pairs for one member, all or nothing.
+
+        action is "checkout" or "return". If any entry fails nothing is
+        changed and the entries that would have succeeded are marked
+        "aborted". If writing the batch to storage or the journal fails,
+        every entry is marked "write_failed".
+        """
+        member = self.members.get(member_id)
+        if member is None:
+            return BatchResult(
+                False,
+                [
+                    BatchItemResult(item_id, action, False, "member_not_found")
+                    for item_id, action in operations
+                ],
+            )
+
+        items = [self.find_item(item_id) for item_id, _ in operations]
+        keys = [item.item_key for item in items if item is not None]
+        with self._locked(*keys):
+            # Validate every entry before changing anything
+            errors = []
+            seen = set()
+            for item, (_, action) in zip(items, operations):
+                errors.append(self._validate_batch_entry(item, action, member, seen))
+                if item is not None:
+                    seen.add(item.item_key)
+
+            success = not any(errors)
+            if success:
+                planned = [
+                    (
+                        action,
+                        (
+                            Loan(item, member, copy=item._next_copy())
+                            if action == "checkout"
+                            else member.loans[item.item_key]
+                        ),
+                    )
+                    for item, (_, action) in zip(items, operations)
+                ]
+                try:
+                    self._record_batch(planned)
+                except (OSError, sqlite3.Error):
+                    # Nothing was written or changed, so every entry failed
+                    success = False
+                    errors = ["write_failed"] * len(operations)
+            if success:
+                for action, loan in planned:
+                    if action == "checkout":
+                        self._open_loan(loan)
+                    else:
+                        self._close_loan(loan)
+                        self._promote_holds(loan.item)
+
+        results = [
+            BatchItemResult(
+                item_id,
+                action,
+                success,
+                error or (None if success else "aborted"),
+                item,
+            )
+            for item, error, (item_id, action) in zip(items, errors, operations)
+        ]
+        return BatchResult(success, results)
+
+    def _record_batch(self, planned):
+        # Storage gets one transaction and the journal one record, so a
+        # failed write or a crash never leaves part of a batch behind
+        checkouts = [loan for action, loan in planned if action == "checkout"]
+        returns = [loan for action, loan in planned if action == "return"]
+        if self.storage is not None:
+            self.storage.record_batch(checkouts, returns)
+        if self.journal is not None:
+            self.journal.record_batch(checkouts, returns)
+
+    def _open_loan(self, loan):
+        # Checkout without building a message, the batch has recorded it
+        item = loan.item
+        item._take_copy(loan.copy)
+        loan.member.loans[item.item_key] = loan
+        self._loan_opened(item, loan, recorded=True)
+
+    def _close_loan(self, loan):
+        item = loan.item
+        del loan.member.loans[item.item_key]
+        item._put_back(loan.copy)
+        self._loan_closed(loan, recorded=True)
+
+    # Loan Registry
+    @property
+    def loans(self):
+        if self._loans is None:
+            self._loans = {}
+            for member_id, key in self.storage.load_loans():
+                member = self.members.get(member_id)
+                if member is not None and key in member.loans:
+                    loan = member.loans[key]
+                    self._loans[loan.key] = loan
+        return self._loans
+
+    def find_borrower(self, item_key):
+        """Return the member currently holding an item, or None.
+
+        For titles with several copies pass a Loan.key such as "ISBN#2" to
+        ask about a copy other than the first.
+        """
+        loan = self.loans.get(item_key)
+        return loan.member if loan else None
+
+    # Due Dates
+    def _is_active(self, loan):
+        return self.loans.get(loan.key) is loan
+
+    @property
+    def due_index(self):
+        with self._catalog_lock:
+            if self._due is None:
+                due = DueIndex(self._is_active)
+                due.add_many(self.loans.values())
+                self._due = due
+        return self._due
+
+    def overdue_loans(self, now=None):
+        """Active loans past their due date, earliest due first"""
+        return self.due_index.overdue(time.time() if now is None else now)
+
+    def loans_due_within(self, hours=48, now=None):
+        """Active loans not yet overdue that fall due in the next hours"""
+        now = time.time() if now is None else now
+        return self.due_index.due_between(now, now + hours * 60 * 60)
+
+    # Recommendations
+    @property
+    def recommender(self):
+        """Co-borrowing matrix (needs NumPy).
+
+        Seeded with the active loans and fed by loan events from first use,
+        so servers touch it at startup to collect history from then on.
+        """
+        with self._catalog_lock:
+            if self._recommender is None:
+                from library_recommend import CoBorrowing
+
+                recommender = CoBorrowing()
+                # Subscribed first, a loan opened meanwhile is merged only once
+                self.events.subscribe(recommender.changed)
+                if self._loans is None:
+                    # One query for the pairs, without loading every member
+                    # and item the loan registry would bring in
+                    recommender.add_many(self.storage.load_loans())
+                else:
+                    recommender.add_many(
+                        (loan.member.member_id, loan.item.item_key)
+                        for loan in list(self._loans.values())
+                    )
+                self._recommender = recommender
+        return self._recommender
+
+    def recommend(self, item_id, limit=5):
+        """Items most borrowed by the members who borrowed item_id"""
+        items = []
+        for key, _ in self.recommender.recommend(item_id, limit):
+            item = self.find_item(key)
+            if item is not None:
+                items.append(item)
+        return items
+
+    # Holds
+    def _reserved_for_other(self, item, member):
+        ready = self.holds.ready_holds(item.item_key)
+        if not ready or member.member_id in ready:
+            return False
+        if min(hold.expires_at for hold in ready.values()) <= time.time():
+            # A pickup window lapsed, pass the copy on before deciding
+            self.expire_holds()
+            ready = self.holds.ready_holds(item.item_key)
+        # Copies beyond those kept for ready holds can go to anyone
+        return item.available_copies <= len(ready)
+
+    def _promote_holds(self, item, now=None):
+        # Every copy on the shelf that is not already kept for someone
+        # goes to the next waiting hold
+        now = time.time() if now is None else now
+        while item.available_copies > len(self.holds.ready_holds(item.item_key)):
+            hold = self.holds.promote(item.item_key, now)
+            if hold is None:
+                return
+            self.events.publish("hold_ready", item.item_key, hold.member.member_id)
+            if self.on_hold_ready is not None:
+                self.on_hold_ready(hold)
+
+    def place_hold(self, item_id, member_id, tier="standard"):
+        """Join the waitlist for a checked-out item.
+
+        tier is "priority" or "standard". Holds are served by tier, then in
+        the order they were placed.
+        """
+        item = self.find_item(item_id)
+        member = self.members.get(member_id)
+        if item is None:
+            return Result("hold", "not_found", kind="Item")
+        if member is None:
+            return Result("hold", "member_not_found", item)
+        with self._locked(item.item_key):
+            if member.has_borrowed(item):
+                return Result("hold", "already_borrowed", item)
+            if item.is_available and not self._reserved_for_other(item, member):
+                return Result("hold", "available", item)
+            self.holds.place(item.item_key, member, time.time(), tier)
+        return Result("hold", item=item)
+
+    def cancel_hold(self, item_id, member_id):
+        """Leave an item's waitlist, passing a ready item on to the next member"""
+        item = self.find_item(item_id)
+        if item is None:
+            return False
+        with self._locked(item.item_key):
+            for hold in self.holds.holds_for(member_id):
+                if hold.item_key == item.item_key:
+                    self.holds.cancel(hold)
+                    self._promote_holds(item)
+                    return True
+        return False
+
+    def holds_for(self, member_id):
+        """A member's active holds, ready ones first"""
+        holds = self.holds.holds_for(member_id)
+        return sorted(holds, key=lambda hold: (hold.status != "ready", hold.sequence))
+
+    def expire_holds(self, now=None):
+        """Close holds past their expiry and pass uncollected items on.
+
+        Only expired holds are visited, never whole queues. Returns them.
+        """
+        now = time.time() if now is None else now
+        expired = self.holds.expire(now)
+        for hold in expired:
+            item = self.find_item(hold.item_key)
+            if item is not None:
+                self._promote_holds(item, now)
+        return expired
+
+    def flush(self):
+        """Write any pending changes to the storage backend and journal"""
+        if self.storage is not None:
+            self.storage.flush()
+        if self.journal is not None:
+            self.journal.flush()
+
+    # Copies
+    def add_copies(self, item_id, count=1):
+        """Add count copies of a catalogued title and pass them to waiting holds"""
+        item = self.find_item(item_id)
+        if item is None:
+            return Result("copies", "not_found", kind="Item")
+        with self._locked(item.item_key):
+            was_available = item.is_available
+            item.add_copies(count)
+            # Stored catalogs write the item back on assignment
+            self._catalog_for(item)[item.item_key] = item
+            if self.journal is not None:
+                self.journal.record_copies(item)
+            self.events.publish("copies", item.item_key)
+            if not was_available:
+                self.events.publish("availability", item.item_key)
+            self._promote_holds(item)
+        return Result("copies", item=item)
 
     # Book Operations
     def add_book(self, book: Book):
-        self.books[book.isbn] = book
-        return f"📚 Book '{book.title}' added successfully."
+        """Add a book. Another copy of a catalogued title adds to its copies,
+        a different book under the same ISBN replaces the catalog record"""
+        existing = self.books.get(book.isbn)
+        if existing is not None and _same_book(existing, book):
+            return self.add_copies(book.isbn, book.copies)
+        self._add_item(self.books, book.isbn, book)
+        return Result("add", item=book)
 
     def find_book_by_isbn(self, isbn):
         return self.books.get(isbn)
@@ -227,24 +1064,24 @@ class LibrarySystem:
         member = self.members.get(member_id)
 
         if not book:
-            return "❌ Book not found."
+            return Result("checkout", "not_found", kind="Book")
         if not member:
-            return "❌ Member not found."
+            return Result("checkout", "member_not_found", book)
 
-        return member.borrow(book)
+        return self._borrow(book, member)
 
     def return_book(self, isbn, member_id):
         book = self.find_book_by_isbn(isbn)
         member = self.members.get(member_id)
 
         if not book or not member:
-            return "❌ Book or member not found."
-        return member.return_item(book)
+            return Result("return", "item_or_member_not_found", kind="Book")
+        return self._give_back(book, member)
 
     # Video Operations
     def add_video(self, video):
-        self.videos[video.video_id] = video
-        return f"🎞️ Video '{video.title}' added successfully."
+        self._add_item(self.videos, video.video_id, video)
+        return Result("add", item=video)
 
     def find_video_by_id(self, video_id):
         return self.videos.get(video_id)
@@ -254,24 +1091,24 @@ class LibrarySystem:
         member = self.members.get(member_id)
 
         if not video:
-            return "❌ Video not found."
+            return Result("checkout", "not_found", kind="Video")
         if not member:
-            return "❌ Member not found."
+            return Result("checkout", "member_not_found", video)
 
-        return member.borrow(video)
+        return self._borrow(video, member)
 
     def return_video(self, video_id, member_id):
         video = self.find_video_by_id(video_id)
         member = self.members.get(member_id)
 
         if not video or not member:
-            return "❌ Video or member not found."
-        return member.return_item(video)
+            return Result("return", "item_or_member_not_found", kind="Video")
+        return self._give_back(video, member)
 
     # Magazine Operations
     def add_magazine(self, magazine):
-        self.magazines[magazine.magazine_id] = magazine
-        return f"📰 Magazine '{magazine.title}' added successfully."
+        self._add_item(self.magazines, magazine.magazine_id, magazine)
+        return Result("add", item=magazine)
 
     def find_magazine_by_id(self, magazine_id):
         return self.magazines.get(magazine_id)
@@ -281,23 +1118,195 @@ class LibrarySystem:
         member = self.members.get(member_id)
 
         if not magazine:
-            return "❌ Magazine not found."
+            return Result("checkout", "not_found", kind="Magazine")
         if not member:
-            return "❌ Member not found."
+            return Result("checkout", "member_not_found", magazine)
 
-        return member.borrow(magazine)
+        return self._borrow(magazine, member)
 
     def return_magazine(self, magazine_id, member_id):
         magazine = self.find_magazine_by_id(magazine_id)
         member = self.members.get(member_id)
 
         if not magazine or not member:
-            return "❌ Magazine or member not found."
-        return member.return_item(magazine)
+            return Result("return", "item_or_member_not_found", kind="Magazine")
+        return self._give_back(magazine, member)
+
+    # Catalog Queries
+    def _all_items(self):
+        # Items are registered as observed so indexes follow their availability
+        for catalog in (self.books, self.videos, self.magazines):
+            for item in catalog.values():
+                item.observer = self
+                yield item
+
+    @property
+    def index(self):
+        with self._catalog_lock:
+            if self._index is None:
+                index = CatalogIndex()
+                index.add_many(self._all_items())
+                self._index = index
+        return self._index
+
+    @property
+    def search_index(self):
+        with self._catalog_lock:
+            if self._search_index is None:
+                search_index = SearchIndex()
+                search_index.add_many(self._all_items())
+                self._search_index = search_index
+        return self._search_index
+
+    @property
+    def columns(self):
+        """Columnar copy of the catalog for vectorized aggregates (needs NumPy)"""
+        with self._catalog_lock:
+            if self._columns is None:
+                from library_columnar import ColumnarCatalog
+
+                columns = ColumnarCatalog()
+                for item in self._all_items():
+                    columns.add(item)
+                self._columns = columns
+        return self._columns
+
+    @property
+    def listing(self):
+        with self._catalog_lock:
+            if self._listing is None:
+                listing = SortedListing()
+                listing.add_many(self._all_items())
+                self._listing = listing
+        return self._listing
+
+    def list_items(
+        self,
+        kind,
+        sort="title",
+        genre=None,
+        available=None,
+        cursor=None,
+        limit=24,
+        descending=False,
+    ):
+        """Return one Page of items of a kind, sorted by title, year or availability.
+
+        Pass page.next_cursor back as cursor to get the following page.
+        """
+        with self._catalog_lock:
+            return self.listing.page(
+                kind, sort, genre, available, cursor, limit, descending
+            )
+
+    @property
+    def stats(self):
+        with self._catalog_lock:
+            if self._stats is None:
+                self._stats = build_stats(self._all_items(), self.loans.values())
+        return self._stats
+
+    def stats_snapshot(self):
+        """Item totals, availability, per-kind and per-genre counts and loans
+        per member, read from live counters without scanning the catalog"""
+        return self.stats.snapshot()
+
+    def verify_stats(self):
+        """Recount everything and return a list of counters that disagree"""
+        with self._catalog_lock:
+            return verify_stats(self.stats, self._all_items(), self.loans.values())
+
+    def count_items(self, **filters):
+        """Count items by kind, genre, year range or availability"""
+        return self.columns.count(**filters)
+
+    def count_by_genre(self, **filters):
+        return self.columns.count_by_genre(**filters)
+
+    def count_by_kind(self, **filters):
+        return self.columns.count_by_kind(**filters)
+
+    def unavailable_items(self, kind=None):
+        return self.columns.select(kind=kind, available=False)
+
+    def search(self, query, limit=20, kind=None):
+        """Full-text search over titles, authors, genres and publishers"""
+        return [
+            item for item, _ in self.search_index.search(query, limit=limit, kind=kind)
+        ]
+
+    def query_items(self, **filters):
+        """Find items by kind, genre, author, publisher, video_format, year range
+        or availability, e.g. query_items(kind="Book", genre="Football")"""
+        return self.index.query(**filters)
+
+    def find_items_by_genre(self, genre, kind=None):
+        return self.index.query(kind=kind, genre=genre)
+
+    def find_items_by_author(self, author):
+        return self.index.query(author=author)
+
+    def find_items_by_year(self, year_from, year_to=None):
+        if year_to is None:
+            year_to = year_from
+        return self.index.query(year_from=year_from, year_to=year_to)
+
+    def list_genres(self, kind=None):
+        return self.index.values("genre", kind)
+
+    # Identity Index
+    @staticmethod
+    def _identity_key(role, email_address):
+        return (role, email_address.strip().casefold())
+
+    @property
+    def identities(self):
+        if self._identities is None:
+            self._identities = {}
+            for people in (self.members, self.librarians):
+                for person in people.values():
+                    key = self._identity_key(person.get_role(), person.email_address)
+                    self._identities[key] = person
+        return self._identities
+
+    def _register_identity(self, person):
+        # Reject a second account with the same email before it is stored
+        key = self._identity_key(person.get_role(), person.email_address)
+        existing = self.identities.get(key)
+        if existing is not None and existing is not person:
+            raise ValueError(
+                f"❌ A {person.get_role().lower()} with email "
+                f"{person.email_address} is already registered."
+            )
+        return key
+
+    def _find_by_identity(self, role, fname, lname, email_address):
+        person = self.identities.get(self._identity_key(role, email_address))
+        if (
+            person is not None
+            and person.fname.strip().casefold() == fname.strip().casefold()
+            and person.lname.strip().casefold() == lname.strip().casefold()
+        ):
+            return person
+        return None
+
+    def find_person_by_email(self, role, email_address):
+        return self.identities.get(self._identity_key(role, email_address))
+
+    def find_member_by_identity(self, fname, lname, email_address):
+        return self._find_by_identity("Member", fname, lname, email_address)
+
+    def find_librarian_by_identity(self, fname, lname, email_address):
+        return self._find_by_identity("Librarian", fname, lname, email_address)
 
     # Member Management
     def register_member(self, member):
-        self.members[member.member_id] = member
+        with self._catalog_lock:
+            key = self._register_identity(member)
+            self.members[member.member_id] = member
+            self.identities[key] = member
+            if self.journal is not None:
+                self.journal.record_person(member)
         return member
 
     def find_member(self, member_id):
@@ -305,12 +1314,24 @@ class LibrarySystem:
 
     # Librarian Management
     def register_librarian(self, librarian):
-        self.librarians[librarian.librarian_id] = librarian
+        with self._catalog_lock:
+            key = self._register_identity(librarian)
+            self.librarians[librarian.librarian_id] = librarian
+            self.identities[key] = librarian
+            if self.journal is not None:
+                self.journal.record_person(librarian)
         return librarian
 
     def find_librarian(self, librarian_id):
         return self.librarians.get(librarian_id)
 
+    # Preload all sample data for demonstration
+    def preload_sample_data(self):
+        self.preload_sample_books()
+        self.preload_sample_magazines()
+        self.preload_sample_videos()
+        self.preload_sample_members()
+
     # Preload sample books for demonstration
     def preload_sample_books(self):
         if not self.books:
@@ -392,7 +1413,7 @@ class LibrarySystem:
                     2018,
                     "Football",
                     "Jonathan Wilson",
-                    "9781982134488",
+                    "9781911600473",
                 )
             )
             self.add_book(
@@ -458,4 +1479,5 @@ class LibrarySystem:
 
     # Make sure at least one member is registered for demo
     def preload_sample_members(self):
-        self.register_member(Member("John", "Doe", "john@example.com"))
+        if not self.members:
+            self.register_member(Member("John", "Doe", "john@example.com"))
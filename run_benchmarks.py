@@ -0,0 +1,915 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner for the Library Management System
+Measures memory and throughput of the core data structures
+"""
+
+import asyncio
+import gc
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from library_api import start_server
+from library_async import AsyncLibrarySystem
+from library_due import DueIndex
+from library_holds import HOLD_DAYS, HoldQueues
+from library_import import build_item, import_catalog, read_rows
+from library_journal import Journal
+from library_recommend import CoBorrowing
+from library_shards import ShardedLibrarySystem
+from library_snapshot import MappedSnapshot, write_snapshot
+from library_storage import SQLiteStorage
+from library_system import (
+    SECONDS_PER_DAY,
+    Book,
+    LibrarySystem,
+    Loan,
+    Magazine,
+    Member,
+    Video,
+)
+
+GENRES = ["Computer Science", "Football", "Science", "Drama", "Sci-Fi", "History"]
+FORMATS = ["DVD", "Blu-Ray", "Digital"]
+
+
+class LegacyRecord:
+    """Plain __dict__-based object with formatted ID strings, as items were stored before"""
+
+    def __init__(self, **attributes):
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+
+def _copy(text):
+    # Build a fresh string object, as a CSV or database reader would
+    return "".join(list(text))
+
+
+def _measure(build, count):
+    """Return bytes allocated per object built by build(i)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [build(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # The list holding the objects is not part of the per-item cost
+    allocated -= sys.getsizeof(objects)
+    return allocated / count
+
+
+def benchmark_memory(count=50_000):
+    """Compare bytes per item for the slotted classes and the old dict layout"""
+    print(f"💾 Memory per object ({count:,} objects each)")
+    print("-" * 60)
+
+    cases = [
+        (
+            "Book",
+            lambda i: LegacyRecord(
+                title=f"Title {i}",
+                year=2000 + i % 25,
+                genre=_copy(GENRES[i % len(GENRES)]),
+                is_available=True,
+                author=f"Author {i}",
+                isbn=f"978{i:010d}",
+            ),
+            lambda i: Book(
+                f"Title {i}",
+                2000 + i % 25,
+                _copy(GENRES[i % len(GENRES)]),
+                f"Author {i}",
+                f"978{i:010d}",
+            ),
+        ),
+        (
+            "Video",
+            lambda i: LegacyRecord(
+                title=f"Title {i}",
+                year=2000 + i % 25,
+                genre=_copy(GENRES[i % len(GENRES)]),
+                is_available=True,
+                video_format=_copy(FORMATS[i % len(FORMATS)]),
+                duration=90 + i % 60,
+                video_id=f"VID{i:04d}",
+            ),
+            lambda i: Video(
+                f"Title {i}",
+                2000 + i % 25,
+                _copy(GENRES[i % len(GENRES)]),
+                _copy(FORMATS[i % len(FORMATS)]),
+                90 + i % 60,
+            ),
+        ),
+        (
+            "Magazine",
+            lambda i: LegacyRecord(
+                title=f"Title {i}",
+                year=2000 + i % 25,
+                genre=_copy(GENRES[i % len(GENRES)]),
+                is_available=True,
+                publisher=_copy("Various"),
+                magazine_id=f"MAG{i:04d}",
+            ),
+            lambda i: Magazine(
+                f"Title {i}",
+                2000 + i % 25,
+                _copy(GENRES[i % len(GENRES)]),
+                _copy("Various"),
+            ),
+        ),
+        (
+            "Member",
+            lambda i: LegacyRecord(
+                fname=f"First{i}",
+                lname=f"Last{i}",
+                email_address=f"user{i}@example.com",
+                member_id=f"MBR{i:04d}",
+                borrowed_items=[],
+            ),
+            lambda i: Member(f"First{i}", f"Last{i}", f"user{i}@example.com"),
+        ),
+    ]
+
+    results = {}
+    for name, legacy, compact in cases:
+        before = _measure(legacy, count)
+        after = _measure(compact, count)
+        saving = 100 * (before - after) / before
+        results[name] = (before, after)
+        print(
+            f"{name:<10} before: {before:7.1f} B  after: {after:7.1f} B  "
+            f"saved: {saving:5.1f}%"
+        )
+    return results
+
+
+def _build_catalog(count):
+    """Return a LibrarySystem holding count generated items"""
+    system = LibrarySystem()
+    for i in range(count):
+        genre = GENRES[i % len(GENRES)]
+        if i % 3 == 0:
+            system.add_book(Book(f"Book {i}", 1950 + i % 75, genre, "Author", str(i)))
+        elif i % 3 == 1:
+            system.add_video(Video(f"Video {i}", 1950 + i % 75, genre, "DVD", 100))
+        else:
+            system.add_magazine(Magazine(f"Magazine {i}", 1950 + i % 75, genre, "Pub"))
+    return system
+
+
+def _time_per_call(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark_aggregates(count=200_000, repeat=20):
+    """Compare columnar aggregates with a Python scan over every item"""
+    print(f"\n📊 Availability aggregates ({count:,} items)")
+    print("-" * 60)
+    system = _build_catalog(count)
+    items = list(system._all_items())
+    for item in items[::7]:
+        item.is_available = False
+    system.columns
+
+    def scan_count():
+        return sum(1 for item in items if not item.is_available)
+
+    def scan_by_genre():
+        totals = {}
+        for item in items:
+            if not item.is_available:
+                totals[item.genre] = totals.get(item.genre, 0) + 1
+        return totals
+
+    cases = [
+        ("count checked out", scan_count, lambda: system.count_items(available=False)),
+        (
+            "checked out by genre",
+            scan_by_genre,
+            lambda: system.count_by_genre(available=False),
+        ),
+    ]
+    for name, scan, vectorized in cases:
+        scan_time = _time_per_call(scan, repeat)
+        vector_time = _time_per_call(vectorized, repeat)
+        print(
+            f"{name:<22} scan: {scan_time * 1000:8.3f} ms  "
+            f"columnar: {vector_time * 1000:8.3f} ms"
+        )
+
+
+def benchmark_contention(threads=8, operations=20_000, items=1_000):
+    """Checkout/return throughput with one global lock versus striped locks"""
+    print(f"\n🔒 Checkout contention ({threads} threads, {items:,} items)")
+    print("-" * 60)
+    for label, stripes in (("global lock", 1), ("64 stripes", 64)):
+        system = LibrarySystem(concurrent=True, lock_stripes=stripes)
+        books = [
+            Book(f"Book {i}", 2000, "Drama", "Author", str(i)) for i in range(items)
+        ]
+        for book in books:
+            system.add_book(book)
+        members = [
+            system.register_member(Member(f"M{i}", "Bench", f"bench{i}@example.com"))
+            for i in range(threads)
+        ]
+        successes = [0] * threads
+
+        def worker(index):
+            rng = random.Random(index)
+            member_id = members[index].member_id
+            for _ in range(operations // threads):
+                isbn = books[rng.randrange(items)].isbn
+                if system.checkout_book(isbn, member_id).ok:
+                    successes[index] += 1
+                    system.return_book(isbn, member_id)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        assert all(book.is_available for book in books), "lost a return"
+        print(
+            f"{label:<12} {operations / elapsed:10,.0f} ops/s  "
+            f"successful checkouts: {sum(successes):,}"
+        )
+
+
+def benchmark_import(rows=200_000):
+    """Streaming batched import versus building and adding items one by one"""
+    print(f"\n📥 Catalog import ({rows:,} CSV rows)")
+    print("-" * 60)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "catalog.csv")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write("type,title,year,genre,author,isbn,video_format,duration\n")
+            for i in range(rows):
+                genre = GENRES[i % len(GENRES)]
+                if i % 2:
+                    handle.write(f"book,Book {i},2001,{genre},Author {i},{i},,\n")
+                else:
+                    handle.write(f"video,Video {i},2001,{genre},,,DVD,100\n")
+
+        # Both systems start with their indexes built, as a running server would
+        system = LibrarySystem()
+        system.list_genres()
+        system.search("warm up")
+        start = time.perf_counter()
+        for row in read_rows(path):
+            item = build_item(row)
+            if isinstance(item, Book):
+                system.add_book(item)
+            else:
+                system.add_video(item)
+        per_item = rows / (time.perf_counter() - start)
+
+        system = LibrarySystem()
+        system.list_genres()
+        system.search("warm up")
+        start = time.perf_counter()
+        report = import_catalog(system, path)
+        system.list_genres()
+        system.search("warm up")
+        bulk = rows / (time.perf_counter() - start)
+        print(f"add_book/add_video loop {per_item:12,.0f} rows/s")
+        print(
+            f"import_catalog          {bulk:12,.0f} rows/s including index rebuild "
+            f"({report.rows_rejected} rejected)"
+        )
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def benchmark_batch_checkout(members=500, batch=20):
+    """Kiosk checkouts: one process_batch call versus one call per item"""
+    print(f"\n🛒 Kiosk checkout ({members} patrons x {batch} items)")
+    print("-" * 60)
+    for label in ("per-item calls", "process_batch"):
+        system = LibrarySystem(concurrent=True)
+        books = [
+            Book(f"Book {i}", 2000, "Drama", "Author", str(i))
+            for i in range(members * batch)
+        ]
+        system.bulk_add_items(books)
+        patrons = [
+            system.register_member(Member(f"M{i}", "Kiosk", f"kiosk{i}@example.com"))
+            for i in range(members)
+        ]
+
+        start = time.perf_counter()
+        for index, patron in enumerate(patrons):
+            stack = books[index * batch : (index + 1) * batch]
+            if label == "process_batch":
+                system.process_batch(
+                    patron.member_id, [(book.isbn, "checkout") for book in stack]
+                )
+            else:
+                for book in stack:
+                    system.checkout_book(book.isbn, patron.member_id)
+        elapsed = time.perf_counter() - start
+
+        assert not any(book.is_available for book in books)
+        print(f"{label:<16} {members * batch / elapsed:12,.0f} items/s")
+
+
+def benchmark_journal(items=200_000, loans=500_000, fsync_every=256):
+    """Checkout overhead of the operation journal and recovery time after it"""
+    print(f"\n📓 Operation journal ({items:,} items, {loans:,} checkouts)")
+    print("-" * 60)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        rates = {}
+        for label in ("no journal", "journal"):
+            journal = Journal(tmpdir, fsync_every) if label == "journal" else None
+            system = LibrarySystem(journal=journal)
+            books = [
+                Book(f"Book {i}", 2000, "Drama", "Author", str(i)) for i in range(items)
+            ]
+            system.bulk_add_items(books)
+            member_id = system.register_member(
+                Member("Bench", "Journal", "journal@example.com")
+            ).member_id
+            start = time.perf_counter()
+            for i in range(loans // 2):
+                isbn = books[i % items].isbn
+                system.checkout_book(isbn, member_id)
+                system.return_book(isbn, member_id)
+            rates[label] = loans / (time.perf_counter() - start)
+            print(f"{label:<12} {rates[label]:12,.0f} checkouts+returns/s")
+        overhead = 100 * (rates["no journal"] - rates["journal"]) / rates["no journal"]
+        print(f"journal overhead: {overhead:.1f}%")
+
+        start = time.perf_counter()
+        recovered = LibrarySystem(journal=Journal(tmpdir))
+        replay = time.perf_counter() - start
+        print(f"restart replaying the whole journal: {replay:8.2f} s")
+
+        recovered.journal.compact(recovered)
+        recovered.journal.close()
+        journal.close()
+        start = time.perf_counter()
+        recovered = LibrarySystem(journal=Journal(tmpdir))
+        print(
+            f"restart from snapshot:               {time.perf_counter() - start:8.2f} s"
+        )
+        assert len(recovered.books) == items
+        recovered.journal.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def benchmark_cold_start(sizes=(10_000, 100_000, 1_000_000), lookups=1_000):
+    """Startup time from a journal snapshot versus a memory-mapped snapshot"""
+    print("\n🧊 Cold start")
+    print("-" * 60)
+    for count in sizes:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            system = LibrarySystem(journal=Journal(tmpdir))
+            system.bulk_add_items(
+                [
+                    Book(f"Book {i}", 2000, "Drama", "Author", str(i))
+                    for i in range(count)
+                ]
+            )
+            system.journal.compact(system)
+            system.journal.close()
+            path = os.path.join(tmpdir, "library.snap")
+            write_snapshot(system, path)
+            del system
+
+            start = time.perf_counter()
+            LibrarySystem(journal=Journal(tmpdir)).journal.close()
+            replayed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            snapshot = MappedSnapshot(path)
+            mapped = LibrarySystem(storage=snapshot)
+            opened = time.perf_counter() - start
+            rng = random.Random(count)
+            isbns = [str(rng.randrange(count)) for _ in range(lookups)]
+            lookup = _time_per_call(
+                lambda: mapped.find_book_by_isbn(isbns.pop()), lookups
+            )
+            snapshot.close()
+            print(
+                f"{count:>9,} items  journal snapshot: {replayed * 1000:9.1f} ms  "
+                f"mmap open: {opened * 1000:6.2f} ms  "
+                f"first lookups: {lookup * 1e6:5.1f} µs"
+            )
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+def benchmark_results(operations=200_000):
+    """Checkout/return cost with lazy results versus rendering every message"""
+    print(f"\n🧾 Result objects ({operations:,} checkouts and returns)")
+    print("-" * 60)
+    system = _build_catalog(3_000)
+    member_id = system.register_member(
+        Member("Bench", "Results", "results@example.com")
+    ).member_id
+    isbns = list(system.books)
+    for label, render in (("rendered", True), ("lazy", False)):
+        start = time.perf_counter()
+        for i in range(operations // 2):
+            isbn = isbns[i % len(isbns)]
+            checkout = system.checkout_book(isbn, member_id)
+            returned = system.return_book(isbn, member_id)
+            if render:
+                str(checkout), str(returned)
+        rate = operations / (time.perf_counter() - start)
+        print(f"{label:<10} {rate:12,.0f} ops/s")
+
+
+def benchmark_pagination(count=300_000, repeat=50):
+    """One page of 24 books versus materialising and sorting the whole kind"""
+    print(f"\n📄 Paginated listing ({count:,} items)")
+    print("-" * 60)
+    system = _build_catalog(count)
+    system.listing
+    cursor = system.list_items("Book", sort="year", limit=24 * 100).next_cursor
+
+    def full_list():
+        return sorted(system.books.values(), key=lambda book: book.year)[:24]
+
+    cases = [
+        ("sort whole kind", full_list),
+        ("first page", lambda: system.list_items("Book", sort="year")),
+        (
+            "page 101",
+            lambda: system.list_items("Book", sort="year", cursor=cursor),
+        ),
+    ]
+    for name, fetch in cases:
+        print(f"{name:<16} {_time_per_call(fetch, repeat) * 1000:9.3f} ms")
+
+
+def benchmark_stats(count=300_000, repeat=20):
+    """Dashboard counts from live counters versus a full scan"""
+    print(f"\n📈 Catalog statistics ({count:,} items)")
+    print("-" * 60)
+    system = _build_catalog(count)
+    for item in list(system._all_items())[::9]:
+        item.is_available = False
+    system.stats
+
+    def scan():
+        totals = {}
+        for item in system._all_items():
+            counts = totals.setdefault(item.genre, [0, 0])
+            counts[0] += 1
+            counts[1] += not item.is_available
+        return totals
+
+    for name, function in (("scan", scan), ("live counters", system.stats_snapshot)):
+        print(f"{name:<14} {_time_per_call(function, repeat) * 1000:9.3f} ms")
+
+
+def benchmark_due_dates(loans=10_000_000, repeat=5):
+    """Overdue and due-soon queries from the heap versus a scan of every loan"""
+    print(f"\n⏰ Due dates ({loans:,} active loans)")
+    print("-" * 60)
+    # A handful of items and one member are shared, only the loans matter here
+    items = [Book(f"Book {i}", 2000, "Fiction", "Author", str(i)) for i in range(100)]
+    member = Member("Bench", "Mark", "bench@example.com")
+    now = time.time()
+    rng = random.Random(18)
+    start = time.perf_counter()
+    # Due dates spread from one day ago to 999 days ahead, so about 0.1% of the
+    # loans are overdue and 0.2% are due in the next 48 hours
+    all_loans = [
+        Loan(
+            items[i % 100],
+            member,
+            now,
+            now + (rng.random() * 1000 - 1) * SECONDS_PER_DAY,
+        )
+        for i in range(loans)
+    ]
+    index = DueIndex(lambda loan: True)
+    index.add_many(all_loans)
+    print(f"build          {time.perf_counter() - start:9.2f} s")
+    # Run the collection the build triggers now, not inside the first query
+    gc.collect()
+
+    soon = now + 48 * 3600
+    queries = (
+        (
+            "overdue",
+            lambda: [l for l in all_loans if l.due_at < now],
+            lambda: index.overdue(now),
+        ),
+        (
+            "due in 48h",
+            lambda: [l for l in all_loans if now < l.due_at <= soon],
+            lambda: index.due_between(now, soon),
+        ),
+    )
+    for name, scan, heap in queries:
+        found = len(heap())
+        print(
+            f"{name:<11} {found:>9,} loans   scan {_time_per_call(scan, repeat) * 1000:9.1f} ms"
+            f"   heap {_time_per_call(heap, repeat) * 1000:8.1f} ms"
+        )
+
+
+def benchmark_holds(titles=2_000, holds_per_title=500, repeat=2_000):
+    """Hold promotion and expiry sweeps with long queues on popular titles"""
+    print(f"\n⏳ Holds ({titles:,} titles x {holds_per_title} holds)")
+    print("-" * 60)
+    members = [
+        Member(f"Bench{i}", "Mark", f"bench{i}@example.com")
+        for i in range(holds_per_title)
+    ]
+    holds = HoldQueues()
+    now = time.time()
+    start = time.perf_counter()
+    for title in range(titles):
+        for i, member in enumerate(members):
+            holds.place(
+                str(title), member, now + i, "priority" if i % 50 == 0 else "standard"
+            )
+    print(
+        f"place          {(time.perf_counter() - start) / (titles * holds_per_title) * 1e6:9.2f} µs per hold"
+    )
+
+    keys = [str(title) for title in range(titles)]
+    start = time.perf_counter()
+    for i in range(repeat):
+        hold = holds.promote(keys[i % titles], now)
+        holds.fulfil(hold)
+    print(
+        f"promote        {(time.perf_counter() - start) / repeat * 1e6:9.2f} µs per return"
+    )
+
+    # Holds were placed a second apart, so a sweep just past the lapse of the
+    # first two in each queue touches a small fraction of them
+    cutoff = now + 1 + HOLD_DAYS * SECONDS_PER_DAY
+
+    def scan():
+        return [
+            hold
+            for queue in holds.queues.values()
+            for hold in queue
+            if hold.status == "waiting" and hold.expires_at <= cutoff
+        ]
+
+    due = len(scan())
+    scan_time = _time_per_call(scan, 1)
+    start = time.perf_counter()
+    expired = len(holds.expire(cutoff))
+    heap_time = time.perf_counter() - start
+    print(
+        f"expiry sweep   {expired:,} of {due:,} found   "
+        f"scan {scan_time * 1000:8.1f} ms   heap {heap_time * 1000:8.1f} ms"
+    )
+
+
+def benchmark_copies(titles=1_000, copy_counts=(1, 40, 400), members=400):
+    """Checkout and return cost as titles gain copies, should stay flat"""
+    print(f"\n📗 Copies ({titles:,} titles, every copy borrowed and returned)")
+    print("-" * 60)
+    for copies in copy_counts:
+        system = LibrarySystem()
+        for i in range(titles):
+            book = Book(f"Course Text {i}", 2020, "Science", "Author", f"ISBN{i}")
+            if copies > 1:
+                book.add_copies(copies - 1)
+            system.add_book(book)
+        ids = [
+            system.register_member(
+                Member(f"Bench{i}", "Mark", f"bench{i}@example.com")
+            ).member_id
+            for i in range(min(members, copies))
+        ]
+        operations = [
+            (f"ISBN{i}", member_id) for i in range(titles) for member_id in ids
+        ]
+        operations = operations[:100_000]
+        start = time.perf_counter()
+        for isbn, member_id in operations:
+            system.checkout_book(isbn, member_id)
+        checkout = (time.perf_counter() - start) / len(operations)
+        start = time.perf_counter()
+        for isbn, member_id in operations:
+            system.return_book(isbn, member_id)
+        returned = (time.perf_counter() - start) / len(operations)
+        print(
+            f"{copies:>4} copies   checkout {checkout * 1e6:6.2f} µs   "
+            f"return {returned * 1e6:6.2f} µs"
+        )
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def benchmark_async_load(coroutines=5_000, items=500, members=1_000, max_workers=4):
+    """Latency of concurrent checkout/return coroutines through the async facade"""
+    print(f"\n⚡ Async facade ({coroutines:,} concurrent coroutines)")
+    print("-" * 60)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for name in ("in-memory", "SQLite"):
+            storage = None
+            if name == "SQLite":
+                storage = SQLiteStorage(os.path.join(tmpdir, "library.db"))
+            system = LibrarySystem(storage, concurrent=True)
+            system.bulk_add_items(
+                [
+                    Book(f"Book {i}", 2000, "Fiction", "Author", f"ISBN{i}")
+                    for i in range(items)
+                ]
+            )
+            ids = [
+                system.register_member(
+                    Member(f"Bench{i}", "Mark", f"bench{i}@example.com")
+                ).member_id
+                for i in range(members)
+            ]
+            rng = random.Random(21)
+            latencies = []
+
+            async def session(library, isbn, member_id):
+                start = time.perf_counter()
+                await library.find_member(member_id)
+                result = await library.checkout_book(isbn, member_id)
+                if result.ok:
+                    await library.return_book(isbn, member_id)
+                latencies.append(time.perf_counter() - start)
+
+            async def run():
+                async with AsyncLibrarySystem(system, max_workers) as library:
+                    await asyncio.gather(
+                        *(
+                            session(
+                                library, f"ISBN{rng.randrange(items)}", rng.choice(ids)
+                            )
+                            for _ in range(coroutines)
+                        )
+                    )
+
+            start = time.perf_counter()
+            asyncio.run(run())
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<10} {coroutines / elapsed:9,.0f} sessions/s   "
+                f"p50 {_percentile(latencies, 0.5) * 1000:7.2f} ms   "
+                f"p99 {_percentile(latencies, 0.99) * 1000:7.2f} ms"
+            )
+            if storage is not None:
+                storage.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def benchmark_api(count=20_000, requests=3_000, batch=50):
+    """Requests per second against the HTTP/JSON API on localhost"""
+    print(f"\n📡 HTTP API ({count:,} items, {requests:,} requests per case)")
+    print("-" * 60)
+    system = _build_catalog(count)
+    member = system.register_member(Member("Bench", "Mark", "bench@example.com"))
+    isbns = [book.isbn for book in list(system.books.values())[:requests]]
+    server = start_server(system)
+    port = server.server_port
+
+    def call(conn, method, path, body=None, headers=None):
+        conn.request(method, path, body, headers or {})
+        response = conn.getresponse()
+        response.read()
+        return response
+
+    def new_connections():
+        for isbn in isbns:
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            call(conn, "GET", f"/items/{isbn}")
+            conn.close()
+
+    def keep_alive():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for isbn in isbns:
+            call(conn, "GET", f"/items/{isbn}")
+        conn.close()
+
+    def conditional_pages():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        etag = call(conn, "GET", "/items?kind=Book").getheader("ETag")
+        for _ in isbns:
+            call(conn, "GET", "/items?kind=Book", headers={"If-None-Match": etag})
+        conn.close()
+
+    def full_pages():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for _ in isbns:
+            call(conn, "GET", "/items?kind=Book")
+        conn.close()
+
+    def batched_loans():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for start in range(0, len(isbns), batch):
+            body = [
+                {
+                    "method": "POST",
+                    "path": path,
+                    "body": {"item_id": isbn, "member_id": member.member_id},
+                }
+                for isbn in isbns[start : start + batch]
+                for path in ("/checkout", "/return")
+            ]
+            call(conn, "POST", "/batch", json.dumps(body))
+        conn.close()
+
+    try:
+        for name, function, operations in (
+            ("new connection per GET", new_connections, requests),
+            ("keep-alive GET", keep_alive, requests),
+            ("catalog page, 200", full_pages, requests),
+            ("catalog page, 304", conditional_pages, requests),
+            (f"batched loans ({batch}/request)", batched_loans, 2 * requests),
+        ):
+            elapsed = _time_per_call(function, 1)
+            print(f"{name:<30} {operations / elapsed:9,.0f} operations/s")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def benchmark_sharding(count=50_000, members=1_000, rounds=5):
+    """Checkout and return throughput with the catalog split over processes"""
+    cores = os.cpu_count() or 1
+    print(f"\n🧩 Sharding ({count:,} items, {cores} CPU cores)")
+    print("-" * 60)
+    items = [
+        Book(f"Book {i}", 1950 + i % 75, "Fiction", "Author", str(i))
+        for i in range(count)
+    ]
+    people = [Member("Bench", "Mark", f"bench{i}@example.com") for i in range(members)]
+    checkouts = [
+        ("checkout", item.isbn, people[i % members].member_id)
+        for i, item in enumerate(items)
+    ]
+    returns = [("return", isbn, member_id) for _, isbn, member_id in checkouts]
+    baseline = None
+    for shards in sorted({1, 2, 4, cores}):
+        with ShardedLibrarySystem(shards) as system:
+            system.bulk_add_items(items)
+            for member in people:
+                system.register_member(member)
+
+            def run():
+                system.apply_loans(checkouts)
+                system.apply_loans(returns)
+
+            elapsed = _time_per_call(run, rounds)
+        rate = 2 * count / elapsed
+        baseline = baseline or rate
+        print(
+            f"{shards} shard(s): {rate:12,.0f} operations/s "
+            f"({rate / baseline:.2f}x one shard)"
+        )
+    if cores == 1:
+        print("Only one core here, shards beyond one share it")
+
+
+def benchmark_change_events(count=100_000, repeat=20_000):
+    """Cost of publishing changes, and of reruns that reuse an unchanged page"""
+    print(f"\n🔔 Change events ({count:,} items)")
+    print("-" * 60)
+    system = _build_catalog(count)
+    member = system.register_member(Member("Bench", "Mark", "bench@example.com"))
+    isbn = next(iter(system.books))
+
+    def loan():
+        system.checkout_book(isbn, member.member_id)
+        system.return_book(isbn, member.member_id)
+
+    plain = _time_per_call(loan, repeat)
+    unsubscribe = system.events.subscribe(lambda change: None)
+    subscribed = _time_per_call(loan, repeat)
+    unsubscribe()
+    print(f"Checkout + return:             {plain * 1e6:8.2f} µs")
+    print(f"  with one subscriber:         {subscribed * 1e6:8.2f} µs")
+
+    # What a page rerun costs when it refetches versus when the version says
+    # nothing it shows has changed
+    events = system.events
+    genre = GENRES[0]
+    system.list_items("Book", sort="title", genre=genre, limit=24)
+    stamp = events.version
+
+    def refetch():
+        system.list_items("Book", sort="title", genre=genre, limit=24)
+
+    def reuse():
+        return events.catalog_version <= stamp
+
+    fetch = _time_per_call(refetch, repeat)
+    check = _time_per_call(reuse, repeat)
+    print(f"Page rerun, refetch:           {fetch * 1e6:8.2f} µs")
+    print(f"Page rerun, version unchanged: {check * 1e6:8.2f} µs")
+
+
+def benchmark_recommendations(members=20_000, items=50_000, per_member=20):
+    """Co-borrowing suggestions from CSR arrays versus scanning histories"""
+    print(f"\n👥 Recommendations ({members:,} members, {items:,} items)")
+    print("-" * 60)
+    random.seed(7)
+    # Popularity is skewed, a few titles are borrowed by many members
+    histories = [
+        {min(int(random.expovariate(1 / 2_000)), items - 1) for _ in range(per_member)}
+        for _ in range(members)
+    ]
+    matrix = CoBorrowing()
+    matrix.add_many(
+        (member, item) for member, history in enumerate(histories) for item in history
+    )
+    start = time.perf_counter()
+    matrix.refresh()
+    print(f"Build and score every item:    {time.perf_counter() - start:8.2f} s")
+
+    popular = [random.randrange(100) for _ in range(20)]
+
+    def naive():
+        # What "also borrowed" costs over raw histories: every member, every query
+        for item in popular:
+            together = {}
+            for history in histories:
+                if item in history:
+                    for other in history:
+                        together[other] = together.get(other, 0) + 1
+            sorted(together, key=together.get, reverse=True)[:10]
+
+    def cached():
+        for item in popular:
+            matrix.recommend(item)
+
+    def loan():
+        matrix.add(random.randrange(members), random.randrange(items))
+        matrix.recommend(popular[0])
+
+    print(
+        f"Scan histories per query:      {_time_per_call(naive, 1) / 20 * 1e3:8.2f} ms"
+    )
+    print(
+        f"Cached top-k per query:        {_time_per_call(cached, 100) / 20 * 1e6:8.2f} µs"
+    )
+    print(f"New loan, then query:          {_time_per_call(loan, 100) * 1e3:8.2f} ms")
+
+
+def run_all_benchmarks():
+    """Run every benchmark and print a report"""
+    print("⏱️ LIBRARY MANAGEMENT SYSTEM - BENCHMARKS")
+    print("=" * 60)
+    print(f"Benchmark Run Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    start_time = time.time()
+    benchmark_memory()
+    benchmark_aggregates()
+    benchmark_contention()
+    benchmark_import()
+    benchmark_batch_checkout()
+    benchmark_journal()
+    benchmark_cold_start()
+    benchmark_results()
+    benchmark_pagination()
+    benchmark_stats()
+    benchmark_due_dates()
+    benchmark_holds()
+    benchmark_copies()
+    benchmark_async_load()
+    benchmark_api()
+    benchmark_sharding()
+    benchmark_change_events()
+    benchmark_recommendations()
+
+    print("=" * 60)
+    print(f"Benchmark Duration: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    run_all_benchmarks()
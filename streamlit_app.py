@@ -1,15 +1,33 @@
+import os
+
 import streamlit as st
+from library_ids import FileIdAllocator, set_allocator
 from library_system import LibrarySystem
+from library_storage import SQLiteStorage
 
 
-# Initialize session state with the LibrarySystem
-if "library_system" not in st.session_state:
-    st.session_state.library_system = LibrarySystem()
+# One LibrarySystem per server process, shared by every browser session
+@st.cache_resource
+def load_library_system():
+    # Set LIBRARY_DB to keep the library in a SQLite database between restarts
+    db_path = os.environ.get("LIBRARY_DB")
+    storage = None
+    if db_path:
+        # IDs continue from a counter file kept next to the database
+        set_allocator(FileIdAllocator(db_path + ".ids"))
+        storage = SQLiteStorage(db_path)
+    # Sessions run on separate threads, so checkouts need the item locks
+    system = LibrarySystem(storage, concurrent=True)
     # Preload books magazines users and videos for demonstration
-    st.session_state.library_system.preload_sample_books()
-    st.session_state.library_system.preload_sample_magazines()
-    st.session_state.library_system.preload_sample_videos()
-    st.session_state.library_system.preload_sample_members()
+    system.preload_sample_data()
+    # Co-borrowing history for recommendations is collected from startup
+    system.recommender
+    return system
+
+
+# Each session only keeps a handle to the shared system and its own login
+if "library_system" not in st.session_state:
+    st.session_state.library_system = load_library_system()
 
 from streamlit_option_menu import option_menu
 import components.homepage as homepage
@@ -4,8 +4,16 @@ Unit tests for the Library Management System
 Tests core functionality including books, videos, magazines, and user management
 """
 
+import asyncio
+import http.client
+import json
 import os
+import shutil
+import sqlite3
 import sys
+import tempfile
+import multiprocessing
+import threading
 import unittest
 
 # Add parent directory to path to import library_system
@@ -18,8 +26,24 @@ from library_system import (
     LibrarySystem,
     Magazine,
     Member,
+    SECONDS_PER_DAY,
+    Result,
+    Status,
     Video,
 )
+from library_api import start_server
+from library_async import AsyncLibrarySystem
+from library_ids import FileIdAllocator, IdAllocator
+from library_events import ChangeCache
+from library_import import import_catalog
+from library_journal import Journal, read_records
+from library_locks import LockStripes
+from library_pages import LIST_KEYS
+from library_recommend import CoBorrowing
+from library_search import tokenize
+from library_shards import ShardedLibrarySystem, shard_of
+from library_snapshot import MappedSnapshot, write_snapshot
+from library_storage import SQLiteStorage
 
 
 class TestLibraryItem(unittest.TestCase):
@@ -323,6 +347,2393 @@ class TestLibrarySystem(unittest.TestCase):
         self.assertGreater(len(self.system.videos), 0)
         self.assertGreater(len(self.system.members), 0)
 
+    def test_preload_sample_data_runs_once(self):
+        """Test that preloading a shared system again adds nothing"""
+        self.system.preload_sample_data()
+        counts = [len(self.system.books), len(self.system.members)]
+        self.system.preload_sample_data()
+        self.assertEqual([len(self.system.books), len(self.system.members)], counts)
+
+
+class TestCompactRepresentation(unittest.TestCase):
+    """Test cases for the slotted, interned object layout"""
+
+    def test_objects_have_no_instance_dict(self):
+        """Test that items and people use __slots__"""
+        objects = [
+            Book("Test Book", 2023, "Fiction", "Test Author", "1234567890"),
+            Video("Test Video", 2023, "Action", "DVD", 120),
+            Magazine("Test Magazine", 2023, "Science", "Test Publisher"),
+            Member("John", "Doe", "john@test.com"),
+            Librarian("Jane", "Smith", "jane@test.com"),
+        ]
+        for obj in objects:
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+
+    def test_low_cardinality_values_are_interned(self):
+        """Test that equal genres and formats share one string object"""
+        first = Video("A", 2023, "".join(["Sci", "-Fi"]), "".join(["D", "VD"]), 90)
+        second = Video("B", 2023, "".join(["Sci-", "Fi"]), "".join(["DV", "D"]), 90)
+        self.assertIs(first.genre, second.genre)
+        self.assertIs(first.video_format, second.video_format)
+
+    def test_integer_backed_ids(self):
+        """Test that formatted IDs come from the stored integer"""
+        video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.assertEqual(video.video_id, f"VID{video.video_number:04d}")
+        video.video_id = "VID0042"
+        self.assertEqual(video.video_number, 42)
+        self.assertEqual(video.video_id, "VID0042")
+
+        member = Member("John", "Doe", "john@test.com")
+        self.assertEqual(member.member_id, f"MBR{member.member_number:04d}")
+
+
+class TestLoanRegistry(unittest.TestCase):
+    """Test cases for keyed loan tracking"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.system = LibrarySystem()
+        self.book = Book("Test Book", 2023, "Fiction", "Test Author", "1234567890")
+        self.video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.member = Member("John", "Doe", "john@test.com")
+        self.other = Member("Jane", "Doe", "jane@test.com")
+        self.system.add_book(self.book)
+        self.system.add_video(self.video)
+        self.system.register_member(self.member)
+        self.system.register_member(self.other)
+
+    def test_loans_keyed_by_item(self):
+        """Test that loans are stored per item key in borrowing order"""
+        self.system.checkout_video(self.video.video_id, self.member.member_id)
+        self.system.checkout_book(self.book.isbn, self.member.member_id)
+        self.assertEqual(list(self.member.loans), [self.video.video_id, self.book.isbn])
+        self.assertEqual(self.member.borrowed_items, [self.video, self.book])
+        self.assertTrue(self.member.has_borrowed(self.book))
+        self.assertFalse(self.other.has_borrowed(self.book))
+
+    def test_find_borrower(self):
+        """Test the global item-to-member map"""
+        self.assertIsNone(self.system.find_borrower(self.book.isbn))
+        self.system.checkout_book(self.book.isbn, self.member.member_id)
+        self.assertIs(self.system.find_borrower(self.book.isbn), self.member)
+
+        self.system.return_book(self.book.isbn, self.member.member_id)
+        self.assertIsNone(self.system.find_borrower(self.book.isbn))
+        self.assertEqual(self.member.loans, {})
+
+    def test_failed_operations_leave_registry_unchanged(self):
+        """Test that rejected checkouts and returns do not record loans"""
+        self.system.checkout_book(self.book.isbn, self.member.member_id)
+        self.system.checkout_book(self.book.isbn, self.other.member_id)
+        self.system.return_book(self.book.isbn, self.other.member_id)
+        self.assertIs(self.system.find_borrower(self.book.isbn), self.member)
+        self.assertEqual(self.other.loans, {})
+
+    def test_same_key_different_object(self):
+        """Test that a different object with the same key is not treated as borrowed"""
+        self.member.borrow(self.book)
+        copy = Book("Test Book", 2023, "Fiction", "Test Author", self.book.isbn)
+        self.assertFalse(self.member.has_borrowed(copy))
+        self.assertIn("❌", self.member.return_item(copy))
+
+
+class TestBatchTransactions(unittest.TestCase):
+    """Test cases for all-or-nothing batch checkouts and returns"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.system = LibrarySystem(concurrent=True)
+        self.book = Book("Test Book", 2023, "Fiction", "Test Author", "1234567890")
+        self.video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.magazine = Magazine("Test Magazine", 2023, "Science", "Test Publisher")
+        self.system.add_book(self.book)
+        self.system.add_video(self.video)
+        self.system.add_magazine(self.magazine)
+        self.member = self.system.register_member(Member("John", "Doe", "j@test.com"))
+        self.other = self.system.register_member(Member("Jane", "Doe", "ja@test.com"))
+
+    def test_batch_checkout_and_return(self):
+        """Test a successful batch is applied in full"""
+        ids = [self.book.isbn, self.video.video_id, self.magazine.magazine_id]
+        result = self.system.process_batch(
+            self.member.member_id, [(item_id, "checkout") for item_id in ids]
+        )
+        self.assertTrue(result.success)
+        self.assertEqual(
+            [r.item for r in result.results], [self.book, self.video, self.magazine]
+        )
+        self.assertEqual(
+            self.member.borrowed_items, [self.book, self.video, self.magazine]
+        )
+        self.assertIs(self.system.find_borrower(self.video.video_id), self.member)
+        self.assertFalse(self.magazine.is_available)
+
+        result = self.system.process_batch(
+            self.member.member_id, [(item_id, "return") for item_id in ids]
+        )
+        self.assertTrue(result.success)
+        self.assertEqual(self.member.loans, {})
+        self.assertTrue(
+            all(i.is_available for i in (self.book, self.video, self.magazine))
+        )
+
+    def test_failed_batch_changes_nothing(self):
+        """Test that one bad entry aborts the whole batch"""
+        self.system.checkout_video(self.video.video_id, self.other.member_id)
+        result = self.system.process_batch(
+            self.member.member_id,
+            [
+                (self.book.isbn, "checkout"),
+                (self.video.video_id, "checkout"),
+                ("VID9999", "checkout"),
+                (self.magazine.magazine_id, "return"),
+            ],
+        )
+        self.assertFalse(result.success)
+        self.assertEqual(
+            [r.error for r in result.results],
+            ["aborted", "unavailable", "not_found", "not_borrowed"],
+        )
+        self.assertEqual(len(result.failures()), 4)
+        self.assertTrue(self.book.is_available)
+        self.assertEqual(self.member.loans, {})
+
+    def test_duplicates_and_unknown_member(self):
+        """Test duplicate items, bad actions and unknown members are rejected"""
+        result = self.system.process_batch(
+            self.member.member_id,
+            [
+                (self.book.isbn, "checkout"),
+                (self.book.isbn, "checkout"),
+                (self.video.video_id, "renew"),
+            ],
+        )
+        self.assertEqual(
+            [r.error for r in result.results],
+            ["aborted", "duplicate", "invalid_action"],
+        )
+        result = self.system.process_batch("MBR9999", [(self.book.isbn, "checkout")])
+        self.assertEqual(result.results[0].error, "member_not_found")
+        self.assertTrue(self.book.is_available)
+
+
+class TestConcurrentCheckout(unittest.TestCase):
+    """Test cases for thread-safe checkout and return"""
+
+    def setUp(self):
+        """Set up a concurrent system with one contested item"""
+        self.system = LibrarySystem(concurrent=True, lock_stripes=8)
+        self.book = Book("Test Book", 2023, "Fiction", "Test Author", "1234567890")
+        self.system.add_book(self.book)
+        self.members = [
+            self.system.register_member(Member(f"M{i}", "Doe", f"m{i}@test.com"))
+            for i in range(8)
+        ]
+
+    def test_only_one_member_wins_a_race(self):
+        """Test that concurrent checkouts of one item succeed exactly once"""
+        for _ in range(50):
+            barrier = threading.Barrier(len(self.members))
+            results = []
+
+            def borrow(member):
+                barrier.wait()
+                results.append(
+                    self.system.checkout_book(self.book.isbn, member.member_id)
+                )
+
+            threads = [threading.Thread(target=borrow, args=(m,)) for m in self.members]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(sum("✅" in result for result in results), 1)
+            borrower = self.system.find_borrower(self.book.isbn)
+            self.assertEqual(
+                [m for m in self.members if m.has_borrowed(self.book)], [borrower]
+            )
+            self.system.return_book(self.book.isbn, borrower.member_id)
+
+    def test_lock_ordering(self):
+        """Test that keys map to stable stripes and are acquired in order"""
+        stripes = LockStripes(4)
+        self.assertEqual(stripes.stripe("VID0001"), stripes.stripe("VID0001"))
+        with stripes.hold(["b", "a", "b"]):
+            held = [lock.locked() for lock in stripes.locks]
+        self.assertEqual(sum(held), len({stripes.stripe("a"), stripes.stripe("b")}))
+        self.assertFalse(any(lock.locked() for lock in stripes.locks))
+
+
+class TestIdentityIndex(unittest.TestCase):
+    """Test cases for identity lookups used by the login page"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.system = LibrarySystem()
+        self.member = self.system.register_member(
+            Member("John", "Doe", "John@Test.com")
+        )
+        self.librarian = self.system.register_librarian(
+            Librarian("Jane", "Smith", "jane@test.com")
+        )
+
+    def test_find_by_identity(self):
+        """Test lookups ignore case and surrounding whitespace"""
+        found = self.system.find_member_by_identity("john", "DOE", " john@test.com ")
+        self.assertIs(found, self.member)
+        found = self.system.find_librarian_by_identity("Jane", "Smith", "JANE@test.com")
+        self.assertIs(found, self.librarian)
+
+    def test_identity_requires_matching_names(self):
+        """Test that a known email with other names is not a match"""
+        self.assertIsNone(
+            self.system.find_member_by_identity("Jim", "Doe", "john@test.com")
+        )
+        self.assertIsNone(
+            self.system.find_member_by_identity("John", "Doe", "x@test.com")
+        )
+        self.assertIs(
+            self.system.find_person_by_email("Member", "john@test.com"), self.member
+        )
+
+    def test_roles_are_separate(self):
+        """Test that members and librarians are looked up separately"""
+        self.assertIsNone(
+            self.system.find_member_by_identity("Jane", "Smith", "jane@test.com")
+        )
+        librarian = Librarian("John", "Doe", "john@test.com")
+        self.assertIs(self.system.register_librarian(librarian), librarian)
+
+    def test_duplicate_registration_rejected(self):
+        """Test that registering the same email twice raises an error"""
+        with self.assertRaises(ValueError):
+            self.system.register_member(Member("Johnny", "Doe", "JOHN@test.com"))
+        self.assertEqual(len(self.system.members), 1)
+
+        # Registering the same object again is allowed
+        self.assertIs(self.system.register_member(self.member), self.member)
+
+
+class TestCatalogIndex(unittest.TestCase):
+    """Test cases for the secondary indexes on LibrarySystem"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.system = LibrarySystem()
+        self.system.preload_sample_books()
+        self.system.preload_sample_magazines()
+        self.system.preload_sample_videos()
+        self.system.preload_sample_members()
+        self.member = list(self.system.members.values())[0]
+
+    def scan(self, predicate):
+        """Reference result computed with a linear scan"""
+        return [
+            item
+            for catalog in (
+                self.system.books,
+                self.system.videos,
+                self.system.magazines,
+            )
+            for item in catalog.values()
+            if predicate(item)
+        ]
+
+    def test_genre_and_author_queries(self):
+        """Test hash index lookups match a full scan"""
+        football = self.system.find_items_by_genre("Football", kind="Book")
+        self.assertCountEqual(
+            football,
+            self.scan(lambda i: isinstance(i, Book) and i.genre == "Football"),
+        )
+        self.assertEqual(
+            [b.title for b in self.system.find_items_by_author("cormen et al.")],
+            ["Introduction to Algorithms"],
+        )
+        self.assertCountEqual(
+            self.system.query_items(video_format="DVD"),
+            self.scan(lambda i: getattr(i, "video_format", None) == "DVD"),
+        )
+
+    def test_year_range_query(self):
+        """Test the sorted year index"""
+        self.assertCountEqual(
+            self.system.find_items_by_year(2010),
+            self.scan(lambda i: i.year == 2010),
+        )
+        self.assertCountEqual(
+            self.system.query_items(kind="Video", year_from=2000, year_to=2012),
+            self.scan(lambda i: isinstance(i, Video) and 2000 <= i.year <= 2012),
+        )
+
+    def test_index_tracks_changes(self):
+        """Test that adds, checkouts and returns keep the index current"""
+        self.system.list_genres()
+        video = Video("New Video", 2010, "Sci-Fi", "DVD", 100)
+        self.system.add_video(video)
+        self.assertIn(video, self.system.find_items_by_year(2010))
+
+        self.system.checkout_video(video.video_id, self.member.member_id)
+        self.assertNotIn(video, self.system.query_items(available=True))
+        self.assertIn(video, self.system.query_items(available=False))
+
+        self.system.return_video(video.video_id, self.member.member_id)
+        self.assertIn(video, self.system.query_items(genre="sci-fi", available=True))
+
+    def test_replaced_item_leaves_index(self):
+        """Test that re-adding an ISBN removes the old book from the index"""
+        self.system.list_genres()
+        old = self.system.find_book_by_isbn("9780132350884")
+        new = Book("Clean Code 2", 2025, "Software", "Robert C. Martin", old.isbn)
+        self.system.add_book(new)
+        self.assertNotIn(old, self.system.find_items_by_genre("Computer Science"))
+        self.assertEqual(self.system.find_items_by_genre("Software"), [new])
+        self.assertIn("Software", self.system.list_genres("Book"))
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Test cases for full-text search"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.system = LibrarySystem()
+        self.system.preload_sample_books()
+        self.system.preload_sample_magazines()
+        self.system.preload_sample_videos()
+
+    def test_tokenize_normalises_accents(self):
+        """Test that tokens are case-folded and accent-free"""
+        self.assertEqual(
+            tokenize("I Am Zlatan Ibrahimović"), ["i", "am", "zlatan", "ibrahimovic"]
+        )
+
+    def test_accent_insensitive_search(self):
+        """Test that plain ASCII queries match accented text"""
+        titles = [item.title for item in self.system.search("Ibrahimovic")]
+        self.assertEqual(titles, ["I Am Zlatan Ibrahimović"])
+        titles = [item.title for item in self.system.search("jurgen klopp")]
+        self.assertEqual(
+            titles[0], "Believe Us: How Jürgen Klopp Transformed Liverpool"
+        )
+
+    def test_prefix_search(self):
+        """Test that the last query term matches as a prefix"""
+        titles = [item.title for item in self.system.search("interst")]
+        self.assertEqual(titles, ["Interstellar"])
+
+    def test_ranking_and_kind_filter(self):
+        """Test BM25 ranks the closest match first and kind filters results"""
+        results = self.system.search("new scientist")
+        self.assertEqual(results[0].title, "New Scientist")
+        magazines = self.system.search("science", kind="Magazine")
+        self.assertTrue(magazines)
+        self.assertTrue(all(isinstance(item, Magazine) for item in magazines))
+
+    def test_index_updates_incrementally(self):
+        """Test that added and replaced items are reflected in results"""
+        self.system.search("anything")
+        book = Book("Fluent Python", 2022, "Computer Science", "Luciano Ramalho", "111")
+        self.system.add_book(book)
+        self.assertEqual(self.system.search("ramalho"), [book])
+
+        replacement = Book(
+            "Python Tricks", 2017, "Computer Science", "Dan Bader", "111"
+        )
+        self.system.add_book(replacement)
+        self.assertEqual(self.system.search("ramalho"), [])
+        self.assertEqual(self.system.search("tricks"), [replacement])
+
+
+class TestColumnarCatalog(unittest.TestCase):
+    """Test cases for vectorized aggregates over the columnar catalog"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.system = LibrarySystem()
+        self.system.preload_sample_books()
+        self.system.preload_sample_magazines()
+        self.system.preload_sample_videos()
+        self.system.preload_sample_members()
+        self.member = list(self.system.members.values())[0]
+        self.items = [
+            item
+            for catalog in (
+                self.system.books,
+                self.system.videos,
+                self.system.magazines,
+            )
+            for item in catalog.values()
+        ]
+
+    def test_counts_match_scan(self):
+        """Test counts and group-bys against a Python scan"""
+        self.assertEqual(self.system.count_items(), len(self.items))
+        self.assertEqual(
+            self.system.count_items(kind="Video", year_from=2010),
+            len([i for i in self.items if isinstance(i, Video) and i.year >= 2010]),
+        )
+        expected = {}
+        for item in self.items:
+            expected[item.genre] = expected.get(item.genre, 0) + 1
+        self.assertEqual(self.system.count_by_genre(), expected)
+        self.assertEqual(
+            self.system.count_by_kind(),
+            {
+                "Book": len(self.system.books),
+                "Video": len(self.system.videos),
+                "Magazine": len(self.system.magazines),
+            },
+        )
+
+    def test_availability_bitmap_updates_in_place(self):
+        """Test that checkouts and returns update availability aggregates"""
+        self.assertEqual(self.system.count_items(available=False), 0)
+        video = list(self.system.videos.values())[0]
+        self.system.checkout_video(video.video_id, self.member.member_id)
+        self.assertEqual(self.system.unavailable_items(), [video])
+        self.assertEqual(self.system.count_by_genre(available=False), {video.genre: 1})
+
+        # Direct item calls are observed as well
+        video.return_item()
+        self.assertEqual(self.system.count_items(available=False), 0)
+
+    def test_new_and_replaced_items(self):
+        """Test that adds after the first query are reflected"""
+        total = self.system.count_items()
+        book = Book("Extra", 2024, "Poetry", "Someone", "111")
+        self.system.add_book(book)
+        self.system.add_book(Book("Extra 2", 2024, "Poetry", "Someone", "111"))
+        self.assertEqual(self.system.count_items(), total + 1)
+        self.assertEqual(self.system.count_items(genre="Poetry"), 1)
+        self.assertEqual(self.system.count_items(genre="Unknown"), 0)
+
+
+class TestBulkImport(unittest.TestCase):
+    """Test cases for streaming catalog imports"""
+
+    def setUp(self):
+        """Set up a temporary directory for catalog files"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.system = LibrarySystem()
+
+    def tearDown(self):
+        """Remove the catalog files"""
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        return path
+
+    def test_csv_import(self):
+        """Test that valid CSV rows are imported and invalid rows reported"""
+        path = self.write(
+            "catalog.csv",
+            "type,title,year,genre,author,isbn,video_format,duration,publisher\n"
+            "book,Dune,1965,Sci-Fi,Frank Herbert,111,,,\n"
+            "video,Alien,1979,Sci-Fi,,,DVD,117,\n"
+            "magazine,Wired,2024,Technology,,,,,Conde Nast\n"
+            "book,No ISBN,2000,Drama,Someone,,,,\n"
+            "video,Bad Length,2000,Drama,,,DVD,long,\n"
+            "poster,Unknown,2000,Art,,,,,\n",
+        )
+        report = import_catalog(self.system, path, batch_size=2)
+        self.assertEqual(report.rows_read, 6)
+        self.assertEqual(report.rows_imported, 3)
+        self.assertEqual(
+            [row for row, _ in report.rejected],
+            [4, 5, 6],
+        )
+        self.assertIn("missing isbn", report.rejected[0][1])
+        self.assertEqual(self.system.find_book_by_isbn("111").author, "Frank Herbert")
+        self.assertEqual(len(self.system.videos), 1)
+        self.assertIn("3 of 6 rows", report.summary())
+
+    def test_jsonl_import_rebuilds_indexes(self):
+        """Test JSONL imports and that indexes built earlier see the new items"""
+        self.system.preload_sample_books()
+        self.system.list_genres()
+        path = self.write(
+            "catalog.jsonl",
+            '{"type": "book", "title": "Dune", "year": 1965, "genre": "Sci-Fi", '
+            '"author": "Frank Herbert", "isbn": "111"}\n'
+            "not json\n"
+            '{"type": "magazine", "title": "Wired", "year": 2024, '
+            '"genre": "Technology", "publisher": "Conde Nast"}\n',
+        )
+        report = import_catalog(self.system, path)
+        self.assertEqual(report.rows_imported, 2)
+        self.assertEqual(report.rows_rejected, 1)
+        self.assertEqual(
+            [item.title for item in self.system.find_items_by_genre("Sci-Fi")],
+            ["Dune"],
+        )
+        self.assertEqual(self.system.search("herbert")[0].title, "Dune")
+
+    def test_jsonl_rows_must_be_objects(self):
+        """Test that lines holding other JSON values are rejected, not fatal"""
+        path = self.write(
+            "catalog.jsonl",
+            '5\nnull\n"x"\n[1, 2]\n'
+            '{"type": "book", "title": "Dune", "year": 1965, "genre": "Sci-Fi", '
+            '"author": "Frank Herbert", "isbn": "111"}\n',
+        )
+        report = import_catalog(self.system, path)
+        self.assertEqual(report.rows_imported, 1)
+        self.assertEqual(
+            report.rejected, [(row, "row is not a JSON object") for row in range(1, 5)]
+        )
+
+    def test_duplicate_isbns_add_copies(self):
+        """Test that repeated rows for a book become copies, like add_book"""
+        self.system.add_book(Book("Dune", 1965, "Sci-Fi", "Frank Herbert", "111"))
+        path = self.write(
+            "catalog.csv",
+            "type,title,year,genre,author,isbn\n"
+            "book,Emma,1815,Classic,Jane Austen,222\n"
+            "book,Dune,1965,Sci-Fi,Frank Herbert,111\n"
+            "book,Emma,1815,Classic,Jane Austen,222\n"
+            "book,Emma,1815,Classic,Jane Austen,222\n",
+        )
+        # The second Emma merges within a batch, the third into the catalog
+        report = import_catalog(self.system, path, batch_size=3)
+        self.assertEqual(report.rows_imported, 4)
+        self.assertEqual(self.system.find_book_by_isbn("111").copies, 2)
+        self.assertEqual(self.system.find_book_by_isbn("222").copies, 3)
+        self.assertEqual(self.system.find_book_by_isbn("222").available_copies, 3)
+        self.assertEqual(len(self.system.books), 2)
+
+    def test_import_into_storage(self):
+        """Test that bulk imports are written to the storage backend"""
+        db_path = os.path.join(self.tmpdir, "library.db")
+        system = LibrarySystem(SQLiteStorage(db_path))
+        path = self.write(
+            "catalog.csv",
+            "type,title,year,genre,author,isbn\n"
+            "book,Dune,1965,Sci-Fi,Frank Herbert,111\n"
+            "book,Emma,1815,Classic,Jane Austen,222\n",
+        )
+        import_catalog(system, path)
+        system.storage.close()
+
+        system = LibrarySystem(SQLiteStorage(db_path))
+        self.assertEqual(len(system.books), 2)
+        self.assertEqual(system.find_book_by_isbn("222").title, "Emma")
+        system.storage.close()
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    """Test cases for the SQLite storage backend"""
+
+    def setUp(self):
+        """Set up a temporary database"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "library.db")
+        self.system = LibrarySystem(SQLiteStorage(self.path))
+
+    def tearDown(self):
+        """Close the database and remove it"""
+        self.system.storage.close()
+        shutil.rmtree(self.tmpdir)
+
+    def reopen(self):
+        """Close the current system and load a new one from disk"""
+        self.system.storage.close()
+        self.system = LibrarySystem(SQLiteStorage(self.path))
+
+    def test_items_and_people_persist(self):
+        """Test that items and people survive a restart"""
+        video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        self.system.add_video(video)
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+
+        self.reopen()
+
+        book = self.system.find_book_by_isbn("111")
+        self.assertEqual(book.title, "Test Book")
+        self.assertEqual(book.author, "Author")
+        self.assertEqual(self.system.find_video_by_id(video.video_id).duration, 120)
+        self.assertEqual(self.system.find_member(member.member_id).fname, "John")
+        self.assertEqual(len(self.system.books), 1)
+
+    def test_loans_persist(self):
+        """Test that checkouts and returns survive a restart"""
+        self.system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.checkout_book("111", member.member_id)
+
+        self.reopen()
+
+        book = self.system.find_book_by_isbn("111")
+        restored = self.system.find_member(member.member_id)
+        self.assertFalse(book.is_available)
+        self.assertIn(book, restored.borrowed_items)
+        self.assertIs(self.system.find_borrower("111"), restored)
+
+        result = self.system.return_book("111", member.member_id)
+        self.assertIn("✅", result)
+        self.reopen()
+        self.assertTrue(self.system.find_book_by_isbn("111").is_available)
+        self.assertEqual(self.system.find_member(member.member_id).borrowed_items, [])
+
+    def test_preload_runs_once(self):
+        """Test that sample data is not loaded again after a restart"""
+        self.system.preload_sample_videos()
+        self.system.preload_sample_members()
+        count = len(self.system.videos)
+
+        self.reopen()
+        self.system.preload_sample_videos()
+        self.system.preload_sample_members()
+        self.assertEqual(len(self.system.videos), count)
+        self.assertEqual(len(self.system.members), 1)
+
+    def test_new_ids_continue_after_restart(self):
+        """Test that IDs allocated after a restart do not reuse stored IDs"""
+        video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.system.add_video(video)
+        self.reopen()
+        self.assertNotEqual(
+            Video("Other", 2023, "Action", "DVD", 90).video_id, video.video_id
+        )
+
+    def test_checkouts_commit_without_flush(self):
+        """Test that a checkout is visible to another connection at once"""
+        self.system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.checkout_book("111", member.member_id)
+
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute("SELECT item_key, member_id FROM loans").fetchall()
+            available = conn.execute("SELECT is_available FROM items").fetchone()
+        finally:
+            conn.close()
+        self.assertEqual(rows, [("111", member.member_id)])
+        self.assertEqual(available, (0,))
+
+    def test_failed_write_leaves_memory_unchanged(self):
+        """Test that a checkout the database refuses changes nothing in memory"""
+        self.system.storage.close()
+        self.system = LibrarySystem(SQLiteStorage(self.path, timeout=0.05))
+        book = Book("Test Book", 2023, "Fiction", "Author", "111")
+        self.system.add_book(book)
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+
+        other = sqlite3.connect(self.path)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                self.system.checkout_book("111", member.member_id)
+        finally:
+            other.rollback()
+            other.close()
+        self.assertTrue(book.is_available)
+        self.assertEqual(member.loans, {})
+        self.assertEqual(self.system.loans, {})
+
+        self.assertIn("✅", self.system.checkout_book("111", member.member_id))
+        self.reopen()
+        self.assertFalse(self.system.find_book_by_isbn("111").is_available)
+
+    def test_bulk_add_looks_up_stored_books_at_once(self):
+        """Test that bulk adds find catalogued ISBNs with one query"""
+        self.system.add_book(Book("Dune", 1965, "Sci-Fi", "Frank Herbert", "111"))
+        self.reopen()
+        statements = []
+        self.system.storage.conn.set_trace_callback(statements.append)
+        self.system.bulk_add_items(
+            [
+                Book("Dune", 1965, "Sci-Fi", "Frank Herbert", "111"),
+                Book("Emma", 1815, "Classic", "Jane Austen", "222"),
+                Book("Persuasion", 1817, "Classic", "Jane Austen", "333"),
+            ]
+        )
+        self.system.storage.conn.set_trace_callback(None)
+        lookups = [
+            text for text in statements if text.startswith("SELECT * FROM items")
+        ]
+        self.assertEqual(len(lookups), 1)
+        self.reopen()
+        self.assertEqual(self.system.find_book_by_isbn("111").copies, 2)
+        self.assertEqual(len(self.system.books), 3)
+
+    def test_failed_batch_write_changes_nothing(self):
+        """Test that a batch whose third write fails is left out everywhere"""
+        books = [Book(f"Book {i}", 2000, "Drama", "Author", str(i)) for i in range(3)]
+        self.system.bulk_add_items(books)
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.storage.conn.execute(
+            "CREATE TRIGGER fail_third BEFORE INSERT ON loans "
+            "WHEN NEW.item_key = '2' BEGIN SELECT RAISE(ABORT, 'disk full'); END"
+        )
+        operations = [(book.isbn, "checkout") for book in books]
+        batch = self.system.process_batch(member.member_id, operations)
+        self.assertFalse(batch.success)
+        self.assertEqual(
+            [result.error for result in batch.results], ["write_failed"] * 3
+        )
+        self.assertEqual(member.loans, {})
+        self.assertTrue(all(book.is_available for book in books))
+        rows = self.system.storage.conn.execute("SELECT * FROM loans").fetchall()
+        self.assertEqual(rows, [])
+
+        self.system.storage.conn.execute("DROP TRIGGER fail_third")
+        self.assertTrue(self.system.process_batch(member.member_id, operations).success)
+        self.reopen()
+        self.assertEqual(
+            sorted(self.system.find_member(member.member_id).loans), ["0", "1", "2"]
+        )
+
+
+class TestOperationJournal(unittest.TestCase):
+    """Test cases for the operation journal and snapshot recovery"""
+
+    def setUp(self):
+        """Set up a journaled system in a temporary directory"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.system = LibrarySystem(journal=Journal(self.tmpdir, fsync_every=1))
+
+    def tearDown(self):
+        """Close the journal and remove its files"""
+        self.system.journal.close()
+        shutil.rmtree(self.tmpdir)
+
+    def reopen(self):
+        """Close the journal and recover a new system from disk"""
+        self.system.journal.close()
+        self.system = LibrarySystem(journal=Journal(self.tmpdir, fsync_every=1))
+
+    def populate(self):
+        """Add items and a member with one book checked out"""
+        self.system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        self.system.add_book(Book("Other Book", 2020, "Drama", "Author", "222"))
+        self.video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.system.add_video(self.video)
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+        self.system.checkout_book("111", self.member.member_id)
+        self.system.checkout_book("222", self.member.member_id)
+        self.system.return_book("222", self.member.member_id)
+
+    def assert_recovered(self):
+        """Check the state written by populate"""
+        member = self.system.find_member(self.member.member_id)
+        self.assertEqual(member.email_address, "john@test.com")
+        self.assertFalse(self.system.find_book_by_isbn("111").is_available)
+        self.assertTrue(self.system.find_book_by_isbn("222").is_available)
+        self.assertIs(self.system.find_borrower("111"), member)
+        self.assertEqual(
+            self.system.find_video_by_id(self.video.video_id).duration, 120
+        )
+        self.assertEqual(
+            self.system.find_member_by_identity("John", "Doe", "john@test.com"), member
+        )
+
+    def test_replay_restores_state(self):
+        """Test that the journal alone restores items, members and loans"""
+        self.populate()
+        self.reopen()
+        self.assert_recovered()
+
+    def test_snapshot_and_tail(self):
+        """Test recovery from a snapshot plus the records written after it"""
+        self.populate()
+        self.system.journal.compact(self.system)
+        self.system.return_book("111", self.member.member_id)
+        self.system.add_book(Book("New Book", 2024, "Drama", "Author", "333"))
+
+        self.reopen()
+        files = os.listdir(self.tmpdir)
+        self.assertEqual(len([name for name in files if name.endswith(".snap")]), 1)
+        self.assertTrue(self.system.find_book_by_isbn("111").is_available)
+        self.assertIsNone(self.system.find_borrower("111"))
+        self.assertIsNotNone(self.system.find_book_by_isbn("333"))
+
+    def test_compaction_removes_old_segments(self):
+        """Test that compaction leaves one snapshot and only new segments"""
+        self.populate()
+        self.system.journal.compact(self.system)
+        self.reopen()
+        self.system.journal.compact(self.system)
+        logs = [name for name in os.listdir(self.tmpdir) if name.endswith(".log")]
+        self.assertEqual(len(logs), 1)
+        self.reopen()
+        self.assert_recovered()
+
+    def test_torn_tail_is_ignored(self):
+        """Test that a partially written last record is dropped on recovery"""
+        self.populate()
+        self.system.journal.close()
+        segment = sorted(
+            name for name in os.listdir(self.tmpdir) if name.endswith(".log")
+        )[-1]
+        with open(os.path.join(self.tmpdir, segment), "ab") as handle:
+            handle.write(b"\x40\x00\x00\x00garbage")
+        self.system = LibrarySystem(journal=Journal(self.tmpdir))
+        self.assert_recovered()
+        self.system.checkout_book("222", self.member.member_id)
+        self.reopen()
+        self.assertFalse(self.system.find_book_by_isbn("222").is_available)
+
+    def test_torn_first_record_of_a_segment(self):
+        """Test that records written after recovering such a tear survive"""
+        self.populate()
+        self.system.journal.close()
+        torn = f"segment-{self.system.journal.sequence + 1:012d}.log"
+        with open(os.path.join(self.tmpdir, torn), "wb") as handle:
+            handle.write(b"\x40\x00\x00\x00garbage")
+        self.reopen()
+        self.system.add_book(Book("New Book", 2024, "Drama", "Author", "333"))
+        self.reopen()
+        self.assert_recovered()
+        self.assertEqual(self.system.find_book_by_isbn("333").title, "New Book")
+
+    def test_recovered_ids_are_not_reused(self):
+        """Test that IDs allocated after recovery continue after the journaled ones"""
+        self.populate()
+        self.reopen()
+        other = Member("Jane", "Doe", "jane@test.com")
+        self.assertNotEqual(other.member_id, self.member.member_id)
+        self.assertNotEqual(
+            Video("Other", 2023, "Action", "DVD", 90).video_id, self.video.video_id
+        )
+
+    def test_batch_and_bulk_operations_are_journaled(self):
+        """Test that process_batch and bulk_add_items are recovered"""
+        books = [Book(f"Book {i}", 2000, "Drama", "Author", f"B{i}") for i in range(5)]
+        self.system.bulk_add_items(books)
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.process_batch(
+            member.member_id, [("B0", "checkout"), ("B1", "checkout")]
+        )
+        self.reopen()
+        self.assertEqual(len(self.system.books), 5)
+        self.assertEqual(
+            sorted(self.system.find_member(member.member_id).loans), ["B0", "B1"]
+        )
+
+    def test_torn_batch_is_dropped_whole(self):
+        """Test that a batch is one journal record, recovered all or nothing"""
+        books = [Book(f"Book {i}", 2000, "Drama", "Author", f"B{i}") for i in range(3)]
+        self.system.bulk_add_items(books)
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.process_batch(
+            member.member_id, [("B0", "checkout"), ("B1", "checkout")]
+        )
+        self.system.process_batch(
+            member.member_id, [("B0", "return"), ("B2", "checkout")]
+        )
+        self.system.journal.close()
+        segments = [name for name in os.listdir(self.tmpdir) if name.endswith(".log")]
+        segment = os.path.join(self.tmpdir, max(segments))
+        records = list(read_records(segment))
+        self.assertEqual([record[1] for record in records[-2:]], ["batch", "batch"])
+        # Cut the last batch short, as a crash while writing it would
+        with open(segment, "r+b") as handle:
+            handle.truncate(os.path.getsize(segment) - 10)
+        self.system = LibrarySystem(journal=Journal(self.tmpdir, fsync_every=1))
+        self.assertEqual(
+            sorted(self.system.find_member(member.member_id).loans), ["B0", "B1"]
+        )
+        self.assertTrue(self.system.find_book_by_isbn("B2").is_available)
+
+
+class TestMappedSnapshot(unittest.TestCase):
+    """Test cases for memory-mapped snapshots"""
+
+    def setUp(self):
+        """Write a snapshot of a small library"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "library.snap")
+        system = LibrarySystem()
+        system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        system.add_book(Book("Café Book", 2020, "Drama", "Zoë", "222"))
+        self.video = Video("Test Video", 2023, "Action", "DVD", 120)
+        system.add_video(self.video)
+        self.magazine = Magazine("Test Magazine", 2023, "News", "Publisher")
+        system.add_magazine(self.magazine)
+        self.member = system.register_member(Member("John", "Doe", "john@test.com"))
+        self.librarian = system.register_librarian(
+            Librarian("Jane", "Smith", "jane@test.com")
+        )
+        system.checkout_book("111", self.member.member_id)
+        system.checkout_video(self.video.video_id, self.member.member_id)
+        write_snapshot(system, self.path)
+        self.snapshot = MappedSnapshot(self.path)
+        self.system = LibrarySystem(storage=self.snapshot)
+
+    def tearDown(self):
+        """Close the snapshot and remove it"""
+        self.snapshot.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_items_are_materialised_on_lookup(self):
+        """Test that opening decodes nothing and lookups decode one item"""
+        self.assertEqual(len(self.system.books), 2)
+        self.assertEqual(self.system.books._cache, {})
+        book = self.system.find_book_by_isbn("222")
+        self.assertEqual(
+            (book.title, book.author, book.year), ("Café Book", "Zoë", 2020)
+        )
+        self.assertEqual(list(self.system.books._cache), ["222"])
+        self.assertIs(self.system.find_book_by_isbn("222"), book)
+        self.assertIsNone(self.system.find_book_by_isbn("999"))
+
+    def test_all_fields_round_trip(self):
+        """Test that every item and person field is restored"""
+        video = self.system.find_video_by_id(self.video.video_id)
+        self.assertEqual((video.video_format, video.duration), ("DVD", 120))
+        magazine = self.system.find_magazine_by_id(self.magazine.magazine_id)
+        self.assertEqual(magazine.publisher, "Publisher")
+        librarian = self.system.find_librarian(self.librarian.librarian_id)
+        self.assertEqual(librarian.email_address, "jane@test.com")
+        self.assertEqual(sorted(self.system.books), ["111", "222"])
+
+    def test_loans_round_trip(self):
+        """Test that members and the loan registry are restored"""
+        member = self.system.find_member(self.member.member_id)
+        book = self.system.find_book_by_isbn("111")
+        self.assertFalse(book.is_available)
+        self.assertEqual(len(member.borrowed_items), 2)
+        self.assertIn(book, member.borrowed_items)
+        self.assertIs(self.system.find_borrower("111"), member)
+        self.assertIn("✅", self.system.return_book("111", member.member_id))
+        self.assertTrue(book.is_available)
+
+    def test_changes_stay_in_overlay(self):
+        """Test that additions and deletions are layered over the file"""
+        self.system.add_book(Book("New Book", 2024, "Drama", "Author", "333"))
+        del self.system.books["222"]
+        self.assertEqual(len(self.system.books), 2)
+        self.assertEqual(sorted(self.system.books), ["111", "333"])
+        self.assertNotIn("222", self.system.books)
+        self.assertEqual(self.system.list_genres("Book"), ["Drama", "Fiction"])
+
+    def test_new_ids_continue_after_snapshot(self):
+        """Test that IDs allocated after opening do not reuse snapshot IDs"""
+        self.assertNotEqual(
+            Video("Other", 2023, "Action", "DVD", 90).video_id, self.video.video_id
+        )
+
+    def test_rejects_other_files(self):
+        """Test that a file without the snapshot header is rejected"""
+        path = os.path.join(self.tmpdir, "other.snap")
+        with open(path, "wb") as handle:
+            handle.write(b"\0" * 256)
+        with self.assertRaises(ValueError):
+            MappedSnapshot(path)
+
+
+def _allocate_ids(path, sequence, count, block_size):
+    """Allocate count numbers from a shared counter file in a child process"""
+    allocator = FileIdAllocator(path, block_size)
+    return [allocator.next_id(sequence) for _ in range(count)]
+
+
+class TestIdAllocator(unittest.TestCase):
+    """Test cases for hi/lo ID allocation"""
+
+    def setUp(self):
+        """Set up a temporary directory for counter files"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "ids.json")
+
+    def tearDown(self):
+        """Remove the counter files"""
+        shutil.rmtree(self.tmpdir)
+
+    def test_numbers_are_sequential_within_a_process(self):
+        """Test that a local allocator counts up across block boundaries"""
+        allocator = IdAllocator(block_size=3)
+        self.assertEqual(
+            [allocator.next_id("video") for _ in range(7)], list(range(1, 8))
+        )
+        self.assertEqual(allocator.next_id("magazine"), 1)
+
+    def test_ensure_above_skips_used_numbers(self):
+        """Test that numbers at or below a loaded ID are never handed out"""
+        allocator = IdAllocator(block_size=10)
+        allocator.next_id("member")
+        allocator.ensure_above("member", 42)
+        self.assertEqual(allocator.next_id("member"), 43)
+        allocator.ensure_above("member", 5)
+        self.assertEqual(allocator.next_id("member"), 44)
+
+    def test_members_and_librarians_have_separate_sequences(self):
+        """Test that registering librarians does not consume member numbers"""
+        member = Member("John", "Doe", "john@test.com")
+        Librarian("Jane", "Smith", "jane@test.com")
+        self.assertEqual(
+            Member("Amy", "Lee", "amy@test.com").member_number,
+            member.member_number + 1,
+        )
+
+    def test_threads_never_share_a_number(self):
+        """Test that concurrent threads receive distinct numbers"""
+        allocator = IdAllocator(block_size=7)
+        results = [[] for _ in range(8)]
+
+        def worker(index):
+            for _ in range(2000):
+                results[index].append(allocator.next_id("video"))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        numbers = [number for result in results for number in result]
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+    def test_counter_file_survives_restart(self):
+        """Test that a new allocator on the same file continues after old blocks"""
+        first = FileIdAllocator(self.path, block_size=10)
+        used = [first.next_id("video") for _ in range(3)]
+        second = FileIdAllocator(self.path, block_size=10)
+        self.assertGreater(second.next_id("video"), max(used))
+
+    def test_processes_never_share_a_number(self):
+        """Stress test: several processes allocating from one file never collide"""
+        with multiprocessing.Pool(4) as pool:
+            results = pool.starmap(_allocate_ids, [(self.path, "member", 3000, 50)] * 8)
+        numbers = [number for result in results for number in result]
+        self.assertEqual(len(numbers), 8 * 3000)
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+
+class TestResults(unittest.TestCase):
+    """Test cases for structured operation results"""
+
+    def setUp(self):
+        """Set up a system with one book and one member"""
+        self.system = LibrarySystem()
+        self.book = Book("Test Book", 2023, "Fiction", "Author", "111")
+        self.system.add_book(self.book)
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+
+    def test_success_result(self):
+        """Test the fields of a successful checkout"""
+        result = self.system.checkout_book("111", self.member.member_id)
+        self.assertIsInstance(result, Result)
+        self.assertTrue(result.ok)
+        self.assertIs(result.status, Status.SUCCESS)
+        self.assertIsNone(result.error)
+        self.assertIs(result.item, self.book)
+        self.assertEqual(result.action, "checkout")
+
+    def test_error_codes(self):
+        """Test that failures carry an error code instead of only a message"""
+        member_id = self.member.member_id
+        self.system.checkout_book("111", member_id)
+        cases = [
+            (self.system.checkout_book("111", member_id), "unavailable"),
+            (self.system.checkout_book("999", member_id), "not_found"),
+            (self.system.checkout_book("111", "MBR9999"), "member_not_found"),
+            (self.system.return_book("999", member_id), "item_or_member_not_found"),
+            (self.book.checkout_item(), "already_checked_out"),
+        ]
+        for result, error in cases:
+            self.assertFalse(result.ok)
+            self.assertIs(result.status, Status.FAILURE)
+            self.assertEqual(result.error, error)
+        self.system.return_book("111", member_id)
+        self.assertEqual(self.book.return_item().error, "not_checked_out")
+        self.assertEqual(self.member.return_item(self.book).error, "not_borrowed")
+
+    def test_messages_render_as_before(self):
+        """Test that results render to the existing display text"""
+        member_id = self.member.member_id
+        self.assertEqual(
+            str(self.system.checkout_book("111", member_id)),
+            " ✅ You have successfully checked out\nTest Book\nISBN: 111",
+        )
+        self.assertEqual(
+            str(self.system.checkout_book("111", member_id)),
+            "❌ Test Book is not available for borrowing",
+        )
+        self.assertEqual(
+            str(self.system.checkout_book("999", member_id)), "❌ Book not found."
+        )
+        video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.assertEqual(
+            str(self.system.add_video(video)),
+            "🎞️ Video 'Test Video' added successfully.",
+        )
+        self.assertEqual(
+            str(self.system.return_video(video.video_id, member_id)),
+            "❌ Test Video is not in your borrowed list",
+        )
+        self.assertIn("✅", self.system.return_book("111", member_id))
+
+
+class TestSortedListing(unittest.TestCase):
+    """Test cases for sorted, cursor-paginated listings"""
+
+    def setUp(self):
+        """Set up a system with books in several genres and years"""
+        self.system = LibrarySystem()
+        self.books = [
+            Book(
+                f"Book {i:02d}", 2000 + i % 5, ["Drama", "Science"][i % 2], "A", str(i)
+            )
+            for i in range(30)
+        ]
+        for book in self.books:
+            self.system.add_book(book)
+
+    def all_pages(self, **options):
+        """Follow cursors to the end and return every item in order"""
+        items, cursor = [], None
+        while True:
+            page = self.system.list_items("Book", cursor=cursor, limit=7, **options)
+            items.extend(page.items)
+            if page.next_cursor is None:
+                return items
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_item_once(self):
+        """Test that following cursors returns each item once, sorted by title"""
+        self.assertEqual(self.all_pages(), sorted(self.books, key=lambda b: b.title))
+
+    def test_sort_by_year(self):
+        """Test sorting by year, ascending and descending"""
+        years = [book.year for book in self.all_pages(sort="year")]
+        self.assertEqual(years, sorted(years))
+        years = [book.year for book in self.all_pages(sort="year", descending=True)]
+        self.assertEqual(years, sorted(years, reverse=True))
+        self.assertEqual(len(years), 30)
+
+    def test_sort_by_availability_follows_checkouts(self):
+        """Test that checked out items move behind available ones"""
+        self.system.list_items("Book", sort="availability")
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.checkout_book("0", member.member_id)
+        items = self.all_pages(sort="availability")
+        self.assertIs(items[-1], self.books[0])
+        self.system.return_book("0", member.member_id)
+        self.assertIs(self.all_pages(sort="availability")[0], self.books[0])
+
+    def test_filters(self):
+        """Test genre and availability filters"""
+        self.system.books["1"].is_available = False
+        drama = self.all_pages(genre="drama")
+        self.assertEqual(len(drama), 15)
+        self.assertTrue(all(book.genre == "Drama" for book in drama))
+        science = self.all_pages(genre="Science", available=True)
+        self.assertEqual(len(science), 14)
+        self.assertNotIn(self.books[1], science)
+
+    def test_filtered_pages_by_year(self):
+        """Test availability filters combined with the year sort"""
+        member = self.system.register_member(Member("John", "Doe", "john@test.com"))
+        self.system.list_items("Book")
+        for isbn in ("3", "8", "13"):
+            self.system.checkout_book(isbn, member.member_id)
+        checked_out = self.all_pages(sort="year", available=False)
+        self.assertEqual([book.isbn for book in checked_out], ["3", "8", "13"])
+        available = self.all_pages(sort="year", available=True, descending=True)
+        self.assertEqual(len(available), 27)
+        years = [book.year for book in available]
+        self.assertEqual(years, sorted(years, reverse=True))
+
+    def test_limit_must_be_positive(self):
+        """Test that an empty page size is rejected"""
+        with self.assertRaises(ValueError):
+            self.system.list_items("Book", limit=0)
+
+    def test_concurrent_checkouts_keep_lists_sorted(self):
+        """Test that parallel checkouts of different items keep every list in order"""
+        system = LibrarySystem(concurrent=True)
+        books = [
+            Book(f"Book {i:03d}", 2000 + i % 7, "Drama", "A", str(i))
+            for i in range(200)
+        ]
+        system.bulk_add_items(books)
+        system.list_items("Book")
+        members = [
+            system.register_member(Member("Reader", str(i), f"r{i}@test.com"))
+            for i in range(8)
+        ]
+        errors = []
+
+        def worker(index):
+            # Each thread cycles through its own share of the books
+            mine = books[index::8]
+            try:
+                for _ in range(20):
+                    for book in mine:
+                        system.checkout_book(book.isbn, members[index].member_id)
+                    for book in mine[::2]:
+                        system.return_book(book.isbn, members[index].member_id)
+                    for book in mine[::2]:
+                        system.checkout_book(book.isbn, members[index].member_id)
+                    for book in mine:
+                        system.return_book(book.isbn, members[index].member_id)
+            except Exception as error:
+                errors.append(error)
+
+        # Switch threads often so unguarded list updates would interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(system.loans, {})
+        for (_, _, sort), (keys, items) in system.listing.lists.items():
+            self.assertEqual(keys, sorted(keys))
+            self.assertEqual(keys, [LIST_KEYS[sort](item) for item in items])
+
+    def test_cursor_is_stable_across_inserts(self):
+        """Test that an item added before the cursor does not shift the next page"""
+        first = self.system.list_items("Book", limit=10)
+        self.system.add_book(Book("AAA First", 2020, "Drama", "A", "new"))
+        second = self.system.list_items("Book", cursor=first.next_cursor, limit=10)
+        self.assertEqual(second.items[0].title, "Book 10")
+
+    def test_invalid_cursor(self):
+        """Test that a malformed or mismatched cursor is rejected"""
+        page = self.system.list_items("Book", limit=5)
+        with self.assertRaises(ValueError):
+            self.system.list_items("Book", cursor="not a cursor")
+        with self.assertRaises(ValueError):
+            self.system.list_items("Book", sort="year", cursor=page.next_cursor)
+
+
+class TestCatalogStats(unittest.TestCase):
+    """Test cases for live catalog statistics"""
+
+    def setUp(self):
+        """Set up a system with items in two genres and one member"""
+        self.system = LibrarySystem()
+        self.system.add_book(Book("Book A", 2020, "Drama", "Author", "111"))
+        self.system.add_book(Book("Book B", 2021, "Science", "Author", "222"))
+        self.video = Video("Video A", 2022, "Drama", "DVD", 100)
+        self.system.add_video(self.video)
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+
+    def test_snapshot_counts(self):
+        """Test the totals in a snapshot"""
+        stats = self.system.stats_snapshot()
+        self.assertEqual(stats["total"], 3)
+        self.assertEqual(stats["available"], 3)
+        self.assertEqual(stats["by_kind"]["Book"], {"total": 2, "checked_out": 0})
+        self.assertEqual(stats["by_genre"]["Drama"]["total"], 2)
+        self.assertEqual(stats["active_loans"], 0)
+
+    def test_counters_follow_checkouts_and_returns(self):
+        """Test that checkouts and returns update the counters"""
+        self.system.stats_snapshot()
+        self.system.checkout_book("111", self.member.member_id)
+        self.system.checkout_video(self.video.video_id, self.member.member_id)
+        stats = self.system.stats_snapshot()
+        self.assertEqual(stats["checked_out"], 2)
+        self.assertEqual(stats["by_genre"]["Drama"]["checked_out"], 2)
+        self.assertEqual(stats["loans_by_member"], {self.member.member_id: 2})
+
+        self.system.return_book("111", self.member.member_id)
+        self.system.checkout_book("111", self.member.member_id)
+        self.system.return_book("111", self.member.member_id)
+        stats = self.system.stats_snapshot()
+        self.assertEqual(stats["checked_out"], 1)
+        self.assertEqual(stats["active_loans"], 1)
+        self.assertEqual(self.system.verify_stats(), [])
+
+    def test_counters_follow_additions_and_replacements(self):
+        """Test that adding and replacing items keeps the counters right"""
+        self.system.stats_snapshot()
+        self.system.add_magazine(Magazine("Mag", 2023, "News", "Publisher"))
+        self.system.add_book(Book("Book A2", 2020, "Science", "Author", "111"))
+        stats = self.system.stats_snapshot()
+        self.assertEqual(stats["total"], 4)
+        self.assertEqual(stats["by_genre"]["Science"]["total"], 2)
+        self.assertEqual(stats["by_genre"]["Drama"]["total"], 1)
+        self.assertEqual(self.system.verify_stats(), [])
+
+    def test_batch_and_bulk_operations(self):
+        """Test counters after process_batch and bulk_add_items"""
+        self.system.process_batch(
+            self.member.member_id, [("111", "checkout"), ("222", "checkout")]
+        )
+        self.assertEqual(self.system.stats_snapshot()["checked_out"], 2)
+        self.system.bulk_add_items([Book("Bulk", 2020, "Drama", "Author", "333")])
+        self.system.process_batch(self.member.member_id, [("111", "return")])
+        stats = self.system.stats_snapshot()
+        self.assertEqual((stats["total"], stats["checked_out"]), (4, 1))
+        self.assertEqual(self.system.verify_stats(), [])
+
+    def test_concurrent_checkouts_keep_counts(self):
+        """Test that parallel checkouts and returns leave consistent counters"""
+        system = LibrarySystem(concurrent=True)
+        system.bulk_add_items(
+            [Book(f"Book {i}", 2020, "Drama", "Author", str(i)) for i in range(50)]
+        )
+        system.stats_snapshot()
+        members = [
+            system.register_member(Member(f"M{i}", "Doe", f"m{i}@test.com"))
+            for i in range(4)
+        ]
+
+        def worker(member):
+            for i in range(500):
+                isbn = str(i % 50)
+                if system.checkout_book(isbn, member.member_id).ok and i % 3:
+                    system.return_book(isbn, member.member_id)
+
+        threads = [threading.Thread(target=worker, args=(m,)) for m in members]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(system.verify_stats(), [])
+
+    def test_verifier_reports_drift(self):
+        """Test that the verifier finds counters that no longer match"""
+        self.system.stats.items[("Book", "Drama")] += 5
+        problems = self.system.verify_stats()
+        self.assertEqual(len(problems), 1)
+        self.assertIn("Drama", problems[0])
+
+
+class TestDueDates(unittest.TestCase):
+    """Test cases for loan due dates and the overdue index"""
+
+    def setUp(self):
+        """Set up a system with a member and one item of each type"""
+        self.system = LibrarySystem()
+        self.book = Book("Test Book", 2023, "Fiction", "Author", "111")
+        self.video = Video("Test Video", 2023, "Action", "DVD", 120)
+        self.system.add_book(self.book)
+        self.system.add_video(self.video)
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+        self.system.checkout_book("111", self.member.member_id)
+        self.system.checkout_video(self.video.video_id, self.member.member_id)
+        self.book_loan = self.member.loans["111"]
+        self.video_loan = self.member.loans[self.video.video_id]
+
+    def test_due_date_depends_on_item_type(self):
+        """Test that books are lent for 21 days and videos for 7"""
+        loan = self.book_loan
+        self.assertEqual(loan.due_at - loan.checked_out_at, 21 * SECONDS_PER_DAY)
+        loan = self.video_loan
+        self.assertEqual(loan.due_at - loan.checked_out_at, 7 * SECONDS_PER_DAY)
+        self.assertFalse(loan.is_overdue())
+        self.assertTrue(loan.is_overdue(now=loan.due_at + 1))
+
+    def test_overdue_and_due_soon(self):
+        """Test the overdue and due-within queries at different times"""
+        start = self.book_loan.checked_out_at
+        self.assertEqual(self.system.overdue_loans(), [])
+        eight_days = start + 8 * SECONDS_PER_DAY
+        self.assertEqual(self.system.overdue_loans(now=eight_days), [self.video_loan])
+        self.assertEqual(
+            self.system.loans_due_within(hours=48, now=start + 6 * SECONDS_PER_DAY),
+            [self.video_loan],
+        )
+        later = start + 30 * SECONDS_PER_DAY
+        self.assertEqual(
+            self.system.overdue_loans(now=later), [self.video_loan, self.book_loan]
+        )
+
+    def test_queries_after_later_ones(self):
+        """Test windows that start before an earlier query's time"""
+        start = self.book_loan.checked_out_at
+        later = start + 30 * SECONDS_PER_DAY
+        self.system.overdue_loans(now=later)
+        self.system.add_book(Book("Other Book", 2020, "Drama", "Author", "222"))
+        self.system.checkout_book("222", self.member.member_id)
+        new_loan = self.member.loans["222"]
+        self.assertEqual(
+            self.system.overdue_loans(now=later),
+            [self.video_loan, self.book_loan, new_loan],
+        )
+        self.assertEqual(
+            self.system.loans_due_within(hours=48, now=start + 6 * SECONDS_PER_DAY),
+            [self.video_loan],
+        )
+        self.assertEqual(
+            self.system.loans_due_within(hours=24, now=new_loan.due_at - 60),
+            [self.book_loan, new_loan],
+        )
+
+    def test_returned_loans_are_not_reported(self):
+        """Test that returns, including ones of re-borrowed items, drop old loans"""
+        later = self.book_loan.checked_out_at + 30 * SECONDS_PER_DAY
+        self.system.overdue_loans(now=later)
+        self.system.return_book("111", self.member.member_id)
+        self.system.return_video(self.video.video_id, self.member.member_id)
+        self.system.checkout_book("111", self.member.member_id)
+        overdue = self.system.overdue_loans(now=later)
+        self.assertEqual(overdue, [self.member.loans["111"]])
+        self.assertIsNot(overdue[0], self.book_loan)
+
+    def test_heap_stays_correct_through_many_returns(self):
+        """Test the index after stale entries force rebuilds"""
+        books = [Book(f"B{i}", 2020, "Drama", "A", f"B{i}") for i in range(200)]
+        self.system.bulk_add_items(books)
+        self.system.overdue_loans()
+        for i, book in enumerate(books):
+            self.system.checkout_book(book.isbn, self.member.member_id)
+            if i % 4:
+                self.system.return_book(book.isbn, self.member.member_id)
+        later = self.book_loan.checked_out_at + 30 * SECONDS_PER_DAY
+        self.assertEqual(len(self.system.overdue_loans(now=later)), 52)
+        self.assertEqual(len(self.system.due_index), 52)
+
+    def test_due_dates_persist(self):
+        """Test that due dates survive a restart with SQLite and the journal"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "library.db")
+            journal_dir = os.path.join(tmpdir, "journal")
+            for make in (
+                lambda: LibrarySystem(SQLiteStorage(path)),
+                lambda: LibrarySystem(journal=Journal(journal_dir)),
+            ):
+                system = make()
+                system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+                member = system.register_member(Member("Jo", "Doe", "jo@test.com"))
+                system.checkout_book("111", member.member_id)
+                due_at = member.loans["111"].due_at
+                system.flush()
+                (system.storage or system.journal).close()
+
+                system = make()
+                restored = system.find_member(member.member_id)
+                self.assertEqual(restored.loans["111"].due_at, due_at)
+                self.assertEqual(len(system.overdue_loans(now=due_at + 1)), 1)
+                (system.storage or system.journal).close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestHolds(unittest.TestCase):
+    """Test cases for hold queues and promotion on return"""
+
+    def setUp(self):
+        """Set up a checked-out book and a few waiting members"""
+        self.system = LibrarySystem()
+        self.book = Book("Test Book", 2023, "Fiction", "Author", "111")
+        self.system.add_book(self.book)
+        self.members = [
+            self.system.register_member(Member(f"M{i}", "Doe", f"m{i}@test.com"))
+            for i in range(4)
+        ]
+        self.ids = [member.member_id for member in self.members]
+        self.system.checkout_book("111", self.ids[0])
+        self.ready = []
+        self.system.on_hold_ready = self.ready.append
+
+    def test_place_hold(self):
+        """Test placing holds and the errors for available or borrowed items"""
+        result = self.system.place_hold("111", self.ids[1])
+        self.assertTrue(result.ok)
+        self.assertIn("waitlist", str(result))
+        self.assertEqual(self.system.holds.waiting("111"), 1)
+        # A second hold by the same member is not queued twice
+        self.system.place_hold("111", self.ids[1])
+        self.assertEqual(self.system.holds.waiting("111"), 1)
+
+        self.assertEqual(
+            self.system.place_hold("111", self.ids[0]).error, "already_borrowed"
+        )
+        self.system.add_book(Book("Other", 2023, "Fiction", "Author", "222"))
+        self.assertEqual(self.system.place_hold("222", self.ids[1]).error, "available")
+        self.assertEqual(self.system.place_hold("999", self.ids[1]).error, "not_found")
+        with self.assertRaises(ValueError):
+            self.system.place_hold("111", self.ids[2], tier="gold")
+
+    def test_return_promotes_by_tier_then_order(self):
+        """Test that priority holds go first and standard ones in FIFO order"""
+        self.system.place_hold("111", self.ids[1])
+        self.system.place_hold("111", self.ids[2])
+        self.system.place_hold("111", self.ids[3], tier="priority")
+
+        self.system.return_book("111", self.ids[0])
+        self.assertEqual([hold.member for hold in self.ready], [self.members[3]])
+        self.assertEqual(self.system.holds_for(self.ids[3])[0].status, "ready")
+
+        # The item is kept for the member whose hold is ready
+        self.assertEqual(
+            self.system.checkout_book("111", self.ids[1]).error, "reserved"
+        )
+        self.assertTrue(self.system.checkout_book("111", self.ids[3]).ok)
+        self.assertEqual(self.system.holds_for(self.ids[3]), [])
+
+        self.system.return_book("111", self.ids[3])
+        self.assertEqual(self.ready[-1].member, self.members[1])
+
+    def test_cancel_passes_ready_item_on(self):
+        """Test cancelling waiting and ready holds"""
+        self.system.place_hold("111", self.ids[1])
+        self.system.place_hold("111", self.ids[2])
+        self.system.place_hold("111", self.ids[3])
+        self.assertTrue(self.system.cancel_hold("111", self.ids[2]))
+        self.assertFalse(self.system.cancel_hold("111", self.ids[2]))
+        self.assertEqual(self.system.holds.waiting("111"), 2)
+
+        self.system.return_book("111", self.ids[0])
+        self.system.cancel_hold("111", self.ids[1])
+        self.assertEqual(self.ready[-1].member, self.members[3])
+
+    def test_expired_holds(self):
+        """Test that a sweep expires holds and passes uncollected items on"""
+        self.system.place_hold("111", self.ids[1])
+        self.system.place_hold("111", self.ids[2])
+        self.system.return_book("111", self.ids[0])
+        ready = self.ready[-1]
+
+        self.assertEqual(self.system.expire_holds(now=ready.expires_at - 1), [])
+        self.assertEqual(self.system.expire_holds(now=ready.expires_at), [ready])
+        self.assertEqual(ready.status, "expired")
+        self.assertEqual(self.ready[-1].member, self.members[2])
+
+        # Waiting holds lapse too, without being promoted
+        self.system.checkout_book("111", self.ids[2])
+        self.system.place_hold("111", self.ids[3])
+        hold = self.system.holds_for(self.ids[3])[0]
+        self.assertEqual(self.system.expire_holds(now=hold.expires_at), [hold])
+        self.assertEqual(self.system.holds.waiting("111"), 0)
+        self.assertEqual(len(self.system.holds), 0)
+
+    def test_long_queue_with_cancellations(self):
+        """Test promotion order after stale holds force queue rebuilds"""
+        members = [
+            self.system.register_member(Member(f"W{i}", "Doe", f"w{i}@test.com"))
+            for i in range(300)
+        ]
+        for member in members:
+            self.system.place_hold("111", member.member_id)
+        for member in members[:200]:
+            self.system.cancel_hold("111", member.member_id)
+        self.assertEqual(self.system.holds.waiting("111"), 100)
+        borrower = self.ids[0]
+        for member in members[200:205]:
+            self.system.return_book("111", borrower)
+            self.assertIs(self.ready[-1].member, member)
+            self.system.checkout_book("111", member.member_id)
+            borrower = member.member_id
+
+
+class TestCopies(unittest.TestCase):
+    """Test cases for titles with several copies"""
+
+    def setUp(self):
+        """Set up a course text with three copies and a few members"""
+        self.system = LibrarySystem()
+        self.book = Book("Course Text", 2023, "Science", "Author", "111")
+        self.system.add_book(self.book)
+        self.system.add_copies("111", 2)
+        self.ids = [
+            self.system.register_member(
+                Member(f"M{i}", "Doe", f"m{i}@test.com")
+            ).member_id
+            for i in range(5)
+        ]
+
+    def test_adding_a_second_copy(self):
+        """Test that the same book added twice becomes two copies"""
+        system = LibrarySystem()
+        system.preload_sample_books()
+        self.assertEqual(system.find_book_by_isbn("9781982134488").copies, 1)
+        self.assertEqual(
+            system.find_book_by_isbn("9781911600473").title, "The Barcelona Legacy"
+        )
+        result = system.add_book(
+            Book(
+                "Messi vs Ronaldo",
+                2021,
+                "Football",
+                "Jonathan Clegg & Joshua Robinson",
+                "9781982134488",
+            )
+        )
+        self.assertIn("now has 2 copies", str(result))
+        self.assertEqual(system.find_book_by_isbn("9781982134488").copies, 2)
+
+    def test_checkout_takes_free_copies(self):
+        """Test that each borrower gets their own copy until none are left"""
+        for member_id in self.ids[:3]:
+            self.assertTrue(self.system.checkout_book("111", member_id).ok)
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertFalse(self.book.is_available)
+        self.assertEqual(
+            self.system.checkout_book("111", self.ids[3]).error, "unavailable"
+        )
+
+        copies = sorted(self.system.loans[key].copy for key in self.system.loans)
+        self.assertEqual(copies, [1, 2, 3])
+        self.assertIn(self.system.find_borrower("111#2").member_id, self.ids)
+
+        self.system.return_book("111", self.ids[1])
+        self.assertEqual(self.book.available_copies, 1)
+        self.assertTrue(self.book.is_available)
+        self.assertTrue(self.system.checkout_book("111", self.ids[3]).ok)
+
+    def test_one_copy_per_member(self):
+        """Test that a member cannot borrow two copies of one title"""
+        self.system.checkout_book("111", self.ids[0])
+        self.assertEqual(
+            self.system.checkout_book("111", self.ids[0]).error, "already_borrowed"
+        )
+        batch = self.system.process_batch(self.ids[0], [("111", "checkout")])
+        self.assertEqual(batch.results[0].error, "already_borrowed")
+
+    def test_copies_are_returned_through_loans(self):
+        """Test that a copy is only put back by the member who holds it"""
+        self.system.checkout_book("111", self.ids[0])
+        self.system.checkout_book("111", self.ids[1])
+        result = self.book.return_item()
+        self.assertEqual(result.error, "return_through_loan")
+        self.assertEqual(self.book.available_copies, 1)
+        self.assertTrue(self.system.return_book("111", self.ids[1]).ok)
+        self.assertEqual(self.book.available_copies, 2)
+
+    def test_counters_and_indexes_track_titles(self):
+        """Test that a title counts as checked out only with every copy out"""
+        self.system.stats_snapshot()
+        self.system.checkout_book("111", self.ids[0])
+        self.system.checkout_book("111", self.ids[1])
+        self.assertEqual(self.system.stats_snapshot()["checked_out"], 0)
+        self.assertEqual(self.system.stats_snapshot()["active_loans"], 2)
+        self.system.checkout_book("111", self.ids[2])
+        self.assertEqual(self.system.stats_snapshot()["checked_out"], 1)
+        self.assertEqual(self.system.query_items(available=False), [self.book])
+        later = self.system.loans["111"].due_at + 60
+        self.assertEqual(len(self.system.overdue_loans(now=later)), 3)
+        self.assertEqual(self.system.verify_stats(), [])
+
+    def test_holds_get_returned_copies(self):
+        """Test that each returned copy goes to the next waiting hold"""
+        for member_id in self.ids[:3]:
+            self.system.checkout_book("111", member_id)
+        self.system.place_hold("111", self.ids[3])
+        self.system.place_hold("111", self.ids[4])
+        self.system.return_book("111", self.ids[0])
+        self.system.return_book("111", self.ids[1])
+        ready = self.system.holds.ready_holds("111")
+        self.assertEqual(sorted(ready), sorted(self.ids[3:5]))
+        self.assertEqual(
+            self.system.checkout_book("111", self.ids[0]).error, "reserved"
+        )
+
+        # New copies go to waiting holds as well
+        self.system.checkout_book("111", self.ids[3])
+        self.system.place_hold("111", self.ids[0])
+        self.system.add_copies("111")
+        self.assertIn(self.ids[0], self.system.holds.ready_holds("111"))
+
+    def test_copies_persist(self):
+        """Test that copies and copy loans survive SQLite, the journal and snapshots"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "library.db")
+            journal_dir = os.path.join(tmpdir, "journal")
+            snap = os.path.join(tmpdir, "library.snap")
+            for make in (
+                lambda: LibrarySystem(SQLiteStorage(path)),
+                lambda: LibrarySystem(journal=Journal(journal_dir)),
+            ):
+                system = make()
+                system.add_book(Book("Course Text", 2023, "Science", "A", "111"))
+                system.add_copies("111", 2)
+                member = system.register_member(Member("Jo", "Doe", "jo@test.com"))
+                other = system.register_member(Member("Al", "Doe", "al@test.com"))
+                system.checkout_book("111", member.member_id)
+                system.checkout_book("111", other.member_id)
+                system.return_book("111", member.member_id)
+                copy = other.loans["111"].copy
+                system.flush()
+                (system.storage or system.journal).close()
+
+                system = make()
+                book = system.find_book_by_isbn("111")
+                self.assertEqual((book.copies, book.available_copies), (3, 2))
+                restored = system.find_member(other.member_id)
+                self.assertEqual(restored.loans["111"].copy, copy)
+                write_snapshot(system, snap)
+                (system.storage or system.journal).close()
+
+                snapshot = MappedSnapshot(snap)
+                system = LibrarySystem(storage=snapshot)
+                book = system.find_book_by_isbn("111")
+                self.assertEqual((book.copies, book.available_copies), (3, 2))
+                system.return_book("111", other.member_id)
+                self.assertEqual(book.available_copies, 3)
+                snapshot.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_old_database_is_migrated(self):
+        """Test opening a database written before titles had copies"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "library.db")
+            conn = sqlite3.connect(path)
+            conn.executescript("""
+                CREATE TABLE items (item_key TEXT PRIMARY KEY, kind TEXT NOT NULL,
+                    title TEXT NOT NULL, year INTEGER, genre TEXT, author TEXT,
+                    video_format TEXT, duration INTEGER, publisher TEXT,
+                    is_available INTEGER NOT NULL DEFAULT 1);
+                CREATE TABLE people (person_id TEXT PRIMARY KEY, role TEXT NOT NULL,
+                    fname TEXT NOT NULL, lname TEXT NOT NULL,
+                    email_address TEXT NOT NULL);
+                CREATE TABLE loans (item_key TEXT PRIMARY KEY, kind TEXT NOT NULL,
+                    member_id TEXT NOT NULL);
+                INSERT INTO items VALUES
+                    ('111', 'Book', 'Old Book', 2000, 'Drama', 'A', NULL, NULL,
+                    NULL, 0);
+                INSERT INTO people VALUES
+                    ('MBR0001', 'Member', 'Jo', 'Doe', 'jo@test.com');
+                INSERT INTO loans VALUES ('111', 'Book', 'MBR0001');
+                """)
+            conn.commit()
+            conn.close()
+
+            storage = SQLiteStorage(path)
+            system = LibrarySystem(storage)
+            self.assertEqual(system.find_borrower("111").member_id, "MBR0001")
+            self.assertEqual(system.find_book_by_isbn("111").copies, 1)
+            self.assertTrue(system.return_book("111", "MBR0001").ok)
+            storage.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestAsyncLibrarySystem(unittest.TestCase):
+    """Test cases for the asyncio facade"""
+
+    def setUp(self):
+        """Set up a small library and a directory for storage"""
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the storage directory"""
+        shutil.rmtree(self.tmpdir)
+
+    def _populate(self, system):
+        system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        system.add_book(Book("Other Book", 2023, "Fiction", "Author", "222"))
+        return [
+            system.register_member(Member(f"M{i}", "Doe", f"m{i}@test.com")).member_id
+            for i in range(20)
+        ]
+
+    def test_in_memory_calls_run_inline(self):
+        """Test that an in-memory system needs no worker threads"""
+        system = LibrarySystem()
+        ids = self._populate(system)
+
+        async def scenario():
+            library = AsyncLibrarySystem(system)
+            self.assertIsNone(library.executor)
+            book = await library.find_book_by_isbn("111")
+            result = await library.checkout_book("111", ids[0])
+            returned = await library.return_book("111", ids[0])
+            return book, result, returned
+
+        book, result, returned = asyncio.run(scenario())
+        self.assertEqual(book.title, "Test Book")
+        self.assertTrue(result.ok)
+        self.assertTrue(returned.ok)
+
+    def test_concurrent_checkouts_of_one_item(self):
+        """Test that only one of many concurrent borrowers gets an item"""
+        storage = SQLiteStorage(os.path.join(self.tmpdir, "library.db"))
+        system = LibrarySystem(storage, concurrent=True)
+        ids = self._populate(system)
+
+        async def scenario():
+            async with AsyncLibrarySystem(system, max_workers=4) as library:
+                self.assertIsNotNone(library.executor)
+                return await asyncio.gather(
+                    *(library.checkout_book("111", member_id) for member_id in ids),
+                    *(library.find_member(member_id) for member_id in ids),
+                    library.checkout_book("222", ids[0]),
+                )
+
+        results = asyncio.run(scenario())
+        checkouts = results[: len(ids)]
+        self.assertEqual(sum(result.ok for result in checkouts), 1)
+        self.assertEqual(
+            {result.error for result in checkouts if not result.ok}, {"unavailable"}
+        )
+        self.assertEqual([member.member_id for member in results[len(ids) : -1]], ids)
+        self.assertTrue(results[-1].ok)
+        self.assertEqual(len(system.loans), 2)
+        storage.close()
+
+    def test_register_through_the_facade(self):
+        """Test async registration and duplicate detection"""
+        system = LibrarySystem(journal=Journal(os.path.join(self.tmpdir, "journal")))
+
+        async def scenario():
+            async with AsyncLibrarySystem(system) as library:
+                member = await library.register_member(
+                    Member("Jo", "Doe", "jo@test.com")
+                )
+                found = await library.find_member_by_identity(
+                    "Jo", "Doe", "jo@test.com"
+                )
+                with self.assertRaises(ValueError):
+                    await library.register_member(Member("Jo", "Doe", "jo@test.com"))
+                return member, found
+
+        member, found = asyncio.run(scenario())
+        self.assertIs(member, found)
+        system.journal.close()
+
+
+class TestLibraryApi(unittest.TestCase):
+    """Test cases for the HTTP/JSON API server"""
+
+    def setUp(self):
+        """Serve a small library on a free port"""
+        self.system = LibrarySystem(concurrent=True)
+        self.system.add_book(
+            Book("Fluent Python", 2022, "Computer Science", "Luciano Ramalho", "111")
+        )
+        self.system.add_book(Book("Test Book", 2023, "Fiction", "Author", "222"))
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+        self.server = start_server(self.system)
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+
+    def tearDown(self):
+        """Stop the server"""
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, path, body=None, headers=None):
+        data = None if body is None else json.dumps(body)
+        self.conn.request(method, path, data, headers or {})
+        response = self.conn.getresponse()
+        raw = response.read()
+        return response, json.loads(raw) if raw else None
+
+    def test_catalog_and_lookups(self):
+        """Test listing, search, item and member endpoints on one connection"""
+        response, page = self.request("GET", "/items?kind=Book&limit=1")
+        self.assertEqual(response.status, 200)
+        self.assertEqual([item["id"] for item in page["items"]], ["111"])
+        _, page = self.request("GET", "/items?kind=Book&cursor=" + page["next_cursor"])
+        self.assertEqual([item["title"] for item in page["items"]], ["Test Book"])
+
+        _, found = self.request("GET", "/search?q=ramalho")
+        self.assertEqual(found["items"][0]["author"], "Luciano Ramalho")
+        _, item = self.request("GET", "/items/222")
+        self.assertTrue(item["available"])
+        response, _ = self.request("GET", "/items/999")
+        self.assertEqual(response.status, 404)
+        _, member = self.request("GET", f"/members/{self.member.member_id}")
+        self.assertEqual(member["loans"], [])
+
+    def test_item_json_follows_changes(self):
+        """Test that cached item JSON is rebuilt after the item changes"""
+        _, before = self.request("GET", "/items/111")
+        self.assertTrue(before["available"])
+        self.request(
+            "POST", "/checkout", {"item_id": "111", "member_id": self.member.member_id}
+        )
+        _, after = self.request("GET", "/items/111")
+        self.assertFalse(after["available"])
+        _, page = self.request("GET", "/items?kind=Book")
+        self.assertEqual([item["available"] for item in page["items"]], [False, True])
+        self.system.add_copies("111", 2)
+        _, after = self.request("GET", "/items/111")
+        self.assertEqual((after["copies"], after["available_copies"]), (3, 2))
+
+    def test_limits_are_clamped(self):
+        """Test that zero and negative limits return one item, not everything"""
+        for limit in ("0", "-1"):
+            _, page = self.request("GET", "/items?kind=Book&limit=" + limit)
+            self.assertEqual(len(page["items"]), 1)
+            _, found = self.request("GET", "/search?q=python+book&limit=" + limit)
+            self.assertEqual(len(found["items"]), 1)
+        response, _ = self.request("GET", "/items?kind=Book&limit=many")
+        self.assertEqual(response.status, 400)
+
+    def test_checkout_and_return(self):
+        """Test loans through the API and their error statuses"""
+        body = {"item_id": "111", "member_id": self.member.member_id}
+        response, result = self.request("POST", "/checkout", body)
+        self.assertEqual(response.status, 200)
+        self.assertTrue(result["ok"])
+        response, result = self.request("POST", "/checkout", body)
+        self.assertEqual(response.status, 409)
+        self.assertEqual(result["error"], "unavailable")
+        _, member = self.request("GET", f"/members/{self.member.member_id}")
+        self.assertEqual(member["loans"][0]["item_id"], "111")
+
+        response, _ = self.request("POST", "/return", body)
+        self.assertEqual(response.status, 200)
+        response, result = self.request(
+            "POST", "/checkout", {"item_id": "111", "member_id": "MBR9999"}
+        )
+        self.assertEqual((response.status, result["error"]), (404, "member_not_found"))
+        response, _ = self.request("POST", "/checkout", {"item_id": "111"})
+        self.assertEqual(response.status, 400)
+
+    def test_messages_are_opt_in(self):
+        """Test that loan responses carry a display message only on request"""
+        body = {"item_id": "111", "member_id": self.member.member_id}
+        _, result = self.request("POST", "/checkout", body)
+        self.assertNotIn("message", result)
+        _, result = self.request("POST", "/return?messages=true", body)
+        self.assertIn("successfully returned", result["message"])
+
+    def test_conditional_get(self):
+        """Test that an unchanged page answers 304 and a changed one does not"""
+        response, _ = self.request("GET", "/items?kind=Book")
+        etag = response.getheader("ETag")
+        response, body = self.request(
+            "GET", "/items?kind=Book", headers={"If-None-Match": etag}
+        )
+        self.assertEqual((response.status, body), (304, None))
+
+        self.system.checkout_book("111", self.member.member_id)
+        response, _ = self.request(
+            "GET", "/items?kind=Book", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader("ETag"), etag)
+
+    def test_member_etag_follows_the_clock(self):
+        """Test that a loan turning overdue, which publishes nothing, is resent"""
+        self.system.checkout_book("111", self.member.member_id)
+        path = f"/members/{self.member.member_id}"
+        response, member = self.request("GET", path)
+        etag = response.getheader("ETag")
+        self.assertFalse(member["loans"][0]["overdue"])
+        response, _ = self.request("GET", path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+
+        # The due date passing is simulated by moving it into the past
+        self.member.loans["111"].due_at = 0
+        response, member = self.request("GET", path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertTrue(member["loans"][0]["overdue"])
+
+    def test_recommendations(self):
+        """Test the items also borrowed by an item's borrowers"""
+        self.system.recommender
+        for isbn in ("111", "222"):
+            self.system.checkout_book(isbn, self.member.member_id)
+        _, found = self.request("GET", "/items/111/recommendations")
+        self.assertEqual([item["id"] for item in found["items"]], ["222"])
+        response, _ = self.request("GET", "/items/999/recommendations")
+        self.assertEqual(response.status, 404)
+
+    def test_batch(self):
+        """Test several operations in one request body"""
+        member_id = self.member.member_id
+        response, results = self.request(
+            "POST",
+            "/batch",
+            [
+                {"method": "GET", "path": "/items/111"},
+                {
+                    "method": "POST",
+                    "path": "/checkout",
+                    "body": {"item_id": "222", "member_id": member_id},
+                },
+                {"method": "GET", "path": "/items?kind=Book&available=true"},
+                {"method": "GET", "path": "/nowhere"},
+            ],
+        )
+        self.assertEqual(response.status, 200)
+        self.assertEqual([result["status"] for result in results], [200, 200, 200, 404])
+        self.assertEqual([item["id"] for item in results[2]["body"]["items"]], ["111"])
+
+
+class TestShardedLibrarySystem(unittest.TestCase):
+    """Test cases for the sharded LibrarySystem across worker processes"""
+
+    def setUp(self):
+        """Start two shards with a few books and a member"""
+        self.system = ShardedLibrarySystem(2)
+        self.isbns = [str(i) for i in range(10)]
+        self.system.bulk_add_items(
+            [
+                Book(f"Book {isbn}", 2000, "Fiction", "Author", isbn)
+                for isbn in self.isbns
+            ]
+        )
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+        self.other = self.system.register_member(
+            Member("Jane", "Smith", "jane@test.com")
+        )
+
+    def tearDown(self):
+        """Stop the shard processes"""
+        self.system.close()
+
+    def test_catalog(self):
+        """Test that items are spread over the shards and found by ID"""
+        self.assertEqual(self.system.count_items(), 10)
+        self.assertEqual(self.system.find_book_by_isbn("3").title, "Book 3")
+        self.assertIsNone(self.system.find_item("999"))
+        result = self.system.add_book(Book("Extra", 2001, "Fiction", "Author", "x1"))
+        self.assertTrue(result.ok)
+        self.assertEqual(self.system.count_items(), 11)
+
+    def test_cross_shard_checkout(self):
+        """Test a checkout decided by an item's shard other than the member's"""
+        home = shard_of(self.member.member_id, 2)
+        isbn = next(i for i in self.isbns if shard_of(i, 2) != home)
+        result = self.system.checkout_book(isbn, self.member.member_id)
+        self.assertTrue(result.ok)
+        result = self.system.checkout_book(isbn, self.other.member_id)
+        self.assertEqual(result.error, "unavailable")
+        self.assertFalse(self.system.find_item(isbn).is_available)
+
+        member = self.system.find_member(self.member.member_id)
+        self.assertEqual(list(member.loans), [isbn])
+        self.assertTrue(self.system.return_book(isbn, self.member.member_id).ok)
+        self.assertEqual(self.system.find_member(self.member.member_id).loans, {})
+        self.assertTrue(self.system.find_item(isbn).is_available)
+
+    def test_unknown_ids(self):
+        """Test checkouts of unknown items and by unknown members"""
+        result = self.system.checkout_book("999", self.member.member_id)
+        self.assertEqual(result.error, "not_found")
+        result = self.system.checkout_book("1", "M999999")
+        self.assertEqual(result.error, "member_not_found")
+        self.assertIsNone(self.system.find_member("M999999"))
+
+    def test_apply_loans(self):
+        """Test that batched loans keep the order of the operations"""
+        member_id = self.member.member_id
+        other_id = self.other.member_id
+        results = self.system.apply_loans(
+            [
+                ("checkout", "1", member_id),
+                ("checkout", "2", member_id),
+                ("checkout", "1", other_id),
+                ("return", "1", member_id),
+                ("checkout", "1", other_id),
+            ]
+        )
+        self.assertEqual(
+            [result.error for result in results],
+            [None, None, "unavailable", None, None],
+        )
+        self.assertEqual(list(self.system.find_member(other_id).loans), ["1"])
+
+    def test_duplicate_email(self):
+        """Test that emails stay unique across shards"""
+        with self.assertRaises(ValueError):
+            self.system.register_member(Member("John", "Other", "JOHN@test.com"))
+        librarian = self.system.register_librarian(
+            Librarian("John", "Doe", "john@test.com")
+        )
+        found = self.system.find_librarian(librarian.librarian_id)
+        self.assertEqual(found.email_address, "john@test.com")
+
+    def test_identity_search_and_listing(self):
+        """Test lookups and queries that gather every shard's items"""
+        found = self.system.find_member_by_identity("john", "DOE", " John@test.com")
+        self.assertEqual(found.member_id, self.member.member_id)
+        self.assertIsNone(
+            self.system.find_member_by_identity("Jane", "Doe", "john@test.com")
+        )
+        self.assertIsNone(
+            self.system.find_librarian_by_identity("John", "Doe", "john@test.com")
+        )
+
+        self.system.add_book(Book("Dune", 1965, "Sci-Fi", "Frank Herbert", "dune"))
+        self.assertEqual([item.title for item in self.system.search("dune")], ["Dune"])
+        self.assertEqual(len(self.system.search("book", limit=4)), 4)
+
+        self.system.checkout_book("3", self.member.member_id)
+        for options in ({}, {"available": True}, {"descending": True}):
+            expected = sorted(
+                ["dune"] + self.isbns,
+                key=lambda isbn: self.system.find_item(isbn).title.casefold(),
+                reverse=options.get("descending", False),
+            )
+            if options.get("available"):
+                expected.remove("3")
+            keys, cursor = [], None
+            while True:
+                page = self.system.list_items("Book", cursor=cursor, limit=4, **options)
+                keys += [item.item_key for item in page.items]
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+            self.assertEqual(keys, expected)
+
+    def test_batches_and_holds(self):
+        """Test single-shard batches, refused cross-shard ones and holds"""
+        member_id = self.member.member_id
+        first = [isbn for isbn in self.isbns if shard_of(isbn, 2) == 0]
+        second = [isbn for isbn in self.isbns if shard_of(isbn, 2) == 1]
+        batch = self.system.process_batch(
+            member_id, [(first[0], "checkout"), (first[1], "checkout")]
+        )
+        self.assertTrue(batch.success)
+        self.assertEqual(sorted(self.system.find_member(member_id).loans), first[:2])
+        batch = self.system.process_batch(
+            member_id, [(first[2], "checkout"), (second[0], "checkout")]
+        )
+        self.assertFalse(batch.success)
+        self.assertEqual(
+            [result.error for result in batch.results], ["cross_shard"] * 2
+        )
+        self.assertTrue(self.system.find_item(first[2]).is_available)
+
+        other_id = self.other.member_id
+        self.assertTrue(self.system.place_hold(first[0], other_id).ok)
+        self.assertEqual(
+            [hold.item_key for hold in self.system.holds_for(other_id)], [first[0]]
+        )
+        self.system.return_book(first[0], member_id)
+        hold = self.system.holds_for(other_id)[0]
+        self.assertEqual((hold.status, hold.member.member_id), ("ready", other_id))
+        self.assertEqual(
+            self.system.checkout_book(first[0], member_id).error, "reserved"
+        )
+        expired = self.system.expire_holds(now=hold.expires_at + 1)
+        self.assertEqual([hold.item_key for hold in expired], [first[0]])
+        self.assertEqual(self.system.holds_for(other_id), [])
+        self.assertTrue(self.system.place_hold(first[1], other_id).ok)
+        self.assertTrue(self.system.cancel_hold(first[1], other_id))
+
+
+class TestChangeEvents(unittest.TestCase):
+    """Test cases for change notifications and the catalog version"""
+
+    def setUp(self):
+        """Create a library that records every change"""
+        self.system = LibrarySystem()
+        self.changes = []
+        self.system.events.subscribe(self.changes.append)
+        self.system.add_book(Book("Test Book", 2023, "Fiction", "Author", "111"))
+        self.member = self.system.register_member(
+            Member("John", "Doe", "john@test.com")
+        )
+
+    def kinds(self):
+        return [(change.kind, change.item_key) for change in self.changes]
+
+    def test_loan_events(self):
+        """Test that loans publish their changes with rising versions"""
+        member_id = self.member.member_id
+        self.system.checkout_book("111", member_id)
+        self.system.return_book("111", member_id)
+        self.assertEqual(
+            self.kinds(),
+            [
+                ("item_added", "111"),
+                ("loan_opened", "111"),
+                ("availability", "111"),
+                ("loan_closed", "111"),
+                ("availability", "111"),
+            ],
+        )
+        versions = [change.version for change in self.changes]
+        self.assertEqual(versions, sorted(set(versions)))
+        self.assertEqual(self.system.events.version, versions[-1])
+        self.assertEqual(self.changes[1].member_id, member_id)
+        self.assertEqual(self.system.events.member_version(member_id), versions[3])
+
+    def test_copies_availability(self):
+        """Test that availability events fire only when the shelf empties or refills"""
+        self.system.add_copies("111", 1)
+        other = self.system.register_member(Member("Jane", "Smith", "jane@test.com"))
+        self.changes.clear()
+        self.system.checkout_book("111", self.member.member_id)
+        self.system.checkout_book("111", other.member_id)
+        self.system.return_book("111", other.member_id)
+        self.assertEqual(
+            [kind for kind, _ in self.kinds()],
+            [
+                "loan_opened",
+                "loan_opened",
+                "availability",
+                "loan_closed",
+                "availability",
+            ],
+        )
+
+    def test_changed_since(self):
+        """Test that only changes to the given items or the catalog count"""
+        events = self.system.events
+        self.system.add_book(Book("Other Book", 2023, "Fiction", "Author", "222"))
+        version = events.version
+        self.system.checkout_book("222", self.member.member_id)
+        self.assertFalse(events.changed_since(version, ["111"]))
+        self.assertTrue(events.changed_since(version, ["222"]))
+        self.assertEqual(events.catalog_version, version)
+
+        self.system.bulk_add_items([Book("Bulk", 2023, "Fiction", "Author", "333")])
+        self.assertTrue(events.changed_since(version))
+        self.assertEqual(self.changes[-1].kind, "items_added")
+
+    def test_unsubscribe(self):
+        """Test that an unsubscribed callback is no longer called"""
+        seen = []
+        unsubscribe = self.system.events.subscribe(seen.append)
+        self.system.checkout_book("111", self.member.member_id)
+        unsubscribe()
+        self.system.return_book("111", self.member.member_id)
+        self.assertEqual(
+            [change.kind for change in seen], ["loan_opened", "availability"]
+        )
+
+    def test_change_cache(self):
+        """Test that cached values are rebuilt only after their item changes"""
+        self.system.add_book(Book("Other Book", 2023, "Fiction", "Author", "222"))
+        cache = ChangeCache(self.system.events)
+        builds = []
+
+        def build(key):
+            builds.append(key)
+            return self.system.find_item(key).is_available
+
+        for key in ("111", "222", "111", "222"):
+            cache.get(key, lambda: build(key))
+        self.assertEqual(builds, ["111", "222"])
+
+        self.system.checkout_book("111", self.member.member_id)
+        self.assertFalse(cache.get("111", lambda: build("111")))
+        self.assertTrue(cache.get("222", lambda: build("222")))
+        self.assertEqual(builds, ["111", "222", "111"])
+
+
+class TestRecommendations(unittest.TestCase):
+    """Test cases for co-borrowing recommendations"""
+
+    def setUp(self):
+        """Create six books and four members"""
+        self.system = LibrarySystem()
+        for isbn in "012345":
+            self.system.add_book(Book(f"Book {isbn}", 2020, "Fiction", "Author", isbn))
+        self.members = [
+            self.system.register_member(Member("Reader", str(i), f"r{i}@test.com"))
+            for i in range(4)
+        ]
+        # Borrows are collected from the recommender's first use
+        self.system.recommender
+
+    def borrow(self, member, *isbns):
+        for isbn in isbns:
+            self.system.checkout_book(isbn, member.member_id)
+            self.system.return_book(isbn, member.member_id)
+
+    def scores(self, isbn):
+        return [
+            (key, round(score, 4))
+            for key, score in self.system.recommender.recommend(isbn)
+        ]
+
+    def test_cosine_ranking(self):
+        """Test that suggestions are ranked by cosine similarity of borrowers"""
+        self.borrow(self.members[0], "0", "1", "2")
+        self.borrow(self.members[1], "0", "1")
+        self.borrow(self.members[2], "0", "3")
+        self.borrow(self.members[3], "4")
+        self.assertEqual(
+            self.scores("0"), [("1", 0.8165), ("2", 0.5774), ("3", 0.5774)]
+        )
+        self.assertEqual(self.scores("4"), [])
+        self.assertEqual(self.scores("5"), [])
+        books = self.system.recommend("0", limit=1)
+        self.assertEqual([book.title for book in books], ["Book 1"])
+
+    def test_incremental_updates(self):
+        """Test that new loans update the cached lists of every affected item"""
+        self.borrow(self.members[0], "0", "1")
+        self.borrow(self.members[1], "0", "1")
+        self.assertEqual(self.scores("1"), [("0", 1.0)])
+        # Book 0 gains a borrower that book 1 does not have
+        self.borrow(self.members[2], "0", "2")
+        self.assertEqual(self.scores("1"), [("0", 0.8165)])
+        self.assertEqual(self.scores("2"), [("0", 0.5774)])
+        # A repeat borrow counts once
+        self.borrow(self.members[2], "0")
+        self.assertEqual(self.scores("2"), [("0", 0.5774)])
+        self.assertEqual(len(self.system.recommender), 6)
+
+    def test_seeded_from_active_loans(self):
+        """Test that loans open before first use are included"""
+        system = LibrarySystem()
+        member = system.register_member(Member("John", "Doe", "john@test.com"))
+        for isbn in ("0", "1"):
+            system.add_book(Book(f"Book {isbn}", 2020, "Fiction", "Author", isbn))
+            system.checkout_book(isbn, member.member_id)
+        self.assertEqual(system.recommender.recommend("0"), [("1", 1.0)])
+
+    def test_seeded_from_storage(self):
+        """Test that a stored library seeds from its loans table alone"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "library.db")
+            system = LibrarySystem(SQLiteStorage(path))
+            member = system.register_member(Member("John", "Doe", "john@test.com"))
+            for isbn in ("0", "1"):
+                system.add_book(Book(f"Book {isbn}", 2020, "Fiction", "Author", isbn))
+                system.checkout_book(isbn, member.member_id)
+            system.storage.close()
+
+            system = LibrarySystem(SQLiteStorage(path))
+            self.assertEqual(system.recommender.recommend("0"), [("1", 1.0)])
+            self.assertIsNone(system._loans)
+            system.storage.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_batches(self):
+        """Test that scoring in many small batches matches a brute-force count"""
+        # One item per batch
+        matrix = CoBorrowing(top_k=3, batch_pairs=1)
+        borrows = [
+            (member, (member * 7 + step) % 11)
+            for member in range(9)
+            for step in range(4)
+        ]
+        matrix.add_many(borrows)
+        suggestions = matrix.recommend(0)
+        borrowers = {}
+        for member, item in borrows:
+            borrowers.setdefault(item, set()).add(member)
+        expected = sorted(
+            (
+                len(borrowers[0] & borrowers[item])
+                / (len(borrowers[0]) * len(borrowers[item])) ** 0.5
+                for item in borrowers
+                if item != 0
+            ),
+            reverse=True,
+        )[:3]
+        self.assertEqual(
+            [round(score, 9) for _, score in suggestions],
+            [round(score, 9) for score in expected],
+        )
+
 
 def run_tests():
     """Run all tests and display results"""
@@ -341,6 +2752,30 @@ def run_tests():
         TestMember,
         TestLibrarian,
         TestLibrarySystem,
+        TestCompactRepresentation,
+        TestLoanRegistry,
+        TestBatchTransactions,
+        TestConcurrentCheckout,
+        TestIdentityIndex,
+        TestCatalogIndex,
+        TestSearchIndex,
+        TestColumnarCatalog,
+        TestBulkImport,
+        TestSQLiteStorage,
+        TestOperationJournal,
+        TestMappedSnapshot,
+        TestIdAllocator,
+        TestResults,
+        TestSortedListing,
+        TestCatalogStats,
+        TestDueDates,
+        TestHolds,
+        TestCopies,
+        TestAsyncLibrarySystem,
+        TestLibraryApi,
+        TestShardedLibrarySystem,
+        TestChangeEvents,
+        TestRecommendations,
     ]
 
     for test_class in test_classes: